@@ -1,84 +1,26 @@
 # app.py
 import streamlit as st
 import pandas as pd
-import datetime
-import re
-from src import db_helper
-
-
-from src import preprocess, reply_generator, analytics
-# Initialize SQLite DB (creates table if not exists)
-db_helper.init_db()
-# ---------------------------
-# Helpers
-# ---------------------------
-FILTER_KEYWORDS = ["support", "query", "request", "help"]
-
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Normalize and standardize email dataset headers."""
-    cols_map = {c: c.strip() for c in df.columns}
-    df = df.rename(columns=cols_map)
-    lower_map = {c.lower().strip(): c for c in df.columns}
-
-    rename_dict = {}
-    if "sender" in lower_map: rename_dict[lower_map["sender"]] = "From"
-    if "from" in lower_map: rename_dict[lower_map["from"]] = "From"
-    if "subject" in lower_map: rename_dict[lower_map["subject"]] = "Subject"
-    if "body" in lower_map: rename_dict[lower_map["body"]] = "Body"
-    if "sent_date" in lower_map: rename_dict[lower_map["sent_date"]] = "Sent Date"
-    if "sentdate" in lower_map: rename_dict[lower_map["sentdate"]] = "Sent Date"
-
-    if rename_dict:
-        df = df.rename(columns=rename_dict)
-
-    for col in ["From", "Subject", "Body"]:
-        if col not in df.columns:
-            df[col] = ""
-
-    if "Sent Date" in df.columns:
-        try:
-            df["Sent Date"] = pd.to_datetime(df["Sent Date"], errors="coerce")
-        except Exception:
-            pass
-
-    return df
-
-def ensure_metadata_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Ensure Priority and Sentiment exist."""
-    if "Priority" not in df.columns:
-        df["Priority"] = "Normal"
-    if "Sentiment" not in df.columns:
-        df["Sentiment"] = "Neutral"
-    return df
-
-def filter_support_emails(df: pd.DataFrame) -> pd.DataFrame:
-    """Filter emails with support-related subjects."""
-    if "Subject" not in df.columns:
-        return df
-    mask = df["Subject"].fillna("").str.lower().str.contains("|".join(FILTER_KEYWORDS))
-    return df[mask].reset_index(drop=True)
-
-def classify_priority(text: str) -> str:
-    urgent_keywords = ["immediately", "urgent", "critical", "cannot access", "asap", "as soon as possible", "now"]
-    t = (text or "").lower()
-    return "Urgent" if any(k in t for k in urgent_keywords) else "Normal"
-
-def classify_sentiment(text: str) -> str:
-    t = (text or "").lower()
-    negative_words = ["angry", "frustrated", "disappointed", "not happy", "hate", "bad", "terrible", "worst"]
-    positive_words = ["thank you", "great", "happy", "love", "excellent", "thanks"]
-    if any(w in t for w in negative_words):
-        return "Negative"
-    if any(w in t for w in positive_words):
-        return "Positive"
-    return "Neutral"
-
-def extract_info(row) -> dict:
-    # Check both Body and Content
-    t = (row.get("Body", "") or "") + " " + (row.get("Content", "") or "")
-    phone = re.findall(r"\+?\d[\d\-\s]{7,}\d", t)
-    email = re.findall(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", t)
-    return {"Phone": phone[0] if phone else "", "AltEmail": email[0] if email else ""}
+import os
+import time
+from src import db_helper, ingest, snapshot
+from src.dedup import cluster_ids
+from src.mail_source import read_frame, source_format, source_mtime
+from src.profiler import PROFILER
+from src.preprocess import ensure_metadata_columns, enrich_emails, filter_support_emails, normalize_columns
+from src.rag import draft_share_key, sender_history
+
+
+from src import reply_generator, analytics
+
+# A CSV export, an mbox archive or a Maildir directory
+INBOX_SOURCE = os.environ.get("INBOX_SOURCE", "data/intern_emails.csv")
+# Columns the Inbox reads from the Parquet snapshot (DB unavailable)
+SNAPSHOT_COLUMNS = ["From", "Subject", "Body", "Sent Date", "Priority", "Sentiment", "Requirement",
+                    "Phone", "AltEmail", "ClusterId"]
+# Analytics windows ("Last 24h", the 7-day chart) move with the clock, so their
+# cache is also keyed on the current minute
+ANALYTICS_REFRESH = 60      # seconds
 
 # ---------------------------
 # Streamlit Page Setup
@@ -86,118 +28,355 @@ def extract_info(row) -> dict:
 st.set_page_config(page_title="AI Communication Assistant", layout="wide")
 st.title("📧 AI-Powered Communication Assistant")
 
+# Initialize SQLite DB (creates table if not exists); once per server
+# process rather than on every rerun
+@st.cache_resource(show_spinner=False)
+def init_database():
+    db_helper.init_db()
+
+init_database()
+
 # ---------------------------
 # Load dataset (SQLite integration)
 # ---------------------------
-@st.cache_data
-def load_data(path="data/intern_emails.csv"):
+@st.cache_resource(show_spinner="Loading emails...")
+def load_data(path=INBOX_SOURCE, mtime=None):
+    """
+    Returns (emails, from_db). With the DB available the source is ingested
+    and emails is None: the Inbox pages through SQLite. from_db is False when
+    the DB was unavailable and emails holds the enriched source.
+
+    Runs again only when the source changes (`mtime`); the result is shared
+    across sessions without a copy per rerun, so callers must not modify it.
+    """
     try:
-        # Attempt to load from DB first
-        df = db_helper.load_emails()
-        if df.empty:
-            # If DB empty, fallback to CSV
-            df = pd.read_csv(path)
-            db_helper.save_emails(df)
+        # Stream the source in chunks; only emails the DB has not seen yet are
+        # enriched and stored (mbox / Maildir resume from their checkpoint)
+        if os.path.exists(path):
+            ingest.ingest_path(path)
+        return None, True
     except Exception:
-        # If DB fails, fallback to CSV
-        df = pd.read_csv(path)
-        db_helper.save_emails(df)
-    return df
+        # If DB fails, read the Parquet snapshot when it is newer than the
+        # source, otherwise enrich the source in memory
+        meta = snapshot.read_meta()
+        if meta and meta["written_at"] >= (mtime or 0):
+            df = filter_support_emails(snapshot.read_snapshot(columns=SNAPSHOT_COLUMNS))
+        else:
+            raw = read_frame(path) if source_format(path) else pd.read_csv(path)
+            df = enrich_emails(normalize_columns(raw))
+            df = filter_support_emails(ensure_metadata_columns(df))
+            df["ClusterId"] = cluster_ids(df["Body"])
+        df["ClusterSize"] = df.groupby("ClusterId")["ClusterId"].transform("size")
+        # Same order as the DB inbox: priority rank, then newest first
+        df["PriorityRank"] = df["Priority"].astype(str).map(db_helper.PRIORITY_RANK).fillna(0)
+        df = df.sort_values(by=["PriorityRank", "Sent Date"], ascending=False, kind="stable")
+        return df.drop(columns=["PriorityRank"]).reset_index(drop=True), False
 
 try:
-    df = load_data()
-    df = normalize_columns(df)
+    with PROFILER.span("load_data"):
+        inbox_mtime = source_mtime(INBOX_SOURCE) if os.path.exists(INBOX_SOURCE) else None
+        processed_df, from_db = load_data(INBOX_SOURCE, inbox_mtime)
 except Exception as e:
     st.error(f"Failed to load data: {e}")
     st.stop()
 
-try:
-    processed_df = preprocess.preprocess_emails(df.copy())
-except Exception as e:
-    st.warning("⚠️ Preprocessing failed — using normalized raw data instead.")
-    st.write(f"Preprocess error: {e}")
-    processed_df = df.copy()
-
-
-# ---------------------------
-# Metadata enrichment
-# ---------------------------
-processed_df = ensure_metadata_columns(processed_df)
-processed_df["Priority"] = processed_df["Body"].apply(classify_priority)
-processed_df["Sentiment"] = processed_df["Body"].apply(classify_sentiment)
-
-extracted = processed_df.apply(extract_info, axis=1)
-processed_df["Phone"] = extracted.apply(lambda x: x["Phone"])
-processed_df["AltEmail"] = extracted.apply(lambda x: x["AltEmail"])
-
-processed_df = filter_support_emails(processed_df)
-
-# Sort urgent first
-priority_order = {"Urgent": 1, "Normal": 0}
-processed_df["PriorityRank"] = processed_df["Priority"].map(priority_order).fillna(0)
-processed_df = processed_df.sort_values(by="PriorityRank", ascending=False).reset_index(drop=True)
-processed_df.drop(columns=["PriorityRank"], inplace=True)
+# Load the embedding model / KB index in the background while the page renders
+reply_generator.warm_up()
+
+def filter_frame(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """In-memory equivalent of the DB inbox filters (used when the DB is down)."""
+    mask = pd.Series(True, index=df.index)
+    for key, col in (("priority", "Priority"), ("sentiment", "Sentiment"), ("requirement", "Requirement")):
+        if filters.get(key) and col in df.columns:
+            mask &= df[col].astype(str).isin(filters[key])
+    if filters.get("sender"):
+        mask &= df["From"] == filters["sender"].strip()
+    dates = pd.to_datetime(df["Sent Date"], errors="coerce")
+    if filters.get("date_from"):
+        mask &= dates >= pd.Timestamp(filters["date_from"])
+    if filters.get("date_to"):
+        mask &= dates < pd.Timestamp(filters["date_to"]) + pd.Timedelta(days=1)
+    return df[mask]
+
+def search_frame(df: pd.DataFrame, text: str) -> pd.DataFrame:
+    """Plain substring search over subject and body (used when the DB is down)."""
+    haystack = (df["Subject"].fillna("") + " " + df["Body"].fillna("")).str.lower()
+    mask = pd.Series(True, index=df.index)
+    for word in text.lower().split():
+        mask &= haystack.str.contains(word.strip('"*'), regex=False)
+    return df[mask]
+
+def load_page(filters: dict, cursor, page_size: int, search: str = ""):
+    """
+    (page, next_cursor): a keyset page from the DB, a bm25-ranked page of
+    search results (offset cursor), or an offset page in memory.
+    """
+    if from_db and search:
+        start = cursor or 0
+        page = db_helper.search_emails(search, filters, page_size + 1, start)
+        next_cursor = start + page_size if len(page) > page_size else None
+        return page.iloc[:page_size].set_index("id"), next_cursor
+    if from_db:
+        page, next_cursor = db_helper.fetch_inbox_page(filters, cursor, page_size)
+        return page.set_index("id"), next_cursor
+    matches = filter_frame(search_frame(processed_df, search) if search else processed_df, filters)
+    start = cursor or 0
+    next_cursor = start + page_size if start + page_size < len(matches) else None
+    return matches.iloc[start:start + page_size], next_cursor
 
 # ---------------------------
-# Tabs
+# Cached views (keyed on the data version)
 # ---------------------------
-tab1, tab2 = st.tabs(["📥 Inbox", "📊 Analytics"])
+def data_version():
+    """
+    What cached views are keyed on: the DB write counter, or the source
+    mtime when the DB is down. It only changes when new mail arrives, so widget
+    interactions are served from the caches below.
+    """
+    return db_helper.data_version() if from_db else ("source", inbox_mtime)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_page(version, filters: dict, cursor, page_size: int, search: str = ""):
+    return load_page(filters, cursor, page_size, search)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def inbox_summary(version) -> dict:
+    """Requirement labels for the filter and the urgent count for bulk drafting."""
+    if from_db:
+        return {"requirements": db_helper.requirement_values(), "urgent": db_helper.urgent_count()}
+    requirements = sorted(processed_df["Requirement"].dropna().astype(str).unique()) \
+        if "Requirement" in processed_df.columns else []
+    return {"requirements": requirements, "urgent": int((processed_df["Priority"] == "Urgent").sum())}
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def analytics_data(version, clock: int) -> tuple:
+    """
+    (stats, chart data); aggregates come from SQLite (indexes + daily rollup)
+    when the DB is up. `clock` is the current ANALYTICS_REFRESH bucket.
+    """
+    analytics_df = None if from_db else processed_df
+    return analytics.get_stats(analytics_df), analytics.chart_data(analytics_df)
 
 # ---------------------------
 # Inbox Tab
 # ---------------------------
-with tab1:
+@st.fragment
+def inbox_view():
     st.subheader("Inbox")
-    st.caption("Detected columns: " + ", ".join(processed_df.columns))
-
-    preferred = ["Subject", "Priority", "Sentiment", "From", "Phone", "AltEmail"]
-    display_cols = [c for c in preferred if c in processed_df.columns] or processed_df.columns[:4].tolist()
 
-    st.dataframe(processed_df[display_cols], use_container_width=True)
+    search = st.text_input(
+        "Search subject and body",
+        placeholder='e.g. "password reset", refund*, login AND NOT billing',
+    ).strip()
+
+    # Filters (applied in SQL; each page is fetched once per data version)
+    version = data_version()
+    summary = inbox_summary(version)
+    requirements = summary["requirements"]
+    f1, f2, f3 = st.columns(3)
+    priority_filter = f1.multiselect("Priority", ["Urgent", "High", "Normal"])
+    sentiment_filter = f2.multiselect("Sentiment", ["Positive", "Negative", "Neutral"])
+    requirement_filter = f3.multiselect("Requirement", requirements)
+    f4, f5, f6 = st.columns(3)
+    sender_filter = f4.text_input("Sender (exact address)")
+    date_range = f5.date_input("Sent between", value=[])
+    page_size = f6.selectbox("Page size", [25, 50, 100, 200], index=1)
+
+    filters = {
+        "priority": priority_filter,
+        "sentiment": sentiment_filter,
+        "requirement": requirement_filter,
+        "sender": sender_filter,
+        "date_from": date_range[0] if len(date_range) > 0 else None,
+        "date_to": date_range[1] if len(date_range) > 1 else None,
+        # --all ingests keep non-support emails; the inbox lists support ones
+        "support_only": True,
+    }
+
+    # Cursor of every page visited so far; changing filters starts over
+    filter_key = repr((search, filters, page_size))
+    if st.session_state.get("inbox_filter_key") != filter_key:
+        st.session_state.inbox_filter_key = filter_key
+        st.session_state.inbox_cursors = [None]
+    cursors = st.session_state.inbox_cursors
+
+    with PROFILER.span("inbox_page", search=bool(search)):
+        page_df, next_cursor = cached_page(version, filters, cursors[-1], page_size, search)
+
+    preferred = ["Subject", "Priority", "Sentiment", "From", "Phone", "AltEmail", "ClusterSize"] + \
+        (["Score"] if search else [])
+    display_cols = [c for c in preferred if c in page_df.columns] or page_df.columns[:4].tolist()
+
+    st.caption("Detected columns: " + ", ".join(page_df.columns))
+    st.dataframe(page_df[display_cols], use_container_width=True)
+
+    p1, p2, p3 = st.columns([1, 1, 4])
+    if p1.button("← Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun(scope="fragment")
+    if p2.button("Next →", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun(scope="fragment")
+    p3.caption(f"Page {len(cursors)} · {len(page_df)} emails")
+
+    if "draft_replies" not in st.session_state:
+        st.session_state.draft_replies = {}
+    if "cluster_drafts" not in st.session_state:
+        st.session_state.cluster_drafts = {}
+
+    def cluster_key(value):
+        return None if value is None or pd.isna(value) else int(value)
+
+    # Every stored urgent email, not just the ones on this page; the count
+    # comes from the rollup and the rows are only read on click
+    urgent_count = summary["urgent"]
+    if st.button(f"Draft all urgent ({urgent_count})", disabled=not urgent_count):
+        urgent = db_helper.load_emails({"priority": ["Urgent"]}).set_index("id") if from_db else \
+            processed_df[processed_df["Priority"] == "Urgent"]
+        urgent_idx = urgent.index.tolist()
+        profiles = db_helper.sender_profiles(urgent["From"].tolist()) if from_db else {}
+        histories = [sender_history(profiles.get(sender)) for sender in urgent["From"]]
+        with st.spinner(f"Drafting {len(urgent_idx)} urgent replies..."):
+            replies = reply_generator.generate_replies([
+                {
+                    "subject": row.get("Subject", ""),
+                    "body": row.get("Body", ""),
+                    "sentiment": row.get("Sentiment", "Neutral"),
+                    "priority": row.get("Priority", "Normal"),
+                    "history": history,
+                    # Near-duplicates share one draft
+                    "cluster": cluster_key(row.get("ClusterId")),
+                }
+                for (_, row), history in zip(urgent.iterrows(), histories)
+            ])
+        for idx, reply, history in zip(urgent_idx, replies, histories):
+            st.session_state.draft_replies[idx] = reply
+            row = urgent.loc[idx]
+            share = draft_share_key(cluster_key(row.get("ClusterId")), row.get("Priority", "Normal"),
+                                    row.get("Sentiment", "Neutral"), history)
+            if share is not None and not reply.startswith("(Reply generation failed"):
+                st.session_state.cluster_drafts[share] = reply
+            # Draft areas read their value from this key (set before they are created)
+            st.session_state[f"draft_{idx}"] = reply
+        failed = sum(1 for r in replies if r.startswith("(Reply generation failed"))
+        st.success(f"Drafted {len(replies) - failed} urgent replies" + (f", {failed} failed" if failed else ""))
 
     def format_subject(idx):
-        subj = processed_df.loc[idx, "Subject"] if "Subject" in processed_df.columns else ""
-        sender = processed_df.loc[idx, "From"] if "From" in processed_df.columns else ""
+        subj = page_df.loc[idx, "Subject"] if "Subject" in page_df.columns else ""
+        sender = page_df.loc[idx, "From"] if "From" in page_df.columns else ""
         snippet = (subj[:60] + "...") if isinstance(subj, str) and len(subj) > 60 else subj
         return f"{idx} — {snippet}  ({sender})"
 
-    email_idx = st.selectbox("Select an email:", processed_df.index, format_func=format_subject)
+    email_idx = st.selectbox("Select an email:", page_df.index, format_func=format_subject)
 
     if email_idx is not None:
-        email = processed_df.loc[email_idx]
+        email = page_df.loc[email_idx]
         st.markdown(f"### 📌 Subject: {email.get('Subject', '(no subject)')}")
         st.markdown(f"**From:** {email.get('From', '')}")
         st.markdown(f"**Phone:** {email.get('Phone','')}")
         st.markdown(f"**Alt Email:** {email.get('AltEmail','')}")
+        # One primary-key lookup in sender_profiles (kept up to date on ingest)
+        profile = db_helper.sender_profile(email.get("From")) if from_db else None
+        if profile:
+            with st.expander(f"Sender history: {profile['count']} emails, "
+                             f"last on {(profile['last_seen'] or '?')[:10]}"):
+                h1, h2, h3 = st.columns(3)
+                for col, key in ((h1, "sentiment"), (h2, "priority"), (h3, "requirement")):
+                    col.caption(key.title())
+                    col.write(", ".join(f"{label} {n}" for label, n in profile[key].items()) or "—")
+                if profile["phones"] or profile["alt_emails"]:
+                    st.caption("Known phones: " + (", ".join(profile["phones"]) or "—") +
+                               " · Known alternate emails: " + (", ".join(profile["alt_emails"]) or "—"))
+                recent = db_helper.get_emails(profile["recent_ids"])
+                recent = recent.loc[[i for i in profile["recent_ids"] if i in recent.index]]   # newest first
+                st.dataframe(recent[["Sent Date", "Subject", "Priority", "Sentiment", "Requirement"]],
+                             use_container_width=True)
         st.text_area("Email body", value=email.get("Body", ""), height=200)
         st.markdown(f"**Priority:** {email.get('Priority','')} | **Sentiment:** {email.get('Sentiment','')}")
-
-        if "draft_replies" not in st.session_state:
-            st.session_state.draft_replies = {}
-
-        if st.button("Generate Reply"):
-            with st.spinner("Generating reply..."):
-                try:
-                    reply = reply_generator.generate_reply(
-                        subject=email.get("Subject", ""),
-                        body=email.get("Body", ""),
-                        sentiment=email.get("Sentiment", "Neutral"),
-                        priority=email.get("Priority", "Normal")
-                    )
-                except Exception as e:
-                    reply = f"(Reply generation failed: {e})"
+        history = sender_history(profile)
+        share = draft_share_key(cluster_key(email.get("ClusterId")), email.get("Priority", "Normal"),
+                                email.get("Sentiment", "Neutral"), history)
+        copies = int(email.get("ClusterSize") or 1) if pd.notna(email.get("ClusterSize")) else 1
+        if copies > 1:
+            st.caption(f"Near-duplicate of {copies - 1} other emails; those with the same priority, sentiment "
+                       "and sender history share one draft.")
+
+        if "draft_status" not in st.session_state:
+            st.session_state.draft_status = {}
+
+        g1, g2 = st.columns([1, 5])
+        generate = g1.button("Generate Reply")
+        # Any click reruns the script, which interrupts a stream in progress;
+        # the partial draft is kept
+        g2.button("Stop", key="stop_reply")
+        draft_area = st.empty()
+
+        if generate:
+            parts, start, first_token, error = [], time.perf_counter(), None, None
+            st.session_state.draft_status[email_idx] = "streaming"
+            stream = reply_generator.stream_reply(
+                subject=email.get("Subject", ""),
+                body=email.get("Body", ""),
+                sentiment=email.get("Sentiment", "Neutral"),
+                priority=email.get("Priority", "Normal"),
+                history=history,
+            )
+            try:
+                for chunk in stream:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    parts.append(chunk)
+                    st.session_state.draft_replies[email_idx] = "".join(parts)
+                    st.session_state[f"draft_{email_idx}"] = "".join(parts)
+                    draft_area.markdown("".join(parts) + "▌")
+            except reply_generator.ReplyGenerationError as e:
+                error = e
+            finally:
+                stream.close()
+            reply = "".join(parts).strip()
+            if reply or error is None:
                 st.session_state.draft_replies[email_idx] = reply
-
-        draft = st.session_state.draft_replies.get(email_idx, "")
-        st.text_area("✍️ Draft Reply", value=draft, height=200, key=f"draft_{email_idx}")
+                st.session_state[f"draft_{email_idx}"] = reply
+            if error is not None:
+                # A partial draft stays with this email only; it is never shared with the cluster
+                st.session_state.draft_status[email_idx] = f"Reply generation failed: {error}" + (
+                    " The partial draft is kept." if reply else "")
+            else:
+                if share is not None:
+                    st.session_state.cluster_drafts[share] = reply
+                st.session_state.draft_status[email_idx] = (
+                    f"First token after {first_token or 0:.2f}s, done in {time.perf_counter() - start:.2f}s")
+
+        # The widget reads its value from session state only (no `value=`, which
+        # Streamlit rejects next to a key set through the Session State API).
+        # Seed it with the draft made this session, else for a near-duplicate,
+        # else by the background worker
+        draft_key = f"draft_{email_idx}"
+        if draft_key not in st.session_state:
+            stored = email.get("Draft")
+            st.session_state[draft_key] = st.session_state.draft_replies.get(email_idx) or \
+                st.session_state.cluster_drafts.get(share) or (stored if isinstance(stored, str) else "")
+        draft_area.text_area("✍️ Draft Reply", height=200, key=draft_key)
+        status = st.session_state.draft_status.get(email_idx)
+        if status == "streaming":
+            st.caption("Generation stopped; the partial draft is kept.")
+        elif status:
+            st.caption(status)
+
+        cache = reply_generator.cache_stats()
+        if cache:
+            st.caption(f"Reply cache: {cache['hits']} hits / {cache['misses']} misses "
+                       f"({cache['entries']} stored drafts)")
 
 # ---------------------------
 # Analytics Tab
 # ---------------------------
-with tab2:
+@st.fragment
+def analytics_view():
     st.subheader("Email Analytics")
     try:
-        stats = analytics.get_stats(processed_df)
+        with PROFILER.span("analytics"):
+            stats, charts = analytics_data(data_version(), int(time.time() // ANALYTICS_REFRESH))
         st.metric("Total Emails", stats["Total Emails"])
         st.metric("Last 24h", stats["Last 24h"])
         st.metric("Urgent", stats["Urgent"])
@@ -208,8 +387,60 @@ with tab2:
         st.metric("Neutral", stats["Neutral"])
 
         # Show enhanced charts
-        analytics.show_charts(processed_df)
+        analytics.show_charts(data=charts)
 
     except Exception as e:
         st.warning("Analytics module raised an error or returned nothing.")
         st.write(f"Analytics error: {e}")
+
+# ---------------------------
+# Performance Tab
+# ---------------------------
+@st.fragment
+def performance_view():
+    st.subheader("Performance")
+    if from_db:
+        # Background drafting by python -m src.worker
+        queue = db_helper.draft_queue_stats()
+        q1, q2, q3, q4 = st.columns(4)
+        q1.metric("Drafts queued", queue["queued"],
+                  help=", ".join(f"{k}: {v}" for k, v in queue["queued_by_priority"].items()) or None)
+        q2.metric("Drafting now", queue["leased"])
+        q3.metric("Drafts ready", queue["done"])
+        q4.metric("Drafts failed", queue["failed"])
+    if not PROFILER.enabled:
+        st.info("Profiling is disabled (APP_PROFILE=0).")
+    else:
+        summary = PROFILER.summary()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Recorded spans", len(PROFILER.records))
+        c2.metric("LLM tokens/s", f"{PROFILER.tokens_per_second():.1f}")
+        first_token = summary.loc[summary["stage"] == "llm_first_token", "p50_ms"]
+        c3.metric("Time to first token (p50)", f"{first_token.iloc[0]:.0f} ms" if len(first_token) else "–")
+        track_memory = c4.checkbox("Track memory (tracemalloc)", value=PROFILER.memory)
+        if track_memory != PROFILER.memory:
+            PROFILER.set_memory(track_memory)
+        if summary.empty:
+            st.caption("No timings yet: interact with the Inbox or generate a reply.")
+        else:
+            # Latency per stage over the last spans (rolling window)
+            st.dataframe(summary.round(2), use_container_width=True, hide_index=True)
+            st.bar_chart(summary.set_index("stage")[["p50_ms", "p95_ms"]])
+        # The tab is a fragment: inbox reruns don't redraw it
+        r1, r2 = st.columns([1, 6])
+        r1.button("Refresh")
+        if r2.button("Clear timings"):
+            PROFILER.clear()
+            st.rerun(scope="fragment")
+
+# ---------------------------
+# Tabs
+# ---------------------------
+tab1, tab2, tab3 = st.tabs(["📥 Inbox", "📊 Analytics", "⏱️ Performance"])
+with tab1:
+    inbox_view()
+with tab2:
+    analytics_view()
+with tab3:
+    performance_view()
+
@@ -0,0 +1,149 @@
+# benchmarks/db_concurrency.py
+"""
+Concurrent read/write throughput of the emails database: the old
+connect-per-call setup (default rollback journal) against the pooled,
+WAL-tuned connections of src.db_helper.
+
+Sessions run in two patterns: long-lived threads, and a fresh thread per
+rerun doing `--ops-per-rerun` operations, which is how Streamlit runs a
+script (every rerun gets a new ScriptRunner thread). The pool is shared
+across threads, so the second pattern reuses warm connections too; the
+report counts the connections each setup opened.
+
+    python -m benchmarks.db_concurrency --threads 16 --seconds 5
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import pandas as pd
+from src import db_helper
+
+# One inbox page, as a session would request it
+READ_SQL = "SELECT id, sender, subject, priority FROM emails WHERE sent_date >= ? ORDER BY sent_date DESC LIMIT 50"
+WRITE_SQL = "UPDATE emails SET sentiment = ? WHERE id = ?"
+
+def _seed(path: str, rows: int):
+    db_helper.DB_PATH = path
+    db_helper.init_db()
+    now = pd.Timestamp.now()
+    df = pd.DataFrame({
+        "From": [f"user{i % 500}@example.com" for i in range(rows)],
+        "Subject": [f"Support request {i}" for i in range(rows)],
+        "Body": [f"Body of message {i}" for i in range(rows)],
+        "Sent Date": [now - pd.Timedelta(minutes=i) for i in range(rows)],
+        "Priority": ["Urgent" if i % 5 == 0 else "Normal" for i in range(rows)],
+        "Sentiment": ["Neutral"] * rows,
+    })
+    db_helper.ingest_emails(df)
+    db_helper.close_connection()
+
+_legacy_opened = 0
+
+def _legacy_connect(path):
+    global _legacy_opened
+    _legacy_opened += 1
+    return sqlite3.connect(path)
+
+def _legacy_read(path, params):
+    conn = _legacy_connect(path)
+    conn.execute(READ_SQL, params).fetchall()
+    conn.close()
+
+def _legacy_write(path, params):
+    conn = _legacy_connect(path)
+    conn.execute(WRITE_SQL, params)
+    conn.commit()
+    conn.close()
+
+def _pooled_read(path, params):
+    db_helper.query(READ_SQL, params)
+
+def _pooled_write(path, params):
+    db_helper.execute(WRITE_SQL, params)
+
+def _run(path: str, read, write, threads: int, seconds: float, write_every: int, rows: int,
+         ops_per_rerun: int = None) -> dict:
+    """Run `threads` sessions for `seconds`; with `ops_per_rerun`, each session starts a new thread per rerun."""
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+    since = (pd.Timestamp.now() - pd.Timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    opened = db_helper.pool_stats()["opened"], _legacy_opened
+
+    def work(n, i, limit):
+        reads = writes = errors = 0
+        while time.perf_counter() < stop and i < limit:
+            i += 1
+            try:
+                if i % write_every == 0:
+                    write(path, ("Positive" if i % 2 else "Neutral", (n * 7919 + i) % rows + 1))
+                    writes += 1
+                else:
+                    read(path, (since,))
+                    reads += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts["reads"] += reads
+            counts["writes"] += writes
+            counts["errors"] += errors
+
+    def session(n):
+        if ops_per_rerun is None:
+            work(n, 0, float("inf"))
+            return
+        i = 0
+        while time.perf_counter() < stop:
+            rerun = threading.Thread(target=work, args=(n, i, i + ops_per_rerun))
+            rerun.start()
+            rerun.join()
+            i += ops_per_rerun
+
+    workers = [threading.Thread(target=session, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return {
+        "reads_per_sec": counts["reads"] / seconds,
+        "writes_per_sec": counts["writes"] / seconds,
+        "errors": counts["errors"],
+        "connections": db_helper.pool_stats()["opened"] - opened[0] + _legacy_opened - opened[1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent SQLite access.")
+    parser.add_argument("--threads", type=int, default=16, help="simultaneous sessions")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--write-every", type=int, default=10, help="one write per N operations")
+    parser.add_argument("--ops-per-rerun", type=int, default=5, help="operations per rerun thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, read, write in (("connect-per-call", _legacy_read, _legacy_write),
+                                  ("pooled WAL", _pooled_read, _pooled_write)):
+            path = os.path.join(tmp, f"{name.replace(' ', '_')}.db")
+            _seed(path, args.rows)
+            if name == "connect-per-call":
+                # The old setup never enabled WAL
+                conn = sqlite3.connect(path)
+                conn.execute("PRAGMA journal_mode = DELETE")
+                conn.close()
+            for pattern, ops in (("long-lived", None), ("per-rerun", args.ops_per_rerun)):
+                results[f"{name}, {pattern}"] = _run(path, read, write, args.threads, args.seconds,
+                                                     args.write_every, args.rows, ops)
+            db_helper.close_connection()
+
+    print(f"{args.threads} sessions, {args.seconds:.0f}s, 1 write per {args.write_every} ops, "
+          f"{args.ops_per_rerun} ops per rerun thread")
+    for name, r in results.items():
+        print(f"{name:>30}: {r['reads_per_sec']:>9.0f} reads/s  {r['writes_per_sec']:>8.0f} writes/s"
+              f"  {r['errors']} lock errors  {r['connections']:,} connections opened")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/load_formats.py
+"""
+Cold-start load times of the enriched inbox from CSV, SQLite and the
+month-partitioned Parquet snapshot (src/snapshot.py): full loads, the
+analytics projection (Priority, Sentiment, Sent Date) and one month of
+emails. Everything runs in a temporary directory.
+
+    python -m benchmarks.load_formats --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+from benchmarks.synthetic import generate_emails
+from src import db_helper, snapshot
+from src.preprocess import enrich_emails, normalize_columns
+
+ANALYTICS_COLUMNS = ["Priority", "Sentiment", "Sent Date"]
+
+def _size_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2**20
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files) / 2**20
+
+def _time(rows: list, fmt: str, case: str, func, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - start)
+    rows.append({"format": fmt, "case": case, "seconds": best, "rows": len(out)})
+    print(f"  {fmt:<8} {case:<22} {best:>8.2f} s  {len(out):>10,} rows", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inbox load times from CSV, SQLite and Parquet.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--month", default="2025-06", help="month read by the date-range cases")
+    args = parser.parse_args()
+
+    month_start = pd.Timestamp(args.month + "-01")
+    month_end = month_start + pd.offsets.MonthEnd(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        raw_csv = os.path.join(workdir, "raw.csv")
+        enriched_csv = os.path.join(workdir, "enriched.csv")
+        snap_dir = os.path.join(workdir, "snapshot")
+        db_helper.DB_PATH = os.path.join(workdir, "emails.db")
+
+        print(f"Preparing {args.rows:,} emails...", flush=True)
+        generate_emails(args.rows, args.seed).to_csv(raw_csv, index=False)
+        enriched = enrich_emails(normalize_columns(pd.read_csv(raw_csv)))
+        enriched.to_csv(enriched_csv, index=False)
+        db_helper.init_db()
+        start = time.perf_counter()
+        db_helper.ingest_emails(enriched)
+        print(f"  SQLite ingest {time.perf_counter() - start:.1f}s", flush=True)
+        del enriched
+        result = snapshot.write_snapshot(snap_dir)
+        print(f"  Parquet snapshot {result['seconds']:.1f}s ({result['rows']:,} rows)\n", flush=True)
+
+        def read_csv(columns=None):
+            df = pd.read_csv(enriched_csv, usecols=columns)
+            df["Sent Date"] = pd.to_datetime(df["Sent Date"], errors="coerce")
+            return df
+
+        def csv_month():
+            df = read_csv()
+            return df[df["Sent Date"].between(month_start, month_end + pd.Timedelta(days=1), inclusive="left")]
+
+        month_filter = {"date_from": month_start, "date_to": month_end}
+        rows, r = [], args.repeat
+        _time(rows, "csv", "raw + enrich", lambda: enrich_emails(normalize_columns(pd.read_csv(raw_csv))), 1)
+        _time(rows, "csv", "full", read_csv, r)
+        _time(rows, "csv", "analytics columns", lambda: read_csv(ANALYTICS_COLUMNS), r)
+        _time(rows, "csv", "one month", csv_month, r)
+        _time(rows, "sqlite", "full", db_helper.load_emails, r)
+        _time(rows, "sqlite", "analytics columns", lambda: db_helper.query_df(
+            'SELECT priority AS Priority, sentiment AS Sentiment, sent_date AS "Sent Date" FROM emails'), r)
+        _time(rows, "sqlite", "one month", lambda: db_helper.load_emails(month_filter), r)
+        _time(rows, "parquet", "full", lambda: snapshot.read_snapshot(snap_dir), r)
+        _time(rows, "parquet", "analytics columns",
+              lambda: snapshot.read_snapshot(snap_dir, columns=ANALYTICS_COLUMNS), r)
+        _time(rows, "parquet", "one month",
+              lambda: snapshot.read_snapshot(snap_dir, date_from=month_start, date_to=month_end), r)
+
+        report = pd.DataFrame(rows).pivot(index="case", columns="format", values="seconds")
+        print("\nseconds (best of", r, "runs)")
+        print(report.round(3).to_string())
+        print(f"\non disk: csv {_size_mb(enriched_csv):,.1f} MB, sqlite {_size_mb(db_helper.DB_PATH):,.1f} MB "
+              f"(with indexes, FTS and clusters), parquet {_size_mb(snap_dir):,.1f} MB")
+        db_helper.close_connection()
+
+if __name__ == "__main__":
+    main()
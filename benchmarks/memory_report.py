@@ -0,0 +1,47 @@
+# benchmarks/memory_report.py
+"""
+Memory of the processed inbox: the original layout (object strings
+everywhere, Phone as a per-row list of matches, a materialized Preview
+column) against the compact frame from enrich_emails (categorical labels,
+Arrow-backed text, flat first-match contact columns, previews on demand).
+
+    python -m benchmarks.memory_report --rows 1000000
+"""
+import argparse
+import time
+import pandas as pd
+from benchmarks.synthetic import generate_emails
+from src.preprocess import PHONE_PATTERN, _contact_text, enrich_emails, normalize_columns, preview_text
+
+def legacy_layout(df: pd.DataFrame) -> pd.DataFrame:
+    """The same emails in the layout the original preprocess_emails produced."""
+    legacy = df.astype({c: object for c in df.columns if c != "Sent Date"})
+    legacy["Phone"] = [PHONE_PATTERN.findall(t) for t in _contact_text(df)]
+    legacy["Preview"] = preview_text(df["Body"]).astype(object)
+    return legacy
+
+def column_bytes(df: pd.DataFrame) -> pd.Series:
+    return df.memory_usage(deep=True, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare processed-inbox memory before and after compaction.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = normalize_columns(generate_emails(args.rows, args.seed))
+    start = time.perf_counter()
+    compact = enrich_emails(df)
+    elapsed = time.perf_counter() - start
+    before, after = column_bytes(legacy_layout(compact)), column_bytes(compact)
+
+    report = pd.DataFrame({"before_mb": before / 2**20, "after_mb": after / 2**20}).fillna(0.0)
+    report["dtype_after"] = pd.Series({c: str(compact[c].dtype) for c in compact.columns})
+    report["ratio"] = report["before_mb"] / report["after_mb"].where(report["after_mb"] > 0)
+    print(f"{args.rows:,} emails (enriched in {elapsed:.1f}s)\n")
+    print(report.round(2).to_string())
+    total_before, total_after = before.sum() / 2**20, after.sum() / 2**20
+    print(f"\ntotal: {total_before:,.1f} MB -> {total_after:,.1f} MB (x{total_before / total_after:.1f} smaller)")
+
+if __name__ == "__main__":
+    main()
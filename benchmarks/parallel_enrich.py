@@ -0,0 +1,62 @@
+# benchmarks/parallel_enrich.py
+"""
+Enrichment throughput by worker count: the serial path against
+src.parallel.ParallelEnricher for the inbox enrichment (enrich_emails) and
+the TextBlob-based tagging in src.email_retriever. Every parallel result is
+checked to be identical to the serial one.
+
+    python -m benchmarks.parallel_enrich --rows 100000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import time
+import pandas as pd
+from src.email_retriever import tag_emails
+from src.parallel import ParallelEnricher
+from src.preprocess import enrich_emails
+
+SUBJECTS = ["Help required with account verification", "Query about product pricing",
+            "Urgent request: system access blocked", "Support needed for login issue",
+            "General query about subscription", "Critical help needed for downtime"]
+SENTENCES = ["I cannot access my account since this morning.", "Thanks for the great support last week!",
+             "The invoice shows a billing error, please fix it asap.", "Password reset is not working.",
+             "Call me at +1 555-123-4567 or write to backup.me@example.org.", "This delay is terrible.",
+             "Could you share the API documentation?", "I am happy with the product so far."]
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    start = pd.Timestamp("2025-01-01")
+    return pd.DataFrame({
+        "From": [f"user{rng.randrange(5000)}@example.com" for _ in range(rows)],
+        "Subject": [rng.choice(SUBJECTS) for _ in range(rows)],
+        "Body": [" ".join(rng.choices(SENTENCES, k=rng.randint(2, 6))) for _ in range(rows)],
+        "Sent Date": [start + pd.Timedelta(minutes=rng.randrange(500_000)) for _ in range(rows)],
+    })
+
+def _time(func, df: pd.DataFrame) -> tuple:
+    start = time.perf_counter()
+    out = func(df.copy())
+    return out, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel enrichment.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--shard-rows", type=int, default=5_000)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"{args.rows:,} rows, {os.cpu_count()} CPUs, {args.shard_rows:,} rows per shard")
+    for name, func in (("enrich_emails", enrich_emails), ("tag_emails (TextBlob)", tag_emails)):
+        expected, serial = _time(func, df)
+        print(f"\n{name}: serial {args.rows / serial:>10,.0f} rows/s")
+        for workers in args.workers:
+            with ParallelEnricher(func, workers, args.shard_rows) as enricher:
+                enricher(df.head(args.shard_rows + 1).copy())  # start the pool outside the timing
+                out, elapsed = _time(enricher, df)
+            pd.testing.assert_frame_equal(out, expected)
+            print(f"  {workers:>2} workers {args.rows / elapsed:>10,.0f} rows/s  x{serial / elapsed:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# benchmarks/suite.py
+"""
+Benchmark suite for the hot paths of the app, run on seeded synthetic
+inboxes (benchmarks/synthetic.py) at several sizes. Everything runs in a
+temporary directory (CSV, SQLite DB, KB and its index); LLM calls go to the
+local stub in src/llm_stub.py. Results are written as JSON and can be
+compared with an earlier run:
+
+    python -m benchmarks.suite --sizes 1k 100k 1M
+    python -m benchmarks.suite --sizes 1k 100k --compare benchmarks/results/previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import pandas as pd
+from benchmarks.synthetic import generate_emails, generate_kb, write_kb
+from src import analytics, db_helper
+from src.classifier import classify_columns
+from src.llm_stub import start_stub_server
+from src.preprocess import (INBOX_PRIORITY_CLASSIFIER, INBOX_SENTIMENT_CLASSIFIER, REQUIREMENT_CLASSIFIER,
+                            filter_support_emails, normalize_columns, preprocess_emails)
+from src.rag import RAG
+
+RESULTS_DIR = "benchmarks/results"
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    if text[-1] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+def _timed(results: dict, name: str, func, rows: int = None, repeat: int = 1):
+    """Run `func` `repeat` times, record the fastest run and return its last result."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - start)
+    entry = {"seconds": round(best, 6)}
+    if rows:
+        entry["rows"] = rows
+        entry["rows_per_sec"] = round(rows / best, 1) if best else None
+    results[name] = entry
+    print(f"  {name:<24} {best * 1000:>11.1f} ms" + (f"  {rows / best:>12,.0f} rows/s" if rows and best else ""),
+          flush=True)
+    return out
+
+def run_size(rows: int, workdir: str, seed: int, kb_docs: int, queries: int) -> dict:
+    results = {}
+    repeat = 5 if rows <= 10_000 else 1
+    csv_path = os.path.join(workdir, f"emails_{rows}.csv")
+    generate_emails(rows, seed).to_csv(csv_path, index=False)
+
+    raw = _timed(results, "csv_load", lambda: pd.read_csv(csv_path), rows, repeat)
+    df = _timed(results, "normalize_columns", lambda: normalize_columns(raw), rows, repeat)
+    enriched = _timed(results, "preprocess_emails", lambda: preprocess_emails(df), rows, repeat)
+    classifiers = {"Requirement": REQUIREMENT_CLASSIFIER, "Priority": INBOX_PRIORITY_CLASSIFIER,
+                   "Sentiment": INBOX_SENTIMENT_CLASSIFIER}
+    _timed(results, "classification", lambda: classify_columns(df["Body"], classifiers), rows, repeat)
+    support = _timed(results, "filter_support_emails", lambda: filter_support_emails(enriched), rows, repeat)
+
+    # Fresh database per size; support rows only, as the app stores them
+    db_helper.DB_PATH = os.path.join(workdir, f"emails_{rows}.db")
+    db_helper.init_db()
+    _timed(results, "db_save", lambda: db_helper.ingest_emails(support), len(support))
+    _timed(results, "db_save_duplicates", lambda: db_helper.ingest_emails(support), len(support))
+    _timed(results, "db_load", db_helper.load_emails, len(support))
+    # The filter sets the Inbox sends: the default page, and urgent emails only
+    _timed(results, "db_inbox_page", lambda: db_helper.fetch_inbox_page({"support_only": True}), None, 5)
+    _timed(results, "db_inbox_page_urgent",
+           lambda: db_helper.fetch_inbox_page({"support_only": True, "priority": ["Urgent"]}), None, 5)
+    _timed(results, "db_search", lambda: db_helper.search_emails('"password reset" OR invoice*'), None, 5)
+    _timed(results, "get_stats_sql", analytics.get_stats, len(support), repeat)
+    _timed(results, "get_stats_frame", lambda: analytics.get_stats(support), len(support), repeat)
+
+    # KB retrieval against a generated KB (BM25 without sentence-transformers)
+    kb_path = os.path.join(workdir, "kb.csv")
+    if not os.path.exists(kb_path):
+        write_kb(kb_path, generate_kb(kb_docs, seed))
+    rag = RAG(api_key="bench", use_cache=False, kb_path=kb_path, index_dir=os.path.join(workdir, f"kb_index_{rows}"))
+    _timed(results, "rag_kb_load", rag.warm_up)
+    bodies = support["Body"].head(queries).tolist()
+    _timed(results, "rag_retrieve_context", lambda: [rag.retrieve_context(b) for b in bodies], len(bodies))
+    _timed(results, "rag_retrieve_batch", lambda: rag.retrieve_context_batch(bodies), len(bodies))
+    results["_info"] = {"rows": rows, "support_rows": len(support), "kb_docs": kb_docs,
+                        "retrieval": "embedding" if rag.kb_embs is not None else "bm25"}
+    db_helper.close_connection()
+    return results
+
+def run_llm(workdir: str, seed: int, emails: int, latency: float, concurrency: int) -> dict:
+    """Bulk reply drafting against the stub LLM (fixed per-request latency)."""
+    results = {}
+    server, base_url = start_stub_server(latency=latency)
+    try:
+        kb_path = os.path.join(workdir, "kb.csv")
+        rag = RAG(api_key="bench", base_url=base_url, use_cache=False, kb_path=kb_path,
+                  index_dir=os.path.join(workdir, "kb_index"))
+        sample = filter_support_emails(normalize_columns(generate_emails(emails * 2, seed))).head(emails)
+        batch = [{"subject": r.Subject, "body": r.Body, "sentiment": "Neutral", "priority": "Normal"}
+                 for r in sample.itertuples()]
+        rag.warm_up()
+        _timed(results, "llm_generate_replies", lambda: rag.generate_replies(batch, max_concurrency=concurrency),
+               len(batch))
+        results["_info"] = {"emails": len(batch), "stub_latency": latency, "max_concurrency": concurrency,
+                            "requests": server.request_count}
+    finally:
+        server.shutdown()
+    return results
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return ""
+
+def compare(current: dict, baseline: dict, threshold: float):
+    """Print per-metric time ratios against a baseline run; flag slowdowns above `threshold`."""
+    print(f"\nCompared with {baseline['meta'].get('timestamp')} ({baseline['meta'].get('commit') or 'unknown'}):")
+    for section, timings in current["results"].items():
+        old_section = baseline["results"].get(section, {})
+        for name, entry in timings.items():
+            old = old_section.get(name)
+            if name.startswith("_") or not old:
+                continue
+            ratio = entry["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+            flag = "  SLOWER" if ratio > 1 + threshold else ("  faster" if ratio < 1 - threshold else "")
+            print(f"  {section:>6} {name:<24} {old['seconds'] * 1000:>10.1f} -> {entry['seconds'] * 1000:>10.1f} ms"
+                  f"  x{ratio:.2f}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the performance benchmark suite.")
+    parser.add_argument("--sizes", nargs="+", default=["1k", "100k", "1M"], help="inbox sizes, e.g. 1k 100k 1M")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kb-docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200, help="retrieval queries per size")
+    parser.add_argument("--llm-emails", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub seconds per completion")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--out", help=f"JSON results path (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported by --compare")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            rows = parse_size(size)
+            print(f"\n{size} ({rows:,} emails)")
+            report["results"][size] = run_size(rows, workdir, args.seed, args.kb_docs, args.queries)
+        print("\nLLM (stub)")
+        report["results"]["llm"] = run_llm(workdir, args.seed, args.llm_emails, args.llm_latency,
+                                           args.llm_concurrency)
+
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f), args.threshold)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# benchmarks/synthetic.py
+"""
+Seeded synthetic inboxes and knowledge bases for benchmarks.
+
+The same seed always yields the same data. Emails use the headers of
+data/intern_emails.csv (sender, subject, body, sent_date) and mix support
+and non-support subjects, urgent / negative / positive wording, contact
+details and exact re-sent duplicates at configurable rates.
+
+    python -m benchmarks.synthetic emails.csv --rows 100000 --kb kb.csv --kb-docs 5000
+    python -m benchmarks.synthetic inbox.mbox --rows 100000      # or a Maildir directory: --maildir
+"""
+import mailbox
+from email.message import EmailMessage
+from email.utils import format_datetime
+import numpy as np
+import pandas as pd
+
+SUPPORT_SUBJECTS = [
+    "Help required with account verification", "Query about product pricing",
+    "Urgent request: system access blocked", "Support needed for login issue",
+    "General query about subscription", "Critical help needed for downtime",
+    "Request for invoice correction", "Need help with API integration",
+    "Support: password reset not working", "Billing query for last month",
+]
+OTHER_SUBJECTS = [
+    "Weekly newsletter", "Meeting notes from Tuesday", "Team lunch on Friday",
+    "Partnership proposal", "Your order has shipped", "Quarterly report draft",
+    "Welcome to the community", "Event invitation", "Product roadmap update",
+]
+URGENT_SENTENCES = [
+    "I cannot access my account and need this fixed immediately.",
+    "This is urgent, our whole team is blocked.", "Please respond asap, production is down.",
+    "Critical outage on our side since the last release.",
+]
+NEGATIVE_SENTENCES = [
+    "I am really frustrated with the repeated delays.", "This is the worst experience so far.",
+    "We are disappointed, the service has been terrible this week.",
+]
+POSITIVE_SENTENCES = [
+    "Thanks for the great support last time.", "Thank you, the team has been excellent.",
+    "We love the new dashboard, happy customers here.",
+]
+NEUTRAL_SENTENCES = [
+    "Could you share the API documentation for the reports endpoint?",
+    "The invoice for last month shows a different amount than expected.",
+    "I would like to understand the pricing tiers for larger teams.",
+    "Password reset emails are not arriving in my inbox.",
+    "We plan to integrate with our CRM next quarter.",
+    "Is there a way to export all tickets as CSV?",
+    "Our login page shows an error after the update.",
+    "Please confirm whether payments by bank transfer are supported.",
+]
+DOMAINS = ["example.com", "customer.com", "startup.io", "client.co", "partner.org", "mail.net"]
+FIRST_NAMES = ["alice", "bob", "charlie", "diana", "eve", "frank", "grace", "heidi", "ivan", "judy"]
+
+KB_TOPICS = [
+    ("password", "Customers can reset their password for {product} by clicking 'Forgot Password' on the login page."),
+    ("billing", "Invoices for {product} are issued on the {day} of each month and can be paid by card or transfer."),
+    ("refund", "Refunds for {product} are processed within {n} business days after approval."),
+    ("api", "The {product} API documentation lists {n} endpoints and is available on the developer portal."),
+    ("integration", "{product} integrates with third-party CRMs like Salesforce, HubSpot and Zoho."),
+    ("support", "Our support team answers {product} tickets within {n} hours, urgent issues 24/7."),
+    ("export", "{product} data can be exported as CSV or JSON from the settings page."),
+    ("login", "If login to {product} fails after an update, clear the browser cache and retry."),
+]
+PRODUCTS = ["Acme CRM", "Acme Mail", "Acme Analytics", "Acme Pay", "Acme Desk", "Acme Cloud", "Acme Chat"]
+
+def generate_emails(rows: int, seed: int = 0, support_rate: float = 0.6, urgent_rate: float = 0.15,
+                    negative_rate: float = 0.1, positive_rate: float = 0.15, contact_rate: float = 0.2,
+                    duplicate_rate: float = 0.05, senders: int = 5000) -> pd.DataFrame:
+    """
+    A seeded synthetic inbox of `rows` emails. Sender activity is skewed
+    (a few senders write most emails) and `duplicate_rate` of the rows are
+    exact copies of earlier ones, like re-sent or re-exported messages.
+    """
+    rng = np.random.default_rng(seed)
+    n_unique = rows - int(rows * duplicate_rate)
+
+    # Zipf-like sender popularity
+    weights = 1.0 / np.arange(1, senders + 1)
+    sender_ids = rng.choice(senders, size=n_unique, p=weights / weights.sum())
+    sender_names = [f"{FIRST_NAMES[i % len(FIRST_NAMES)]}.{i}@{DOMAINS[i % len(DOMAINS)]}" for i in range(senders)]
+
+    support = rng.random(n_unique) < support_rate
+    support_pick = rng.integers(len(SUPPORT_SUBJECTS), size=n_unique)
+    other_pick = rng.integers(len(OTHER_SUBJECTS), size=n_unique)
+    subjects = [SUPPORT_SUBJECTS[s] if is_support else OTHER_SUBJECTS[o]
+                for is_support, s, o in zip(support, support_pick, other_pick)]
+
+    tone = rng.random((n_unique, 4))
+    n_sentences = rng.integers(1, 4, size=n_unique)
+    neutral_pick = rng.integers(len(NEUTRAL_SENTENCES), size=(n_unique, 3))
+    extra_pick = rng.integers(100, size=(n_unique, 3))
+    phones = rng.integers(1_000_000, 9_999_999, size=n_unique)
+    bodies = []
+    for i in range(n_unique):
+        parts = [NEUTRAL_SENTENCES[j] for j in neutral_pick[i, :n_sentences[i]]]
+        if tone[i, 0] < urgent_rate:
+            parts.insert(0, URGENT_SENTENCES[extra_pick[i, 0] % len(URGENT_SENTENCES)])
+        if tone[i, 1] < negative_rate:
+            parts.append(NEGATIVE_SENTENCES[extra_pick[i, 1] % len(NEGATIVE_SENTENCES)])
+        elif tone[i, 2] < positive_rate:
+            parts.append(POSITIVE_SENTENCES[extra_pick[i, 2] % len(POSITIVE_SENTENCES)])
+        if tone[i, 3] < contact_rate:
+            parts.append(f"You can call me at +1 555-{phones[i] // 10000:03d}-{phones[i] % 10000:04d} "
+                         f"or write to backup{i}@{DOMAINS[i % len(DOMAINS)]}.")
+        bodies.append(" ".join(parts))
+
+    start = pd.Timestamp("2025-01-01")
+    offsets = np.sort(rng.integers(0, 365 * 24 * 3600, size=n_unique))
+    dates = (start + pd.to_timedelta(offsets, unit="s")).strftime("%Y-%m-%d %H:%M:%S")
+
+    df = pd.DataFrame({
+        "sender": [sender_names[i] for i in sender_ids],
+        "subject": subjects,
+        "body": bodies,
+        "sent_date": dates,
+    })
+    if rows > n_unique:
+        dupes = df.iloc[rng.integers(n_unique, size=rows - n_unique)]
+        df = pd.concat([df, dupes], ignore_index=True)
+        df = df.iloc[rng.permutation(rows)].reset_index(drop=True)
+    return df
+
+def generate_kb(docs: int, seed: int = 0) -> list:
+    """`docs` distinct knowledge-base entries built from topic templates."""
+    rng = np.random.default_rng(seed)
+    topics = rng.integers(len(KB_TOPICS), size=docs)
+    products = rng.integers(len(PRODUCTS), size=docs)
+    numbers = rng.integers(2, 30, size=docs)
+    kb = []
+    for i in range(docs):
+        _, template = KB_TOPICS[topics[i]]
+        text = template.format(product=PRODUCTS[products[i]], n=numbers[i], day=f"{numbers[i]}th")
+        kb.append(f"{text} (article {i})")
+    return kb
+
+def write_kb(path: str, docs: list):
+    """Write KB entries in the data/knowledge_base.csv layout (header, one entry per line)."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("content\n")
+        for doc in docs:
+            f.write(doc + "\n")
+
+def _message(row, i: int) -> EmailMessage:
+    """One email as MIME, rotating through plain, quoted-printable, latin-1 and HTML alternative bodies."""
+    msg = EmailMessage()
+    msg["From"] = f"{row.sender.split('@')[0].replace('.', ' ').title()} <{row.sender}>"
+    msg["To"] = "support@example.com"
+    msg["Subject"] = row.subject
+    msg["Date"] = format_datetime(pd.Timestamp(row.sent_date).tz_localize("UTC").to_pydatetime())
+    kind = i % 4
+    if kind == 1:
+        msg.set_content(row.body, cte="quoted-printable")
+    elif kind == 2:
+        msg.set_content(row.body, charset="latin-1")
+    else:
+        msg.set_content(row.body)
+    if kind == 3:
+        msg.add_alternative(f"<html><body><p>{row.body}</p></body></html>", subtype="html")
+    return msg
+
+def write_mailbox(path: str, df: pd.DataFrame, maildir: bool = False):
+    """Write generated emails as an mbox archive, or as a Maildir when `maildir` is set."""
+    box = mailbox.Maildir(path, create=True) if maildir else mailbox.mbox(path, create=True)
+    box.lock()
+    try:
+        for i, row in enumerate(df.itertuples()):
+            box.add(_message(row, i))
+        box.flush()
+    finally:
+        box.unlock()
+        box.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic inbox (and optionally a KB).")
+    parser.add_argument("path", help="CSV file, or an mbox archive (.mbox)")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--maildir", action="store_true", help="write `path` as a Maildir directory")
+    parser.add_argument("--kb", help="also write a knowledge base CSV here")
+    parser.add_argument("--kb-docs", type=int, default=1000)
+    args = parser.parse_args()
+
+    emails = generate_emails(args.rows, args.seed)
+    if args.maildir or args.path.lower().endswith(".mbox"):
+        write_mailbox(args.path, emails, maildir=args.maildir)
+    else:
+        emails.to_csv(args.path, index=False)
+    if args.kb:
+        write_kb(args.kb, generate_kb(args.kb_docs, args.seed))
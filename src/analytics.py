@@ -1,9 +1,41 @@
 # src/analytics.py
 import pandas as pd
 import streamlit as st
+from src import db_helper
 
-def get_stats(df: pd.DataFrame) -> dict:
-    """Compute basic and extended analytics"""
+# ---------------------------
+# SQL aggregates (indexes, daily_rollup and sender_profiles; no full-table pandas load)
+# ---------------------------
+def _rollup_counts(column: str, where: str = "", params: tuple = ()) -> pd.Series:
+    df = db_helper.query_df(
+        f"SELECT {column} AS label, SUM(count) AS n FROM daily_rollup {where} "
+        f"GROUP BY {column} HAVING SUM(count) > 0 ORDER BY n DESC",
+        params,
+    )
+    return pd.Series(df["n"].values, index=df["label"].values, name="count")
+
+def get_stats(df: pd.DataFrame = None) -> dict:
+    """Compute basic and extended analytics (in SQLite unless a frame is given)"""
+    if df is not None:
+        return _frame_stats(df)
+
+    since = (pd.Timestamp.now() - pd.Timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    last_24h = db_helper.query_value("SELECT COUNT(*) FROM emails WHERE sent_date > ?", (since,), 0)
+    priority = _rollup_counts("priority")
+    sentiment = _rollup_counts("sentiment")
+
+    return {
+        "Total Emails": int(priority.sum()),
+        "Last 24h": int(last_24h),
+        "Urgent": int(priority.get("Urgent", 0)),
+        "High Priority": int(priority.get("High", 0)),
+        "Normal": int(priority.get("Normal", 0)),
+        "Positive": int(sentiment.get("Positive", 0)),
+        "Negative": int(sentiment.get("Negative", 0)),
+        "Neutral": int(sentiment.get("Neutral", 0)),
+    }
+
+def _frame_stats(df: pd.DataFrame) -> dict:
     now = pd.Timestamp.now()
     last_24h = df[df.get("Sent Date", pd.NaT) > (now - pd.Timedelta(days=1))]
     
@@ -19,27 +51,60 @@ def get_stats(df: pd.DataFrame) -> dict:
     }
     return stats
 
-def show_charts(df: pd.DataFrame):
+def chart_data(df: pd.DataFrame = None) -> dict:
+    """Series behind the dashboard charts (from SQLite unless a frame is given)"""
+    if df is not None:
+        return _frame_chart_data(df)
+
+    # Per-sender counts are kept by sender_profiles; this walks its count index
+    top = db_helper.query_df("SELECT sender, count AS n FROM sender_profiles ORDER BY count DESC LIMIT 5")
+    since = (pd.Timestamp.now() - pd.Timedelta(days=7)).strftime("%Y-%m-%d")
+    daily = db_helper.query_df(
+        "SELECT day, SUM(count) AS n FROM daily_rollup WHERE day >= ? GROUP BY day ORDER BY day",
+        (since,),
+    )
+    return {
+        "sentiment": _rollup_counts("sentiment"),
+        "priority": _rollup_counts("priority"),
+        "requirement": _rollup_counts("requirement"),
+        "top_senders": pd.Series(top["n"].values, index=top["sender"].values, name="count"),
+        "daily": pd.Series(daily["n"].values, index=pd.to_datetime(daily["day"]).dt.date, name="count"),
+    }
+
+def _frame_chart_data(df: pd.DataFrame) -> dict:
+    data = {
+        "sentiment": df["Sentiment"].value_counts(),
+        "priority": df["Priority"].value_counts(),
+        "requirement": df["Requirement"].value_counts() if "Requirement" in df.columns else None,
+        "top_senders": df["From"].value_counts().head(5) if "From" in df.columns else None,
+        "daily": None,
+    }
+    if "Sent Date" in df.columns:
+        # Only the date column is needed; no copy of the whole frame
+        dates = pd.to_datetime(df["Sent Date"], errors="coerce")
+        last_7 = dates[dates >= (pd.Timestamp.now() - pd.Timedelta(days=7))]
+        data["daily"] = last_7.groupby(last_7.dt.date).size()
+    return data
+
+def show_charts(df: pd.DataFrame = None, data: dict = None):
+    """Render the dashboard charts from `data` (see chart_data), computed from `df` / SQLite if not given"""
+    if data is None:
+        data = chart_data(df)
+
     st.write("### Sentiment Distribution")
-    st.bar_chart(df["Sentiment"].value_counts())
+    st.bar_chart(data["sentiment"])
 
     st.write("### Priority Distribution")
-    st.bar_chart(df["Priority"].value_counts())
+    st.bar_chart(data["priority"])
 
     st.write("### Requirement Categories")
-    if "Requirement" in df.columns:
-        st.bar_chart(df["Requirement"].value_counts())
+    if data["requirement"] is not None and not data["requirement"].empty:
+        st.bar_chart(data["requirement"])
 
     st.write("### Top 5 Senders")
-    if "From" in df.columns:
-        top_senders = df["From"].value_counts().head(5)
-        st.bar_chart(top_senders)
+    if data["top_senders"] is not None:
+        st.bar_chart(data["top_senders"])
 
     st.write("### Emails Over Last 7 Days")
-    if "Sent Date" in df.columns:
-        df_dates = df.copy()
-        df_dates["Sent Date"] = pd.to_datetime(df_dates["Sent Date"], errors="coerce")
-        last_7 = df_dates[df_dates["Sent Date"] >= (pd.Timestamp.now() - pd.Timedelta(days=7))]
-        if not last_7.empty:
-            count_by_day = last_7.groupby(last_7["Sent Date"].dt.date).size()
-            st.line_chart(count_by_day)
+    if data["daily"] is not None and not data["daily"].empty:
+        st.line_chart(data["daily"])
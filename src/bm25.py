@@ -0,0 +1,90 @@
+# src/bm25.py
+import re
+from collections import Counter
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can do for from has have i in is it its me my no not of on or our "
+    "so that the their this to was we were will with you your".split()
+)
+
+def _stem(token: str) -> str:
+    """Fold simple plurals ("refunds" -> "refund"); leaves "-ss" words alone."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> list:
+    """Lowercased alphanumeric tokens, stop words dropped and plurals folded."""
+    return [_stem(t) for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOP_WORDS]
+
+# ---------------------------
+# Lexical index
+# ---------------------------
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index, built once from a list of documents
+    (None entries are treated as empty, so row numbers can follow a KBIndex
+    with tombstones). Each posting stores the term's final BM25 weight for
+    that document, so a query only sums the postings of its own terms: the
+    cost depends on how many documents contain those terms, not on the size
+    of the collection.
+    """
+
+    def __init__(self, docs: list, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(docs)
+
+        # Flat (term, doc, tf) triples, then grouped by term into CSR arrays:
+        # postings of term t are doc_ids/weights[offsets[t]:offsets[t + 1]]
+        self.vocab = {}
+        terms, doc_ids, tfs = [], [], []
+        lengths = np.zeros(self.n_docs, dtype=np.float32)
+        for i, doc in enumerate(docs):
+            counts = Counter(tokenize(doc))
+            lengths[i] = sum(counts.values())
+            for term, tf in counts.items():
+                terms.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(i)
+                tfs.append(tf)
+
+        terms = np.asarray(terms, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)[order]
+        tfs = np.asarray(tfs, dtype=np.float32)[order]
+        df = np.bincount(terms, minlength=len(self.vocab))
+        self.offsets = np.concatenate([[0], np.cumsum(df)])
+
+        avgdl = float(lengths.mean()) if self.n_docs and lengths.mean() > 0 else 1.0
+        idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / avgdl)
+        self.weights = (np.repeat(idf, df) * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def __len__(self):
+        return self.n_docs
+
+    def scores(self, query: str) -> tuple:
+        """(doc ids, BM25 scores) of every document sharing a term with `query`."""
+        spans = [(self.offsets[t], self.offsets[t + 1])
+                 for t in (self.vocab.get(w) for w in set(tokenize(query))) if t is not None]
+        if not spans:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids = np.concatenate([self.doc_ids[a:b] for a, b in spans])
+        weights = np.concatenate([self.weights[a:b] for a, b in spans])
+        docs, inverse = np.unique(ids, return_inverse=True)
+        return docs, np.bincount(inverse, weights=weights).astype(np.float32)
+
+    def search(self, query: str, top_k: int) -> tuple:
+        """Best `top_k` (doc ids, scores), best-first; documents with no shared term are skipped."""
+        docs, scores = self.scores(query)
+        if len(docs) > top_k:
+            part = np.argpartition(-scores, top_k - 1)[:top_k]
+            docs, scores = docs[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return docs[order], scores[order]
+
+    def search_batch(self, queries: list, top_k: int) -> tuple:
+        results = [self.search(q, top_k) for q in queries]
+        return [r[0] for r in results], [r[1] for r in results]
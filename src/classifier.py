@@ -0,0 +1,87 @@
+# src/classifier.py
+
+import re
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Keyword classification engine
+# ---------------------------
+class KeywordClassifier:
+    """
+    Ordered keyword rules compiled into a single alternation regex.
+
+    `rules` is a list of (label, keywords) pairs; the first rule with a keyword
+    contained in the lowercased text wins, otherwise `default` is returned.
+    Matching is plain substring matching, exactly like the `any(word in text)`
+    checks it replaces.
+    """
+
+    def __init__(self, rules, default: str):
+        self.rules = [(label, list(words)) for label, words in rules]
+        self.default = default
+
+        # Categories keep rule order, default last (duplicate labels collapse)
+        self.labels = []
+        for label, _ in self.rules:
+            if label not in self.labels:
+                self.labels.append(label)
+        if default not in self.labels:
+            self.labels.append(default)
+        self._rule_codes = [self.labels.index(label) for label, _ in self.rules]
+        self._default_code = self.labels.index(default)
+
+        # One named group per rule, wrapped in a lookahead so every position is
+        # tried and a lower-precedence keyword can never hide a higher one.
+        groups = [
+            f"(?P<r{i}>{'|'.join(re.escape(w) for w in words)})"
+            for i, (_, words) in enumerate(self.rules) if words
+        ]
+        self._pattern = re.compile("(?=" + "|".join(groups) + ")") if groups else None
+
+    def _code(self, text_l: str) -> int:
+        if self._pattern is None:
+            return self._default_code
+        best = None
+        for m in self._pattern.finditer(text_l):
+            rule = int(m.lastgroup[1:])
+            if best is None or rule < best:
+                best = rule
+                if rule == 0:
+                    break
+        return self._default_code if best is None else self._rule_codes[best]
+
+    def classify(self, text) -> str:
+        """Label a single text."""
+        if not isinstance(text, str):
+            return self.default
+        return self.labels[self._code(text.lower())]
+
+    def classify_series(self, series: pd.Series) -> pd.Series:
+        """Label a whole column, returning a categorical Series."""
+        return classify_columns(series, {"_": self})["_"]
+
+
+def classify_columns(series: pd.Series, classifiers: dict) -> dict:
+    """
+    Run several classifiers over one text column in a single pass.
+
+    Each distinct text is lowercased and matched once, then the codes are
+    broadcast back to every row, so repeated bodies cost nothing extra.
+    Returns {name: categorical Series} aligned with `series.index`.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    lowered = [u.lower() if isinstance(u, str) else None for u in uniques]
+
+    results = {}
+    for name, clf in classifiers.items():
+        unique_codes = [clf._code(t) if t is not None else clf._default_code for t in lowered]
+        # Missing values (code -1) fall back to the default label
+        lookup = np.array(unique_codes + [clf._default_code], dtype=np.int64)
+        row_codes = lookup[codes]
+        results[name] = pd.Series(
+            pd.Categorical.from_codes(row_codes, categories=clf.labels),
+            index=series.index,
+            name=series.name,
+        )
+    return results
@@ -1,19 +1,254 @@
+import hashlib
+import json
+import queue
 import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
 from sqlite3 import Connection
 import pandas as pd
+from src.preprocess import FILTER_KEYWORDS
 
 DB_PATH = "data/emails.db"
 
-def get_connection() -> Connection:
-    conn = sqlite3.connect(DB_PATH)
-    return conn
+# DataFrame column -> emails table column
+EMAIL_COLUMNS = {
+    "From": "sender",
+    "SenderName": "sender_name",
+    "Subject": "subject",
+    "Body": "body",
+    "Sent Date": "sent_date",
+    "Priority": "priority",
+    "Sentiment": "sentiment",
+    "Phone": "phone",
+    "AltEmail": "alt_email",
+    "Requirement": "requirement",
+}
+
+# Columns that identify an email (hashed into content_hash)
+_KEY_COLUMNS = ("From", "Subject", "Body", "Sent Date")
+
+# SQLite caps the number of bound variables per statement
+_IN_BATCH = 500
+# Unclustered emails read per near-duplicate clustering pass
+_CLUSTER_BATCH = 50_000
+
+# Inbox order: priority rank, then newest first. Both keys, and the support
+# flag (filter_support_emails in SQL), are virtual generated columns so the
+# composite indexes below can serve every page.
+PRIORITY_RANK = {"Urgent": 2, "High": 1}
+_RANK_SQL = "CASE priority " + " ".join(f"WHEN '{p}' THEN {r}" for p, r in PRIORITY_RANK.items()) + " ELSE 0 END"
+_SUPPORT_SQL = " OR ".join(f"instr(lower(IFNULL(subject, '')), '{k}') > 0" for k in FILTER_KEYWORDS)
+_INBOX_KEY_COLUMNS = {
+    "priority_rank": f"INTEGER GENERATED ALWAYS AS ({_RANK_SQL}) VIRTUAL",
+    "sort_date": "TEXT GENERATED ALWAYS AS (IFNULL(sent_date, '')) VIRTUAL",
+    "is_support": f"INTEGER GENERATED ALWAYS AS ({_SUPPORT_SQL}) VIRTUAL",
+}
+_INBOX_ORDER = "priority_rank DESC, sort_date DESC, id DESC"
+# One composite index per equality filter, each ending in the inbox order.
+# The app always lists support emails only, so the filtered ones lead with
+# is_support.
+_INBOX_INDEXES = {
+    "idx_emails_inbox": "",
+    "idx_emails_inbox_support": "is_support, ",
+    "idx_emails_inbox_priority": "is_support, priority, ",
+    "idx_emails_inbox_sentiment": "is_support, sentiment, ",
+    "idx_emails_inbox_requirement": "is_support, requirement, ",
+    "idx_emails_inbox_sender": "is_support, sender, ",
+}
+INBOX_PAGE_SIZE = 50
+
+# Applied to every pooled connection. WAL lets readers run alongside a writer;
+# synchronous=NORMAL is durable under WAL except for the last commits on power loss.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,      # KiB (64 MB page cache)
+    "mmap_size": 268435456,    # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,      # ms to wait on a locked database
+}
+# Prepared statements cached per connection (reused by every checkout of it)
+_STATEMENT_CACHE = 256
+# Connections per database shared by all threads, and how long a checkout
+# waits for one when they are all in use
+POOL_SIZE = 8
+POOL_TIMEOUT = 30.0         # seconds
+
+_pools = {}                 # DB_PATH -> _Pool
+_pools_lock = threading.Lock()
+_local = threading.local()  # this thread's checkouts: DB_PATH -> [connection, depth]
+
+# ---------------------------
+# Connection management
+# ---------------------------
+class _Pool:
+    """
+    Up to POOL_SIZE connections to one database, opened and tuned on first
+    need and then reused by any thread (Streamlit runs every rerun on a new
+    thread). Idle connections are handed out most recently used first, so
+    their page and statement caches stay warm.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def _open(self) -> Connection:
+        conn = sqlite3.connect(self.path, timeout=PRAGMAS["busy_timeout"] / 1000,
+                               cached_statements=_STATEMENT_CACHE, check_same_thread=False)
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def get(self) -> Connection:
+        if not self.slots.acquire(timeout=POOL_TIMEOUT):
+            raise sqlite3.OperationalError(f"no free connection to {self.path} after {POOL_TIMEOUT:.0f}s")
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._open()
+            except Exception:
+                self.slots.release()
+                raise
+
+    def put(self, conn: Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        if self.closed:
+            conn.close()
+        else:
+            self.idle.put(conn)
+        self.slots.release()
+
+    def close_idle(self):
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+def _pool() -> _Pool:
+    with _pools_lock:
+        pool = _pools.get(DB_PATH)
+        if pool is None:
+            pool = _pools[DB_PATH] = _Pool(DB_PATH, POOL_SIZE)
+        return pool
+
+@contextmanager
+def connection():
+    """
+    Check a pooled connection to DB_PATH out for the block and return it
+    afterwards (rolling back anything left uncommitted). Nested checkouts on
+    one thread share the outer connection, so helpers called inside a
+    `transaction()` take part in it.
+    """
+    held = getattr(_local, "held", None)
+    if held is None:
+        held = _local.held = {}
+    path = DB_PATH
+    if path in held:
+        held[path][1] += 1
+        try:
+            yield held[path][0]
+        finally:
+            held[path][1] -= 1
+        return
+    pool = _pool()
+    conn = pool.get()
+    held[path] = [conn, 1]
+    try:
+        yield conn
+    finally:
+        del held[path]
+        pool.put(conn)
+
+def close_connection():
+    """Close the pooled connections (e.g. before deleting the DB file); ones in use close when returned."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_idle()
+
+def pool_stats() -> dict:
+    """Size of DB_PATH's pool, connections opened so far and how many are idle."""
+    with _pools_lock:
+        pool = _pools.get(DB_PATH)
+    if pool is None:
+        return {"size": POOL_SIZE, "opened": 0, "idle": 0}
+    return {"size": pool.size, "opened": pool.opened, "idle": pool.idle.qsize()}
+
+@contextmanager
+def transaction():
+    """Commit on success, roll back on error."""
+    with connection() as conn:
+        with conn:
+            yield conn
+
+# ---------------------------
+# Query API
+# ---------------------------
+def query(sql: str, params: tuple = ()) -> list:
+    with connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def query_one(sql: str, params: tuple = ()):
+    with connection() as conn:
+        return conn.execute(sql, params).fetchone()
+
+def query_value(sql: str, params: tuple = (), default=None):
+    row = query_one(sql, params)
+    return default if row is None or row[0] is None else row[0]
+
+def query_df(sql: str, params: tuple = ()) -> pd.DataFrame:
+    with connection() as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+def execute(sql: str, params: tuple = ()) -> int:
+    """Run one write statement in its own transaction; returns affected rows."""
+    with transaction() as conn:
+        changed = conn.execute(sql, params).rowcount
+        if changed:
+            _bump_version(conn)
+        return changed
+
+# ---------------------------
+# Data version
+# ---------------------------
+def _bump_version(conn: Connection):
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+def data_version() -> int:
+    """
+    Counter bumped by every write made through this module (in any process),
+    so views derived from the emails table can be cached until it changes.
+    """
+    return query_value("SELECT value FROM meta WHERE key = 'data_version'", default=0)
 
 def init_db():
-    conn = get_connection()
+    with connection() as conn:
+        _create_schema(conn)
+
+def _create_schema(conn: Connection):
     cursor = conn.cursor()
+    legacy = _detach_legacy_table(conn)
+    cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS emails (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content_hash TEXT UNIQUE,
             sender TEXT,
             sender_name TEXT,
             subject TEXT,
@@ -24,19 +259,846 @@ def init_db():
             phone TEXT,
             alt_email TEXT,
             requirement TEXT,
-            preview TEXT
+            preview TEXT  -- no longer written; previews are derived from body on display
         )
     """)
+    existing = {r[1] for r in conn.execute("PRAGMA table_xinfo(emails)")}
+    for name, decl in _INBOX_KEY_COLUMNS.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE emails ADD COLUMN {name} {decl}")
+    if legacy is not None:
+        _insert_rows(conn, legacy)
+        cursor.execute("DROP TABLE emails_legacy")
+        _bump_version(conn)
+
+    # Indexes for SQL-side analytics and filtering; the inbox indexes lead
+    # with the priority/sentiment/requirement/sender columns, replacing the
+    # single-column ones
+    for name in ("idx_emails_priority", "idx_emails_sentiment", "idx_emails_sender"):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_emails_sent_date ON emails(sent_date)")
+    for name, prefix in _INBOX_INDEXES.items():
+        columns = f"{prefix}priority_rank, sort_date, id"
+        stored = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone()
+        if stored and not stored[0].endswith(f"({columns})"):
+            cursor.execute(f"DROP INDEX {name}")  # built for an older column list
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON emails({columns})")
+    _init_daily_rollup(conn)
+    _init_fts(conn)
+    _init_clusters(conn)
+    _init_checkpoints(conn)
+    _init_draft_queue(conn)
+    _init_sender_profiles(conn)
     conn.commit()
-    conn.close()
-
-def save_emails(df: pd.DataFrame):
-    conn = get_connection()
-    df.to_sql("emails", conn, if_exists="replace", index=False)
-    conn.close()
-
-def load_emails() -> pd.DataFrame:
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM emails", conn)
-    conn.close()
-    return df
+
+def _init_daily_rollup(conn: Connection):
+    """
+    `daily_rollup` holds email counts per day x priority x sentiment x
+    requirement. Triggers keep it in step with every insert, enrichment
+    update and delete, so dashboards never scan the emails table.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            requirement TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, priority, sentiment, requirement)
+        )
+    """)
+    new_key = ("COALESCE(substr(NEW.sent_date, 1, 10), ''), COALESCE(NEW.priority, ''), "
+               "COALESCE(NEW.sentiment, ''), COALESCE(NEW.requirement, '')")
+    old_match = ("day = COALESCE(substr(OLD.sent_date, 1, 10), '') AND priority = COALESCE(OLD.priority, '') "
+                 "AND sentiment = COALESCE(OLD.sentiment, '') AND requirement = COALESCE(OLD.requirement, '')")
+    add_new = f"""
+        INSERT INTO daily_rollup (day, priority, sentiment, requirement, count) VALUES ({new_key}, 1)
+        ON CONFLICT (day, priority, sentiment, requirement) DO UPDATE SET count = count + 1;
+    """
+    remove_old = (f"UPDATE daily_rollup SET count = count - 1 WHERE {old_match}; "
+                  f"DELETE FROM daily_rollup WHERE count <= 0 AND {old_match};")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_rollup_insert AFTER INSERT ON emails BEGIN {add_new} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_rollup_delete AFTER DELETE ON emails BEGIN {remove_old} END")
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_rollup_update "
+        "AFTER UPDATE OF sent_date, priority, sentiment, requirement ON emails "
+        f"BEGIN {remove_old} {add_new} END"
+    )
+
+    # Rebuild once if the rollup is out of step (new table or pre-existing rows)
+    rolled = conn.execute("SELECT COALESCE(SUM(count), 0) FROM daily_rollup").fetchone()[0]
+    stored = conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+    if rolled != stored:
+        rebuild_daily_rollup(conn)
+
+def rebuild_daily_rollup(conn: Connection):
+    conn.execute("DELETE FROM daily_rollup")
+    conn.execute("""
+        INSERT INTO daily_rollup (day, priority, sentiment, requirement, count)
+        SELECT COALESCE(substr(sent_date, 1, 10), ''), COALESCE(priority, ''),
+               COALESCE(sentiment, ''), COALESCE(requirement, ''), COUNT(*)
+        FROM emails
+        GROUP BY 1, 2, 3, 4
+    """)
+
+def _init_fts(conn: Connection):
+    """
+    `emails_fts` is an FTS5 index over subject and body that reads its text
+    from `emails` (external content). Triggers keep it in step with every
+    insert, update and delete; it is rebuilt once when first created.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'emails_fts'").fetchone()
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+            subject, body, content='emails', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    add_new = "INSERT INTO emails_fts (rowid, subject, body) VALUES (NEW.id, NEW.subject, NEW.body);"
+    remove_old = ("INSERT INTO emails_fts (emails_fts, rowid, subject, body) "
+                  "VALUES ('delete', OLD.id, OLD.subject, OLD.body);")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON emails BEGIN {add_new} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON emails BEGIN {remove_old} END")
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF subject, body ON emails "
+        f"BEGIN {remove_old} {add_new} END"
+    )
+    if not exists:
+        conn.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+
+def _init_clusters(conn: Connection):
+    """
+    Near-duplicate clusters (src/dedup.py). `emails.cluster_id` is the id of
+    the cluster's representative, its first email; `dedup_clusters` keeps
+    each representative's MinHash signature and member count and
+    `dedup_buckets` its LSH buckets; `dedup_texts` maps every distinct
+    normalized body to its cluster. Emails stored without a cluster are
+    assigned here once; clusters stored under an older
+    dedup.CLUSTER_VERSION are rebuilt.
+    """
+    from src.dedup import CLUSTER_VERSION
+
+    existing = {r[1] for r in conn.execute("PRAGMA table_xinfo(emails)")}
+    if "cluster_id" not in existing:
+        conn.execute("ALTER TABLE emails ADD COLUMN cluster_id INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_cluster ON emails(cluster_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dedup_clusters (
+            cluster_id INTEGER PRIMARY KEY,
+            signature BLOB NOT NULL,
+            size INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dedup_buckets (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            cluster_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dedup_texts (
+            text_hash INTEGER PRIMARY KEY,
+            cluster_id INTEGER NOT NULL
+        )
+    """)
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_cluster_delete AFTER DELETE ON emails "
+        "BEGIN UPDATE dedup_clusters SET size = size - 1 WHERE cluster_id = OLD.cluster_id; END"
+    )
+    stored = conn.execute("SELECT value FROM meta WHERE key = 'cluster_version'").fetchone()
+    if stored is None or stored[0] != CLUSTER_VERSION:
+        for table in ("dedup_clusters", "dedup_buckets", "dedup_texts"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("UPDATE emails SET cluster_id = NULL WHERE cluster_id IS NOT NULL")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cluster_version', ?)", (CLUSTER_VERSION,))
+    _assign_clusters(conn)
+
+def _load_cluster_candidates(conn: Connection, index, text_keys: list, bands):
+    """Load the stored clusters of `text_keys` and the representatives sharing an LSH bucket with `bands`."""
+    for i in range(0, len(text_keys), _IN_BATCH):
+        batch = text_keys[i:i + _IN_BATCH]
+        rows = conn.execute(
+            f"SELECT text_hash, cluster_id FROM dedup_texts WHERE text_hash IN ({', '.join('?' * len(batch))})",
+            batch,
+        )
+        for text_key, cluster in rows:
+            index.load_text(text_key, cluster)
+    for band in range(bands.shape[1]):
+        buckets = [int(b) for b in set(bands[:, band].tolist())]
+        for i in range(0, len(buckets), _IN_BATCH):
+            batch = buckets[i:i + _IN_BATCH]
+            rows = conn.execute(
+                "SELECT b.bucket, c.cluster_id, c.signature FROM dedup_buckets b "
+                "JOIN dedup_clusters c ON c.cluster_id = b.cluster_id "
+                f"WHERE b.band = ? AND b.bucket IN ({', '.join('?' * len(batch))})",
+                (band, *batch),
+            )
+            for bucket, cluster, signature in rows:
+                index.load_bucket(band, bucket, cluster, signature)
+
+def _assign_clusters(conn: Connection):
+    """
+    Put every email without a cluster into one: that of a near-duplicate
+    representative (stored, or earlier in the same pass), else its own.
+    """
+    from src.dedup import ClusterIndex
+
+    while True:
+        rows = conn.execute(
+            "SELECT id, body FROM emails WHERE cluster_id IS NULL ORDER BY id LIMIT ?", (_CLUSTER_BATCH,)
+        ).fetchall()
+        if not rows:
+            return
+        ids = [r[0] for r in rows]
+        index = ClusterIndex()
+        prepared = index.prepare([r[1] for r in rows])
+        _load_cluster_candidates(conn, index, prepared[1], prepared[3])
+        clusters = index.assign(prepared, ids)
+        with transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO dedup_texts (text_hash, cluster_id) VALUES (?, ?)",
+                             index.added_texts)
+            conn.executemany(
+                "INSERT INTO dedup_clusters (cluster_id, signature) VALUES (?, ?)",
+                [(key, sig.tobytes()) for key, sig, _ in index.added],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO dedup_buckets (band, bucket, cluster_id) VALUES (?, ?, ?)",
+                [(band, int(bucket), key) for key, _, bands in index.added for band, bucket in enumerate(bands)],
+            )
+            conn.executemany(
+                "UPDATE dedup_clusters SET size = size + ? WHERE cluster_id = ?",
+                [(n, key) for key, n in Counter(clusters).items()],
+            )
+            conn.executemany("UPDATE emails SET cluster_id = ? WHERE id = ?", zip(clusters, ids))
+            _bump_version(conn)
+
+def _detach_legacy_table(conn: Connection):
+    """
+    Older versions saved with `to_sql(if_exists="replace")`, which left an
+    `emails` table without content hashes. Rename it out of the way and return
+    all of its rows so init_db can copy them into the keyed schema; their
+    derived columns stay NULL until the next ingest enriches them, and
+    non-support rows are marked by is_support rather than dropped.
+    """
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(emails)")]
+    if not cols or "content_hash" in cols:
+        return None
+    legacy = pd.read_sql_query("SELECT * FROM emails", conn)
+    conn.execute("ALTER TABLE emails RENAME TO emails_legacy")
+    reverse = {v: k for k, v in EMAIL_COLUMNS.items()}
+    return legacy.rename(columns={c: reverse[c] for c in legacy.columns if c in reverse})
+
+# ---------------------------
+# Content hashing
+# ---------------------------
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, pd.Timestamp):
+        return "" if pd.isna(value) else value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, float) and pd.isna(value):
+        return ""
+    return str(value)
+
+def _db_value(value):
+    """Convert a frame cell to a TEXT column value (NULL for missing)."""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_text(v) for v in value)
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return _text(value)
+
+def content_hash(sender, subject, body, sent_date) -> str:
+    """Stable identity of an email: sender, subject, body and date."""
+    key = "\x1f".join(_text(v) for v in (sender, subject, body, sent_date))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def _hashes(df: pd.DataFrame) -> list:
+    cols = [df[c] if c in df.columns else [None] * len(df) for c in _KEY_COLUMNS]
+    return [content_hash(*vals) for vals in zip(*cols)]
+
+# ---------------------------
+# Writes
+# ---------------------------
+def _insert_rows(conn: Connection, df: pd.DataFrame, hashes: list = None) -> int:
+    if hashes is None:
+        hashes = _hashes(df)
+    present = [c for c in EMAIL_COLUMNS if c in df.columns]
+    db_cols = ["content_hash"] + [EMAIL_COLUMNS[c] for c in present]
+    placeholders = ", ".join("?" for _ in db_cols)
+    values = zip(hashes, *[[_db_value(v) for v in df[c]] for c in present])
+    # rowcount sums the rows each INSERT added; total_changes would also
+    # count the rows written by the rollup and FTS triggers
+    return conn.executemany(
+        f"INSERT OR IGNORE INTO emails ({', '.join(db_cols)}) VALUES ({placeholders})",
+        values,
+    ).rowcount
+
+def _existing_hashes(conn: Connection, hashes: list) -> set:
+    found = set()
+    unique = list(set(hashes))
+    for i in range(0, len(unique), _IN_BATCH):
+        batch = unique[i:i + _IN_BATCH]
+        rows = conn.execute(
+            f"SELECT content_hash FROM emails WHERE content_hash IN ({', '.join('?' for _ in batch)})",
+            batch,
+        )
+        found.update(r[0] for r in rows)
+    return found
+
+def ingest_emails(df: pd.DataFrame, enrich=None, backfill: bool = True) -> int:
+    """
+    Idempotent ingestion of a normalized email frame (From/Subject/Body/Sent Date).
+
+    Rows already stored (by content hash) are skipped; only new rows are passed
+    to `enrich` (which must return one row per input row, in order) and
+    bulk-inserted in one transaction together with their derived columns.
+    Stored rows that were never enriched are back-filled unless `backfill`
+    is False (chunked ingestion does that once at the end).
+    Returns the number of inserted rows.
+    """
+    hashes = _hashes(df)
+    with connection() as conn:
+        seen = _existing_hashes(conn, hashes)
+    keep, batch_seen = [], set()
+    for h in hashes:
+        keep.append(h not in seen and h not in batch_seen)
+        batch_seen.add(h)
+    new_df = df[keep]
+    new_hashes = [h for h, k in zip(hashes, keep) if k]
+
+    if enrich is not None and not new_df.empty:
+        new_df = enrich(new_df.reset_index(drop=True))
+
+    with transaction() as conn:
+        inserted = _insert_rows(conn, new_df, new_hashes) if not new_df.empty else 0
+        if inserted:
+            _bump_version(conn)
+    if inserted:
+        with connection() as conn:
+            _assign_clusters(conn)
+    if enrich is not None and backfill:
+        enrich_pending(enrich)
+    return inserted
+
+def enrich_pending(enrich, limit: int = None) -> int:
+    """Back-fill derived columns for stored rows that lack them (the oldest `limit`); returns how many."""
+    with connection() as conn:
+        pending = _read_frame(conn, "WHERE priority IS NULL", limit=limit)
+    if pending.empty:
+        return 0
+    enriched = enrich(pending)
+    derived = [c for c in EMAIL_COLUMNS if c in enriched.columns and c not in _KEY_COLUMNS]
+    assignments = ", ".join(f"{EMAIL_COLUMNS[c]} = ?" for c in derived)
+    values = zip(*[[_db_value(v) for v in enriched[c]] for c in derived], enriched["id"].tolist())
+    with transaction() as conn:
+        conn.executemany(f"UPDATE emails SET {assignments} WHERE id = ?", values)
+        _bump_version(conn)
+    return len(enriched)
+
+def save_emails(df: pd.DataFrame) -> int:
+    """Upsert a normalized email frame without enrichment."""
+    return ingest_emails(df)
+
+# ---------------------------
+# Ingest checkpoints
+# ---------------------------
+def _init_checkpoints(conn: Connection):
+    """Resume positions of mail sources: an mbox byte offset, or the Maildir keys already read."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            source TEXT PRIMARY KEY,
+            position INTEGER NOT NULL DEFAULT 0,
+            fingerprint TEXT,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_seen_keys (
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (source, key)
+        ) WITHOUT ROWID
+    """)
+
+def get_checkpoint(source: str) -> tuple:
+    """(position, fingerprint) saved for `source`, or (0, None)."""
+    row = query_one("SELECT position, fingerprint FROM ingest_checkpoints WHERE source = ?", (source,))
+    return tuple(row) if row else (0, None)
+
+def seen_keys(source: str) -> set:
+    return {r[0] for r in query("SELECT key FROM ingest_seen_keys WHERE source = ?", (source,))}
+
+def save_checkpoint(source: str, position: int = 0, fingerprint: str = None, keys: list = ()):
+    """Record how far `source` has been read; `keys` are added to its seen keys."""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO ingest_checkpoints (source, position, fingerprint, updated_at) "
+            "VALUES (?, ?, ?, datetime('now')) ON CONFLICT(source) DO UPDATE SET "
+            "position = excluded.position, fingerprint = excluded.fingerprint, updated_at = excluded.updated_at",
+            (source, position, fingerprint),
+        )
+        conn.executemany("INSERT OR IGNORE INTO ingest_seen_keys (source, key) VALUES (?, ?)",
+                         ((source, k) for k in keys))
+
+def reset_checkpoint(source: str):
+    """Forget `source`'s checkpoint so the next run reads it from the start (stored emails are still skipped)."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM ingest_checkpoints WHERE source = ?", (source,))
+        conn.execute("DELETE FROM ingest_seen_keys WHERE source = ?", (source,))
+
+# ---------------------------
+# Draft queue
+# ---------------------------
+# Attempts before a drafting job is marked failed, and the delay before a retry
+DRAFT_MAX_ATTEMPTS = 3
+_DRAFT_RETRY_DELAY = 30.0   # seconds, doubled per attempt
+
+def _init_draft_queue(conn: Connection):
+    """
+    Reply-drafting jobs (one per support email) and the drafts they produce.
+    Jobs are taken Urgent before High before Normal, oldest first; a taken
+    job is leased to one worker until `lease_until` and goes back to the
+    queue if the lease runs out.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS draft_jobs (
+            email_id INTEGER PRIMARY KEY,
+            priority_rank INTEGER NOT NULL,
+            sort_date TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',  -- queued | leased | done | failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_until REAL,
+            last_error TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_draft_jobs_next "
+                 "ON draft_jobs(status, priority_rank DESC, sort_date, email_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS drafts (
+            email_id INTEGER PRIMARY KEY,
+            reply TEXT NOT NULL,
+            model TEXT,
+            created_at TEXT
+        )
+    """)
+    # Drafts and jobs go with their email
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_drafts_delete AFTER DELETE ON emails BEGIN
+            DELETE FROM draft_jobs WHERE email_id = old.id;
+            DELETE FROM drafts WHERE email_id = old.id;
+        END
+    """)
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('draft_queue_mark', 0)")
+
+def enqueue_drafts() -> int:
+    """
+    Queue a drafting job for every enriched support email stored since the
+    last call (tracked by an id high-water mark that stops before rows still
+    waiting for enrichment). Returns the number of new jobs.
+    """
+    with transaction() as conn:
+        mark = query_value("SELECT value FROM meta WHERE key = 'draft_queue_mark'", default=0)
+        end = query_value("SELECT MIN(id) - 1 FROM emails WHERE id > ? AND priority IS NULL", (mark,))
+        if end is None:
+            end = query_value("SELECT MAX(id) FROM emails", default=0)
+        if end <= mark:
+            return 0
+        added = conn.execute(
+            "INSERT OR IGNORE INTO draft_jobs (email_id, priority_rank, sort_date) "
+            "SELECT id, priority_rank, sort_date FROM emails WHERE id > ? AND id <= ? "
+            "AND is_support = 1 AND id NOT IN (SELECT email_id FROM drafts)",
+            (mark, end),
+        ).rowcount
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'draft_queue_mark'", (end,))
+    return added
+
+def lease_drafts(owner: str, limit: int, lease_seconds: float) -> list:
+    """
+    Lease up to `limit` queued jobs to `owner` in queue order (jobs whose
+    lease ran out are queued again first); returns their email ids in order.
+    """
+    now = time.time()
+    with transaction() as conn:
+        conn.execute("UPDATE draft_jobs SET status = 'queued', lease_owner = NULL, lease_until = NULL "
+                     "WHERE status = 'leased' AND lease_until < ?", (now,))
+        # Walks idx_draft_jobs_next in queue order
+        ids = [r[0] for r in conn.execute(
+            "SELECT email_id FROM draft_jobs WHERE status = 'queued' AND available_at <= ? "
+            "ORDER BY priority_rank DESC, sort_date, email_id LIMIT ?", (now, limit))]
+        conn.executemany(
+            "UPDATE draft_jobs SET status = 'leased', lease_owner = ?, lease_until = ?, attempts = attempts + 1 "
+            "WHERE email_id = ?", [(owner, now + lease_seconds, eid) for eid in ids])
+    return ids
+
+def complete_drafts(owner: str, replies: dict, model: str = None) -> int:
+    """Store drafts ({email id: reply}) of jobs still leased to `owner` and mark them done; returns how many."""
+    with transaction() as conn:
+        done = [eid for eid in replies if conn.execute(
+            "UPDATE draft_jobs SET status = 'done', lease_owner = NULL, lease_until = NULL, last_error = NULL "
+            "WHERE email_id = ? AND status = 'leased' AND lease_owner = ?", (eid, owner)).rowcount]
+        conn.executemany(
+            "INSERT OR REPLACE INTO drafts (email_id, reply, model, created_at) VALUES (?, ?, ?, datetime('now'))",
+            [(eid, replies[eid], model) for eid in done],
+        )
+        if done:
+            _bump_version(conn)
+    return len(done)
+
+def fail_drafts(owner: str, errors: dict, max_attempts: int = DRAFT_MAX_ATTEMPTS) -> int:
+    """
+    Give failed jobs ({email id: error}) back: queued again after a backoff
+    while attempts remain, otherwise marked failed. Returns how many failed for good.
+    """
+    now = time.time()
+    failed = 0
+    with transaction() as conn:
+        for eid, error in errors.items():
+            attempts = conn.execute("SELECT attempts FROM draft_jobs WHERE email_id = ? AND lease_owner = ?",
+                                    (eid, owner)).fetchone()
+            if attempts is None:
+                continue
+            final = attempts[0] >= max_attempts
+            failed += final
+            conn.execute(
+                "UPDATE draft_jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_until = NULL, "
+                "last_error = ? WHERE email_id = ?",
+                ("failed" if final else "queued", now + _DRAFT_RETRY_DELAY * 2 ** (attempts[0] - 1),
+                 str(error)[:500], eid),
+            )
+    return failed
+
+def release_drafts(owner: str):
+    """Put jobs still leased to `owner` back in the queue without counting the attempt (clean shutdown)."""
+    with transaction() as conn:
+        conn.execute("UPDATE draft_jobs SET status = 'queued', attempts = attempts - 1, lease_owner = NULL, "
+                     "lease_until = NULL WHERE status = 'leased' AND lease_owner = ?", (owner,))
+
+def retry_failed_drafts() -> int:
+    """Queue every failed job again with a fresh attempt count."""
+    with transaction() as conn:
+        return conn.execute("UPDATE draft_jobs SET status = 'queued', attempts = 0, available_at = 0 "
+                            "WHERE status = 'failed'").rowcount
+
+def draft_queue_stats() -> dict:
+    """Job counts per status, queued jobs still in retry backoff (`deferred`) and queued jobs per priority."""
+    stats = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+    stats.update(dict(query("SELECT status, COUNT(*) FROM draft_jobs GROUP BY status")))
+    stats["deferred"] = query_value("SELECT COUNT(*) FROM draft_jobs WHERE status = 'queued' AND available_at > ?",
+                                    (time.time(),), 0)
+    ranks = {rank: label for label, rank in PRIORITY_RANK.items()}
+    stats["queued_by_priority"] = {
+        ranks.get(rank, "Normal"): n for rank, n in query(
+            "SELECT priority_rank, COUNT(*) FROM draft_jobs WHERE status = 'queued' "
+            "GROUP BY priority_rank ORDER BY priority_rank DESC")
+    }
+    return stats
+
+def next_draft_due():
+    """
+    When a job may next be ready to lease: the earliest retry time of a
+    queued job or lease end of a leased one (epoch seconds), or None when no
+    job is queued or leased.
+    """
+    return query_value("SELECT MIN(CASE status WHEN 'queued' THEN available_at ELSE lease_until END) "
+                       "FROM draft_jobs WHERE status IN ('queued', 'leased')")
+
+# ---------------------------
+# Sender profiles
+# ---------------------------
+SENDER_RECENT = 10          # newest email ids kept per profile
+SENDER_CONTACTS = 20        # phones / alt emails kept per profile
+
+# Profile column -> emails column counted into it ({"label": count} JSON)
+_PROFILE_HISTOGRAMS = {"priorities": "priority", "sentiments": "sentiment", "requirements": "requirement"}
+# Profile column -> emails column collected into it (JSON list of distinct values, first seen first)
+_PROFILE_CONTACTS = {"phones": "phone", "alt_emails": "alt_email"}
+
+def _hist_add(col: str, label: str) -> str:
+    path = f"'$.' || json_quote({label})"
+    return (f"CASE WHEN NULLIF({label}, '') IS NULL THEN {col} "
+            f"ELSE json_set({col}, {path}, COALESCE(json_extract({col}, {path}), 0) + 1) END")
+
+def _hist_remove(col: str, label: str) -> str:
+    path = f"'$.' || json_quote({label})"
+    return (f"CASE WHEN NULLIF({label}, '') IS NULL THEN {col} "
+            f"WHEN json_extract({col}, {path}) > 1 THEN json_set({col}, {path}, json_extract({col}, {path}) - 1) "
+            f"ELSE json_remove({col}, {path}) END")
+
+def _contact_add(col: str, value: str) -> str:
+    return (f"CASE WHEN NULLIF({value}, '') IS NULL OR json_array_length({col}) >= {SENDER_CONTACTS} "
+            f"OR EXISTS (SELECT 1 FROM json_each({col}) WHERE value = {value}) THEN {col} "
+            f"ELSE json_insert({col}, '$[#]', {value}) END")
+
+def _profile_select(where: str) -> str:
+    """One profile row per sender of the emails matching `where`, computed from scratch."""
+    hists = ", ".join(
+        f"(SELECT json_group_object({src}, n) FROM (SELECT {src}, COUNT(*) AS n FROM emails p "
+        f"WHERE p.sender = e.sender AND NULLIF({src}, '') IS NOT NULL GROUP BY {src}))"
+        for src in _PROFILE_HISTOGRAMS.values()
+    )
+    contacts = ", ".join(
+        f"(SELECT json_group_array({src}) FROM (SELECT {src} FROM emails p "
+        f"WHERE p.sender = e.sender AND NULLIF({src}, '') IS NOT NULL "
+        f"GROUP BY {src} ORDER BY MIN(id) LIMIT {SENDER_CONTACTS}))"
+        for src in _PROFILE_CONTACTS.values()
+    )
+    recent = (f"(SELECT json_group_array(json_array(sort_date, id)) FROM (SELECT sort_date, id FROM emails p "
+              f"WHERE p.sender = e.sender ORDER BY sort_date DESC, id DESC LIMIT {SENDER_RECENT}))")
+    return (f"SELECT sender, COUNT(*), MIN(sent_date), MAX(sent_date), {hists}, {contacts}, {recent} "
+            f"FROM emails e WHERE sender IS NOT NULL {where} GROUP BY sender")
+
+_PROFILE_COLUMNS = ("sender, count, first_seen, last_seen, "
+                    f"{', '.join(_PROFILE_HISTOGRAMS)}, {', '.join(_PROFILE_CONTACTS)}, recent")
+
+def _init_sender_profiles(conn: Connection):
+    """
+    `sender_profiles` holds one row per sender address: message count,
+    first / last sent date, priority, sentiment and requirement histograms,
+    the phones and alternate emails found in their mail and their newest
+    email ids. Triggers keep it in step with every insert and enrichment
+    update, so a sender's history is one primary-key lookup. A delete (or a
+    changed sender / date) recomputes the profiles it touches.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS sender_profiles (
+            sender TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            first_seen TEXT,
+            last_seen TEXT,
+            priorities TEXT NOT NULL DEFAULT '{{}}',
+            sentiments TEXT NOT NULL DEFAULT '{{}}',
+            requirements TEXT NOT NULL DEFAULT '{{}}',
+            phones TEXT NOT NULL DEFAULT '[]',
+            alt_emails TEXT NOT NULL DEFAULT '[]',
+            recent TEXT NOT NULL DEFAULT '[]'  -- [[sort_date, id], ...], newest first
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sender_profiles_count ON sender_profiles(count DESC)")
+
+    add_labels = ", ".join(f"{col} = {_hist_add(col, f'NEW.{src}')}" for col, src in _PROFILE_HISTOGRAMS.items())
+    remove_labels = ", ".join(f"{col} = {_hist_remove(col, f'OLD.{src}')}"
+                              for col, src in _PROFILE_HISTOGRAMS.items())
+    add_contacts = ", ".join(f"{col} = {_contact_add(col, f'NEW.{src}')}" for col, src in _PROFILE_CONTACTS.items())
+    # A full list is only re-sorted when the new email is newer than its oldest
+    # entry (on equal dates the new, higher id wins)
+    add_recent = (
+        f"recent = CASE WHEN json_array_length(recent) >= {SENDER_RECENT} "
+        "AND IFNULL(NEW.sent_date, '') < json_extract(recent, '$[#-1][0]') THEN recent "
+        "ELSE (SELECT json_group_array(json(value)) FROM (SELECT value FROM json_each("
+        "json_insert(recent, '$[#]', json_array(IFNULL(NEW.sent_date, ''), NEW.id))) "
+        f"ORDER BY json_extract(value, '$[0]') DESC, json_extract(value, '$[1]') DESC LIMIT {SENDER_RECENT})) END"
+    )
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_profile_insert AFTER INSERT ON emails WHEN NEW.sender IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO sender_profiles (sender) VALUES (NEW.sender);
+            UPDATE sender_profiles SET count = count + 1,
+                first_seen = COALESCE(MIN(first_seen, NEW.sent_date), first_seen, NEW.sent_date),
+                last_seen = COALESCE(MAX(last_seen, NEW.sent_date), last_seen, NEW.sent_date),
+                {add_labels}, {add_contacts}, {add_recent}
+            WHERE sender = NEW.sender;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_profile_update
+        AFTER UPDATE OF {', '.join([*_PROFILE_HISTOGRAMS.values(), *_PROFILE_CONTACTS.values()])} ON emails
+        WHEN NEW.sender IS NOT NULL AND NEW.sender IS OLD.sender AND NEW.sent_date IS OLD.sent_date BEGIN
+            UPDATE sender_profiles SET {remove_labels} WHERE sender = NEW.sender;
+            UPDATE sender_profiles SET {add_labels}, {add_contacts} WHERE sender = NEW.sender;
+        END
+    """)
+    recompute = (f"DELETE FROM sender_profiles WHERE sender IN (OLD.sender, NEW.sender); "
+                 f"INSERT INTO sender_profiles ({_PROFILE_COLUMNS}) "
+                 f"{_profile_select('AND sender IN (OLD.sender, NEW.sender)')};")
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_profile_move AFTER UPDATE OF sender, sent_date ON emails "
+        f"WHEN NEW.sender IS NOT OLD.sender OR NEW.sent_date IS NOT OLD.sent_date BEGIN {recompute} END"
+    )
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_profile_delete AFTER DELETE ON emails WHEN OLD.sender IS NOT NULL BEGIN "
+        f"DELETE FROM sender_profiles WHERE sender = OLD.sender; "
+        f"INSERT INTO sender_profiles ({_PROFILE_COLUMNS}) {_profile_select('AND sender = OLD.sender')}; END"
+    )
+
+    # Rebuild once if the profiles are out of step (new table or pre-existing rows)
+    profiled = conn.execute("SELECT COALESCE(SUM(count), 0) FROM sender_profiles").fetchone()[0]
+    stored = conn.execute("SELECT COUNT(sender) FROM emails").fetchone()[0]
+    if profiled != stored:
+        rebuild_sender_profiles(conn)
+
+def rebuild_sender_profiles(conn: Connection):
+    conn.execute("DELETE FROM sender_profiles")
+    conn.execute(f"INSERT INTO sender_profiles ({_PROFILE_COLUMNS}) {_profile_select('')}")
+
+def _profile_dict(row) -> dict:
+    (sender, count, first_seen, last_seen, priorities, sentiments, requirements,
+     phones, alt_emails, recent) = row
+    return {
+        "sender": sender, "count": count, "first_seen": first_seen, "last_seen": last_seen,
+        "priority": json.loads(priorities), "sentiment": json.loads(sentiments),
+        "requirement": json.loads(requirements),
+        "phones": json.loads(phones), "alt_emails": json.loads(alt_emails),
+        "recent_ids": [email_id for _, email_id in json.loads(recent)],
+    }
+
+def sender_profile(sender: str):
+    """
+    A sender's history as a dict (`count`, `first_seen`, `last_seen`,
+    `priority` / `sentiment` / `requirement` histograms, `phones`,
+    `alt_emails`, `recent_ids` newest first), or None for an unknown sender.
+    """
+    if not isinstance(sender, str):
+        return None
+    row = query_one(f"SELECT {_PROFILE_COLUMNS} FROM sender_profiles WHERE sender = ?", (sender.strip(),))
+    return None if row is None else _profile_dict(row)
+
+def sender_profiles(senders: list) -> dict:
+    """Profiles of several senders at once, {sender: profile} (unknown senders are left out)."""
+    unique = list({s.strip() for s in senders if isinstance(s, str)})
+    profiles = {}
+    for i in range(0, len(unique), _IN_BATCH):
+        batch = unique[i:i + _IN_BATCH]
+        rows = query(f"SELECT {_PROFILE_COLUMNS} FROM sender_profiles "
+                     f"WHERE sender IN ({', '.join('?' * len(batch))})", tuple(batch))
+        profiles.update((row[0], _profile_dict(row)) for row in rows)
+    return profiles
+
+# ---------------------------
+# Reads
+# ---------------------------
+def _read_frame(conn: Connection, where: str = "", params: tuple = (), order: str = "id",
+                limit: int = None) -> pd.DataFrame:
+    db_cols = ", ".join(EMAIL_COLUMNS.values())
+    sql = (f"SELECT id, {db_cols}, cluster_id AS ClusterId, "
+           f"(SELECT size FROM dedup_clusters c WHERE c.cluster_id = emails.cluster_id) AS ClusterSize, "
+           f"(SELECT reply FROM drafts d WHERE d.email_id = emails.id) AS Draft "
+           f"FROM emails {where} ORDER BY {order}")
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    from src.preprocess import compact_frame
+
+    df = pd.read_sql_query(sql, conn, params=params)
+    df = df.rename(columns={v: k for k, v in EMAIL_COLUMNS.items()})
+    df["Sent Date"] = pd.to_datetime(df["Sent Date"], errors="coerce")
+    return compact_frame(df)
+
+def load_emails(filters: dict = None) -> pd.DataFrame:
+    """Every stored email, or those matching inbox `filters` (see fetch_inbox_page)."""
+    clauses, params = _inbox_where(filters or {})
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    with connection() as conn:
+        return _read_frame(conn, where, tuple(params))
+
+def urgent_count() -> int:
+    return query_value("SELECT SUM(count) FROM daily_rollup WHERE priority = 'Urgent'", default=0)
+
+def requirement_values() -> list:
+    """Distinct requirement labels (from the rollup, without scanning emails)."""
+    rows = query("SELECT DISTINCT requirement FROM daily_rollup WHERE requirement != '' ORDER BY requirement")
+    return [r[0] for r in rows]
+
+
+# ---------------------------
+# Inbox pages
+# ---------------------------
+def _inbox_where(filters: dict) -> tuple:
+    """
+    WHERE clauses for inbox filters: `priority`, `sentiment` and
+    `requirement` (lists of values), `sender` (exact address),
+    `date_from` / `date_to` (dates, inclusive) and `support_only` (subject
+    contains a support keyword, the leading column of the filtered indexes).
+    """
+    clauses, params = [], []
+    if filters.get("support_only"):
+        clauses.append("is_support = 1")
+    for key in ("priority", "sentiment", "requirement"):
+        values = list(filters.get(key) or [])
+        if values:
+            clauses.append(f"{key} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if filters.get("sender"):
+        clauses.append("sender = ?")
+        params.append(filters["sender"].strip())
+    if filters.get("date_from"):
+        clauses.append("sort_date >= ?")
+        params.append(pd.Timestamp(filters["date_from"]).strftime("%Y-%m-%d"))
+    if filters.get("date_to"):
+        clauses.append("sort_date < ?")
+        params.append((pd.Timestamp(filters["date_to"]) + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+    return clauses, params
+
+def fetch_inbox_page(filters: dict = None, after: tuple = None, limit: int = INBOX_PAGE_SIZE) -> tuple:
+    """
+    One inbox page, urgent first and newest first within a priority.
+
+    Uses keyset pagination: `after` is the cursor returned with the previous
+    page, a (priority_rank, sort_date, id) tuple, so every page is an index
+    range scan of `limit` rows whatever the mailbox size. Returns
+    (page, next_cursor); next_cursor is None on the last page.
+    """
+    clauses, params = _inbox_where(filters or {})
+    if after is not None:
+        clauses.append("(priority_rank, sort_date, id) < (?, ?, ?)")
+        params.extend(after)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    with connection() as conn:
+        page = _read_frame(conn, where, tuple(params), order=_INBOX_ORDER, limit=limit + 1)
+        if len(page) <= limit:
+            return page, None
+        page = page.iloc[:limit]
+        last = page.iloc[-1]
+        row = conn.execute("SELECT priority_rank, sort_date, id FROM emails WHERE id = ?",
+                           (int(last["id"]),)).fetchone()
+    return page, tuple(row)
+
+def get_email(email_id: int):
+    """A single stored email as a Series, or None."""
+    with connection() as conn:
+        df = _read_frame(conn, "WHERE id = ?", (int(email_id),))
+    return None if df.empty else df.iloc[0]
+
+def get_emails(email_ids: list) -> pd.DataFrame:
+    """Stored emails with the given ids, indexed by id (in id order)."""
+    with connection() as conn:
+        frames = [_read_frame(conn, f"WHERE id IN ({', '.join('?' * len(batch))})", tuple(int(i) for i in batch))
+                  for batch in (email_ids[i:i + _IN_BATCH] for i in range(0, len(email_ids), _IN_BATCH))]
+        return (pd.concat(frames) if frames else _read_frame(conn, "WHERE 0")).set_index("id").sort_index()
+
+# ---------------------------
+# Full-text search
+# ---------------------------
+def _quote_terms(text: str) -> str:
+    """Treat every word as a literal phrase (fallback for invalid FTS syntax)."""
+    return " ".join('"' + t.replace('"', '""') + '"' for t in text.split())
+
+def search_emails(text: str, filters: dict = None, limit: int = INBOX_PAGE_SIZE, offset: int = 0) -> pd.DataFrame:
+    """
+    Full-text search over subject and body, best match first (bm25, subject
+    weighted 2x). `text` uses FTS5 syntax: "exact phrase", prefix*, AND / OR /
+    NOT and subject:/body: column filters; input that is not valid FTS5 is
+    searched as plain words. Inbox `filters` narrow the results.
+    """
+    clauses, params = _inbox_where(filters or {})
+    where = "".join(f" AND {c}" for c in clauses)
+    sql = (
+        f"SELECT e.id, bm25(emails_fts, 2.0, 1.0) AS score FROM emails_fts "
+        f"JOIN emails e ON e.id = emails_fts.rowid WHERE emails_fts MATCH ?{where} "
+        f"ORDER BY score LIMIT ? OFFSET ?"
+    )
+    with connection() as conn:
+        try:
+            hits = conn.execute(sql, (text, *params, int(limit), int(offset))).fetchall()
+        except sqlite3.OperationalError:
+            hits = conn.execute(sql, (_quote_terms(text), *params, int(limit), int(offset))).fetchall()
+        if not hits:
+            return _read_frame(conn, "WHERE 0").assign(Score=[])
+        ids = [h[0] for h in hits]
+        df = _read_frame(conn, f"WHERE id IN ({', '.join('?' * len(ids))})", tuple(ids))
+    scores = dict(hits)
+    # bm25 is lower-is-better; report it as a positive relevance score
+    df["Score"] = df["id"].map(lambda i: -scores[i])
+    return df.set_index("id").loc[ids].reset_index()
@@ -0,0 +1,168 @@
+# src/dedup.py
+import hashlib
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# MinHash LSH parameters (signatures are persisted: changing these
+# invalidates stored clusters)
+# ---------------------------
+SHINGLE_SIZE = 5        # characters per shingle of the normalized text
+NUM_PERM = 64           # MinHash signature length (a power of two)
+BANDS = 8               # LSH bands of NUM_PERM // BANDS values
+SIMILARITY = 0.8        # estimated Jaccard needed to join a cluster
+MIN_CHARS = 20          # shorter normalized texts ("thanks", empty) are never clustered
+CLUSTER_VERSION = 2     # bumped when the rules above change; older stored clusters are rebuilt
+EMPTY = np.uint32(0xFFFFFFFF)   # signature slot that received no shingle
+_BLOCK_BYTES = 4_000_000        # text bytes hashed per numpy block
+
+_rng = np.random.default_rng(20240601)
+_SEED, _MUL = (_rng.integers(1, 1 << 63, 2, dtype=np.uint64) | np.uint64(1))
+_MIX = _rng.integers(1, 1 << 63, NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+_BIN_SHIFT = np.uint64(64 - int(np.log2(NUM_PERM)))
+
+_NON_WORD = r"[^a-z0-9]+"
+
+def normalize_texts(texts: pd.Series) -> pd.Series:
+    """Lowercase with punctuation and whitespace collapsed: what near-duplicate matching compares."""
+    return (texts.fillna("").astype(str).str.lower()
+            .str.replace(_NON_WORD, " ", regex=True).str.strip())
+
+def signatures(texts: list) -> np.ndarray:
+    """
+    One-permutation MinHash signatures, shape (len(texts), NUM_PERM), of
+    normalized texts: each character shingle is hashed once and the hash
+    space is split into NUM_PERM bins, each keeping its minimum (EMPTY when
+    no shingle fell into it). Texts are hashed in vectorized blocks.
+    """
+    out = np.full((len(texts), NUM_PERM), EMPTY, dtype=np.uint32)
+    flat = out.reshape(-1)
+    start = 0
+    while start < len(texts):
+        chunk, size = [], 0
+        while start + len(chunk) < len(texts) and (not chunk or size < _BLOCK_BYTES):
+            data = texts[start + len(chunk)].encode("utf-8").ljust(SHINGLE_SIZE, b" ")
+            chunk.append(data)
+            size += len(data)
+        lengths = np.fromiter((len(c) for c in chunk), dtype=np.int64, count=len(chunk))
+        data = np.frombuffer(b"".join(chunk), dtype=np.uint8).astype(np.uint64)
+        n = len(data) - SHINGLE_SIZE + 1
+        # Each shingle's bytes packed into one integer, then mixed into 64 bits
+        packed = np.zeros(n, dtype=np.uint64)
+        for j in range(SHINGLE_SIZE):
+            packed = (packed << np.uint64(8)) | data[j:j + n]
+        h = (packed ^ _SEED) * _MUL
+        h ^= h >> np.uint64(29)
+        h *= _MUL
+        # Keep windows that lie inside one text
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        text_id = np.searchsorted(starts, np.arange(n), side="right") - 1
+        valid = np.arange(n) <= starts[text_id] + lengths[text_id] - SHINGLE_SIZE
+        h, text_id = h[valid], text_id[valid]
+        slots = (text_id + start) * NUM_PERM + (h >> _BIN_SHIFT).astype(np.int64)
+        values = np.minimum((h >> np.uint64(16)) & np.uint64(0xFFFFFFFF), np.uint64(EMPTY - 1)).astype(np.uint32)
+        np.minimum.at(flat, slots, values)
+        start += len(chunk)
+    return out
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures (bins empty in both are skipped)."""
+    used = np.count_nonzero((a != EMPTY) | (b != EMPTY))
+    return np.count_nonzero((a == b) & (a != EMPTY)) / used if used else 1.0
+
+def text_hash(text: str) -> int:
+    """63-bit key of a normalized text (exact duplicates share it)."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big") >> 1
+
+def band_hashes(sigs: np.ndarray) -> np.ndarray:
+    """One 63-bit bucket per LSH band, shape (len(sigs), BANDS)."""
+    banded = sigs.astype(np.uint64).reshape(len(sigs), BANDS, NUM_PERM // BANDS)
+    return ((banded * _MIX).sum(axis=2) >> np.uint64(1)).astype(np.int64)
+
+# ---------------------------
+# Clustering
+# ---------------------------
+class ClusterIndex:
+    """
+    Near-duplicate clusters by exact hashing plus MinHash LSH. Every
+    cluster is represented by its first member. A text seen before (after
+    normalization) joins the cluster of its first occurrence; otherwise the
+    email joins the most similar representative that shares an LSH bucket
+    with it and has an estimated Jaccard similarity of at least SIMILARITY,
+    or founds a new cluster. Comparing with representatives only keeps
+    clusters from drifting through chains of near-duplicates.
+
+    The index is in-memory: `load_text` / `load_bucket` add stored entries
+    and `added_texts` / `added` list what `assign` created, so callers can
+    persist them.
+    """
+
+    def __init__(self):
+        self.texts = {}         # text hash -> cluster key
+        self.buckets = {}       # (band, bucket) -> cluster key
+        self.signatures = {}    # cluster key -> signature
+        self.added_texts = []   # [(text hash, key)] first seen by assign
+        self.added = []         # [(key, signature, bands)] founded by assign
+
+    def load_text(self, text_key: int, key):
+        self.texts.setdefault(text_key, key)
+
+    def load_bucket(self, band: int, bucket: int, key, signature: bytes):
+        """Add one stored (band, bucket) -> representative entry; `signature` as saved by tobytes."""
+        self.buckets.setdefault((band, bucket), key)
+        if key not in self.signatures:
+            self.signatures[key] = np.frombuffer(signature, dtype=np.uint32)
+
+    def _add(self, key, signature: np.ndarray, bands):
+        self.signatures[key] = signature
+        for band, bucket in enumerate(bands):
+            self.buckets.setdefault((band, int(bucket)), key)
+        self.added.append((key, signature, bands))
+
+    def prepare(self, texts) -> tuple:
+        """
+        (row codes, unique text hashes, unique signatures, unique band
+        hashes, unique too-short flags) for `texts`.
+        """
+        codes, uniques = pd.factorize(normalize_texts(pd.Series(texts)))
+        sigs = signatures(list(uniques))
+        return codes, [text_hash(t) for t in uniques], sigs, band_hashes(sigs), [len(t) < MIN_CHARS for t in uniques]
+
+    def _match(self, sig: np.ndarray, bands):
+        best, best_sim = None, SIMILARITY
+        for band, bucket in enumerate(bands):
+            key = self.buckets.get((band, int(bucket)))
+            if key is None or key == best:
+                continue
+            sim = similarity(self.signatures[key], sig)
+            if sim > best_sim or (best is None and sim >= best_sim):
+                best, best_sim = key, sim
+        return best
+
+    def assign(self, prepared: tuple, keys) -> list:
+        """Cluster key per row; a row founding a cluster, or too short to cluster, gets its own key."""
+        codes, text_keys, sigs, bands, short = prepared
+        found = [None] * len(sigs)
+        clusters = []
+        for code, key in zip(codes, keys):
+            if short[code]:
+                clusters.append(key)
+                continue
+            cluster = found[code]
+            if cluster is None:
+                cluster = self.texts.get(text_keys[code])
+                if cluster is None:
+                    cluster = self._match(sigs[code], bands[code])
+                    if cluster is None:
+                        cluster = key
+                        self._add(key, sigs[code], bands[code])
+                    self.texts[text_keys[code]] = cluster
+                    self.added_texts.append((text_keys[code], cluster))
+                found[code] = cluster
+            clusters.append(cluster)
+        return clusters
+
+def cluster_ids(texts: pd.Series) -> pd.Series:
+    """In-memory clustering of one frame: the index label of each row's cluster representative."""
+    index = ClusterIndex()
+    return pd.Series(index.assign(index.prepare(texts), texts.index), index=texts.index, name="ClusterId")
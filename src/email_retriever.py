@@ -1,18 +1,16 @@
 import pandas as pd
 from textblob import TextBlob
-import re
+from src.classifier import KeywordClassifier
+from src.mail_source import iter_frames, read_frame, source_format
+from src.parallel import ParallelEnricher
+from src.preprocess import filter_support_emails, normalize_columns
 
-KEYWORDS = ["support", "query", "request", "help"]
 URGENT_WORDS = ["immediately", "urgent", "critical", "asap", "cannot access", "important"]
 
+PRIORITY_CLASSIFIER = KeywordClassifier([("Urgent", URGENT_WORDS)], default="Normal")
+
 def detect_priority(text: str) -> str:
-    if not isinstance(text, str):
-        return "Normal"
-    text_lower = text.lower()
-    for word in URGENT_WORDS:
-        if word in text_lower:
-            return "Urgent"
-    return "Normal"
+    return PRIORITY_CLASSIFIER.classify(text)
 
 def detect_sentiment(text: str) -> str:
     if not isinstance(text, str):
@@ -24,46 +22,31 @@ def detect_sentiment(text: str) -> str:
         return "Negative"
     return "Neutral"
 
-def fetch_emails(path="data/intern_emails.csv"):
-    """Load and filter emails by keywords, auto-tag priority + sentiment."""
-    df = pd.read_csv(path)
-
-    # Normalize column names
-    df.columns = [c.strip() for c in df.columns]
-    lower_map = {c.lower(): c for c in df.columns}
-
-    rename_dict = {}
-    if "sender" in lower_map:
-        rename_dict[lower_map["sender"]] = "From"
-    if "from" in lower_map:
-        rename_dict[lower_map["from"]] = "From"
-    if "subject" in lower_map:
-        rename_dict[lower_map["subject"]] = "Subject"
-    if "body" in lower_map:
-        rename_dict[lower_map["body"]] = "Body"
-    if "date" in lower_map:
-        rename_dict[lower_map["date"]] = "Sent Date"
-    if "sent_date" in lower_map:
-        rename_dict[lower_map["sent_date"]] = "Sent Date"
-
-    if rename_dict:
-        df = df.rename(columns=rename_dict)
-
-    # Ensure essential columns
-    for col in ["From", "Subject", "Body", "Sent Date"]:
-        if col not in df.columns:
-            df[col] = ""
-
-    # Filter only relevant emails
-    mask = df["Subject"].fillna("").str.lower().str.contains("|".join(KEYWORDS))
-    filtered_df = df[mask].copy()
-
-    # Apply sentiment + priority tagging
-    filtered_df["Priority"] = filtered_df.apply(
-        lambda row: detect_priority(str(row["Subject"]) + " " + str(row["Body"])), axis=1
-    )
-    filtered_df["Sentiment"] = filtered_df["Body"].apply(detect_sentiment)
-
-    # Reset index
-    filtered_df = filtered_df.reset_index(drop=True)
-    return filtered_df
+def fetch_emails(path="data/intern_emails.csv", workers: int = 1):
+    """
+    Load and filter emails by keywords, auto-tag priority + sentiment.
+    `path` is a CSV export, an mbox archive or a Maildir directory.
+    `workers` > 1 tags large files on a process pool (same output).
+    """
+    with ParallelEnricher(tag_emails, workers) as tag:
+        return _filter_and_tag(read_frame(path) if source_format(path) else pd.read_csv(path), tag)
+
+def iter_emails(path="data/intern_emails.csv", chunksize: int = 50_000, workers: int = 1):
+    """Like fetch_emails, but yields one filtered, tagged chunk at a time."""
+    chunks = iter_frames(path, chunksize) if source_format(path) else pd.read_csv(path, chunksize=chunksize)
+    with ParallelEnricher(tag_emails, workers) as tag:
+        for chunk in chunks:
+            yield _filter_and_tag(chunk, tag)
+
+def tag_emails(df: pd.DataFrame) -> pd.DataFrame:
+    """Add Priority (keywords in subject + body) and Sentiment (TextBlob polarity of the body)."""
+    df["Priority"] = PRIORITY_CLASSIFIER.classify_series(df["Subject"].astype(str) + " " + df["Body"].astype(str))
+    df["Sentiment"] = df["Body"].apply(detect_sentiment)
+    return df
+
+def _filter_and_tag(df: pd.DataFrame, tag=tag_emails) -> pd.DataFrame:
+    df = normalize_columns(df)
+    if "Sent Date" not in df.columns:
+        df["Sent Date"] = ""
+    # Filter only relevant emails, then apply sentiment + priority tagging
+    return tag(filter_support_emails(df))
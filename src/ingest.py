@@ -0,0 +1,176 @@
+# src/ingest.py
+import os
+import time
+import pandas as pd
+from src import db_helper
+from src.mail_source import fingerprint, iter_maildir, iter_mbox, maildir_keys, source_format
+from src.parallel import ParallelEnricher
+from src.preprocess import enrich_emails, filter_support_emails, normalize_columns
+
+CHUNK_SIZE = 50_000
+# Messages parsed per batch from an mbox / Maildir (each is checkpointed)
+MAIL_CHUNK_SIZE = 5_000
+
+def ingest_stream(path: str, chunksize: int = CHUNK_SIZE, filter_support: bool = True, enrich=enrich_emails,
+                  workers: int = 1):
+    """
+    Stream a CSV export into the emails table one chunk at a time.
+
+    Each chunk is normalized, keyword-filtered, enriched and written before
+    the next one is read, so peak memory is bounded by `chunksize` rather
+    than the file size. `workers` > 1 enriches each chunk on a process pool
+    that lives for the whole run. Yields a progress dict after every chunk.
+    """
+    if enrich is not None and workers != 1:
+        with ParallelEnricher(enrich, workers) as parallel:
+            yield from ingest_stream(path, chunksize, filter_support, parallel, workers=1)
+        return
+
+    total_bytes = os.path.getsize(path)
+    stats = {"chunks": 0, "rows_read": 0, "rows_kept": 0, "rows_inserted": 0}
+    start = time.perf_counter()
+
+    with open(path, "rb") as f:
+        for chunk in pd.read_csv(f, chunksize=chunksize):
+            _store_chunk(chunk, stats, filter_support, enrich)
+            # The reader buffers ahead, so progress is an estimate
+            yield _progress(stats, start, min(1.0, f.tell() / total_bytes) if total_bytes else 1.0)
+
+    # Rows stored earlier without enrichment (e.g. migrated tables)
+    if enrich is not None:
+        db_helper.enrich_pending(enrich)
+
+def _store_chunk(chunk: pd.DataFrame, stats: dict, filter_support: bool, enrich):
+    stats["rows_read"] += len(chunk)
+    chunk = normalize_columns(chunk)
+    if filter_support:
+        chunk = filter_support_emails(chunk)
+    stats["rows_kept"] += len(chunk)
+    if not chunk.empty:
+        stats["rows_inserted"] += db_helper.ingest_emails(chunk, enrich=enrich, backfill=False)
+    stats["chunks"] += 1
+
+def _progress(stats: dict, start: float, progress: float) -> dict:
+    elapsed = time.perf_counter() - start
+    return {
+        **stats,
+        "elapsed": elapsed,
+        "rows_per_sec": stats["rows_read"] / elapsed if elapsed else 0.0,
+        "progress": progress,
+    }
+
+def ingest_mail_stream(path: str, chunksize: int = MAIL_CHUNK_SIZE, filter_support: bool = True,
+                       enrich=enrich_emails, workers: int = 1, restart: bool = False):
+    """
+    Stream an mbox archive or a Maildir into the emails table, `chunksize`
+    messages at a time, like ingest_stream. After each batch is stored the
+    source's checkpoint (mbox byte offset, or the Maildir keys read) is
+    saved, so the next run only parses messages that arrived since; an mbox
+    whose first bytes changed (rewritten or replaced) is read from the start.
+    A crash between storing a batch and its checkpoint only makes the next
+    run re-read that batch, whose emails are then skipped by content hash.
+    `restart` ignores the checkpoint. Unparseable messages are counted in
+    `errors` and skipped.
+    """
+    if enrich is not None and workers != 1:
+        with ParallelEnricher(enrich, workers) as parallel:
+            yield from ingest_mail_stream(path, chunksize, filter_support, parallel, 1, restart)
+        return
+
+    source = os.path.abspath(path)
+    if restart:
+        db_helper.reset_checkpoint(source)
+    maildir = source_format(path) == "maildir"
+    if maildir:
+        keys = maildir_keys(path, db_helper.seen_keys(source))
+        messages, offset, total = iter_maildir(path, keys), 0, len(keys)
+    else:
+        offset, saved = db_helper.get_checkpoint(source)
+        size = os.path.getsize(path)
+        if offset > size or (offset and fingerprint(path, offset) != saved):
+            offset = 0
+        messages, total = iter_mbox(path, offset), size - offset
+
+    stats = {"chunks": 0, "rows_read": 0, "rows_kept": 0, "rows_inserted": 0, "errors": 0}
+    start, done = time.perf_counter(), 0
+    rows, positions = [], []
+    for row, position in messages:
+        if row is None:
+            stats["errors"] += 1
+        else:
+            rows.append(row)
+        positions.append(position)
+        if len(positions) >= chunksize:
+            _store_mail_chunk(source, rows, positions, stats, filter_support, enrich)
+            # Progress in messages (Maildir) or bytes (mbox)
+            done = done + len(positions) if maildir else positions[-1] - offset
+            rows, positions = [], []
+            yield _progress(stats, start, min(1.0, done / total) if total else 1.0)
+    if positions:
+        _store_mail_chunk(source, rows, positions, stats, filter_support, enrich)
+        yield _progress(stats, start, 1.0)
+
+    if enrich is not None:
+        db_helper.enrich_pending(enrich)
+
+def _store_mail_chunk(source: str, rows: list, positions: list, stats: dict, filter_support: bool, enrich):
+    """Store one batch of parsed messages, then checkpoint past it."""
+    if rows:
+        _store_chunk(pd.DataFrame(rows), stats, filter_support, enrich)
+    if isinstance(positions[-1], str):
+        db_helper.save_checkpoint(source, keys=positions)
+    else:
+        db_helper.save_checkpoint(source, positions[-1], fingerprint(source, positions[-1]))
+
+def ingest_csv(path: str, chunksize: int = CHUNK_SIZE, filter_support: bool = True, enrich=enrich_emails,
+               on_progress=None, workers: int = 1) -> dict:
+    """Run ingest_stream to completion; `on_progress` receives every progress dict."""
+    return _run(ingest_stream(path, chunksize, filter_support, enrich, workers), on_progress)
+
+def ingest_mail(path: str, chunksize: int = MAIL_CHUNK_SIZE, filter_support: bool = True, enrich=enrich_emails,
+                on_progress=None, workers: int = 1, restart: bool = False) -> dict:
+    """Run ingest_mail_stream to completion; `on_progress` receives every progress dict."""
+    return _run(ingest_mail_stream(path, chunksize, filter_support, enrich, workers, restart), on_progress)
+
+def ingest_path(path: str, **kwargs) -> dict:
+    """Ingest a CSV export, an mbox archive or a Maildir, whichever `path` is."""
+    if source_format(path):
+        return ingest_mail(path, **kwargs)
+    return ingest_csv(path, **kwargs)
+
+def _run(stream, on_progress) -> dict:
+    last = {"chunks": 0, "rows_read": 0, "rows_kept": 0, "rows_inserted": 0,
+            "elapsed": 0.0, "rows_per_sec": 0.0, "progress": 1.0}
+    for last in stream:
+        if on_progress:
+            on_progress(last)
+    return last
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Stream a CSV email export, an mbox archive or a Maildir into the SQLite inbox.")
+    parser.add_argument("path")
+    parser.add_argument("--chunksize", type=int, help=f"rows per batch (default: {CHUNK_SIZE} for CSV, "
+                                                      f"{MAIL_CHUNK_SIZE} for mbox / Maildir)")
+    parser.add_argument("--all", action="store_true", help="keep emails without support keywords in the subject")
+    parser.add_argument("--workers", type=int, default=1, help="enrichment processes (0 = one per CPU)")
+    parser.add_argument("--restart", action="store_true", help="mbox / Maildir: ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    db_helper.init_db()
+    options = dict(
+        filter_support=not args.all, workers=args.workers or None,
+        on_progress=lambda p: print(
+            f"{p['progress']:6.1%}  {p['rows_read']:>10,} read  {p['rows_inserted']:>10,} new  "
+            f"{p['rows_per_sec']:>10,.0f} rows/s", flush=True,
+        ),
+    )
+    if source_format(args.path):
+        result = ingest_mail(args.path, args.chunksize or MAIL_CHUNK_SIZE, restart=args.restart, **options)
+    else:
+        result = ingest_csv(args.path, args.chunksize or CHUNK_SIZE, **options)
+    print(f"Done: {result['rows_read']:,} rows read, {result['rows_inserted']:,} inserted "
+          f"in {result['elapsed']:.1f}s" + (f", {result['errors']:,} unreadable messages skipped"
+                                             if result.get("errors") else ""))
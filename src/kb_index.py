@@ -0,0 +1,240 @@
+# src/kb_index.py
+import hashlib
+import json
+import os
+import numpy as np
+
+KB_PATH = "data/knowledge_base.csv"
+INDEX_DIR = "data/kb_index"
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Storage types for the embeddings file; int8 rows are unit vectors scaled by 127
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+_INT8_SCALE = 127.0
+
+# Compact the embeddings file once this share of rows is tombstoned
+_COMPACT_RATIO = 0.5
+# Rows copied (or scored) per step, bounding the float32 working set
+_COPY_ROWS = 65536
+
+def load_kb_docs(kb_path: str = KB_PATH) -> list:
+    """
+    Read KB documents, one per line. The CSV has a single `content` column
+    whose values are not quoted (they contain commas), so it is read line by
+    line rather than with a CSV parser.
+    """
+    if not os.path.exists(kb_path):
+        return []
+    with open(kb_path, "r", encoding="utf-8") as f:
+        docs = [line.strip() for line in f.readlines() if line.strip()]
+    if kb_path.endswith(".csv") and docs and docs[0].lower() == "content":
+        docs = docs[1:]
+    return [d[1:-1].replace('""', '"') if len(d) > 1 and d[0] == d[-1] == '"' else d for d in docs]
+
+def doc_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# ---------------------------
+# Persistent embedding index
+# ---------------------------
+class KBIndex:
+    """
+    On-disk KB embeddings: `embeddings.npy` (memory-mapped on load) plus a
+    `manifest.json` holding the model name, storage dtype and one entry per
+    row with the document hash and text. Rows are L2-normalized so a dot
+    product is the cosine similarity. Removed documents are tombstoned in
+    place (text set to null) until enough accumulate to compact the file.
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self.emb_path = os.path.join(index_dir, "embeddings.npy")
+        self.manifest_path = os.path.join(index_dir, "manifest.json")
+        self.manifest = None
+        self.embeddings = None
+        self.alive = np.zeros(0, dtype=bool)
+
+    # ---------------------------
+    # Loading
+    # ---------------------------
+    def load(self) -> bool:
+        """Memory-map an existing index; returns False if there is none."""
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.emb_path)):
+            return False
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.embeddings = np.load(self.emb_path, mmap_mode="r")
+        self.alive = np.array([row["text"] is not None for row in self.manifest["rows"]], dtype=bool)
+        return True
+
+    @property
+    def dtype(self):
+        return self.manifest.get("dtype", "float32") if self.manifest else None
+
+    @property
+    def docs(self) -> list:
+        """Row-aligned document texts; None marks a tombstoned row."""
+        return [row["text"] for row in self.manifest["rows"]] if self.manifest else []
+
+    # ---------------------------
+    # Building
+    # ---------------------------
+    def update(self, docs: list, model, model_name: str = MODEL_NAME, batch_size: int = 64,
+               dtype: str = None) -> dict:
+        """
+        Bring the index in line with `docs`, encoding only added or changed
+        documents. `dtype` picks the storage type ("float32", "float16" or
+        "int8"); None keeps the existing one. A different model name or dtype
+        forces a full rebuild. Returns counts of added, removed and reused documents.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.manifest is None:
+            self.load()
+        dtype = dtype or self.dtype or "float32"
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported KB index dtype: {dtype}")
+        if self.manifest and (self.manifest.get("model") != model_name
+                              or self.dtype != dtype or not self.manifest.get("normalized")):
+            self.manifest, self.embeddings = None, None
+
+        if self.manifest is None and not docs:
+            return {"added": 0, "removed": 0, "reused": 0}
+
+        rows = self.manifest["rows"] if self.manifest else []
+        live = {row["hash"]: i for i, row in enumerate(rows) if row["text"] is not None}
+
+        wanted, added = {}, []
+        for d in docs:
+            h = doc_hash(d)
+            if h in wanted:
+                continue
+            wanted[h] = d
+            if h not in live:
+                added.append((h, d))
+
+        removed = [i for h, i in live.items() if h not in wanted]
+        if not added and not removed and self.manifest is not None:
+            return {"added": 0, "removed": 0, "reused": len(live)}
+
+        for i in removed:
+            rows[i] = {"hash": rows[i]["hash"], "text": None}
+
+        keep = list(range(len(rows)))
+        dead = sum(1 for row in rows if row["text"] is None)
+        if rows and dead / len(rows) >= _COMPACT_RATIO:
+            keep = [i for i, row in enumerate(rows) if row["text"] is not None]
+
+        new_embs = self._encode(model, [d for _, d in added], batch_size, dtype)
+        dim = new_embs.shape[1] if len(added) else self.embeddings.shape[1]
+        if added or len(keep) < len(rows):
+            self._write(keep, new_embs, dim, dtype)
+
+        self.manifest = {
+            "model": model_name,
+            "dim": int(dim),
+            "dtype": dtype,
+            "normalized": True,
+            "rows": [rows[i] for i in keep] + [{"hash": h, "text": d} for h, d in added],
+        }
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+        self.load()
+        return {"added": len(added), "removed": len(removed), "reused": len(live) - len(removed)}
+
+    def _encode(self, model, texts: list, batch_size: int, dtype: str) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=DTYPES[dtype])
+        parts = []
+        for i in range(0, len(texts), batch_size):
+            embs = np.asarray(model.encode(texts[i:i + batch_size], convert_to_numpy=True), dtype=np.float32)
+            embs = normalize(embs)
+            if dtype == "int8":
+                embs = np.clip(np.rint(embs * _INT8_SCALE), -127, 127)
+            parts.append(embs.astype(DTYPES[dtype]))
+        return np.vstack(parts)
+
+    def _write(self, keep: list, new_embs: np.ndarray, dim: int, dtype: str):
+        """Write kept old rows followed by new rows into a fresh .npy, then swap it in."""
+        tmp = self.emb_path + ".tmp.npy"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=DTYPES[dtype], shape=(len(keep) + len(new_embs), dim))
+        old = self.embeddings
+        for start in range(0, len(keep), _COPY_ROWS):
+            chunk = keep[start:start + _COPY_ROWS]
+            out[start:start + len(chunk)] = old[chunk]
+        if len(new_embs):
+            out[len(keep):] = new_embs
+        out.flush()
+        del out
+        self.embeddings = None
+        os.replace(tmp, self.emb_path)
+
+    # ---------------------------
+    # Search
+    # ---------------------------
+    def search(self, queries: np.ndarray, top_k: int):
+        """
+        Cosine top-k for a batch of L2-normalized query vectors (n, dim).
+
+        Rows are scored block by block with one matrix multiply each and the
+        running top-k is kept with argpartition, so a full sort (or a float32
+        copy of a quantized store) is never needed. Returns per-query arrays of
+        row indices and scores, best-first; tombstoned rows are never returned.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        n = len(queries)
+        best_idx = np.zeros((n, 0), dtype=np.int64)
+        best_scores = np.zeros((n, 0), dtype=np.float32)
+        total = 0 if self.embeddings is None else len(self.embeddings)
+        scale = 1.0 / _INT8_SCALE if self.dtype == "int8" else 1.0
+
+        for start in range(0, total, _COPY_ROWS):
+            block = np.asarray(self.embeddings[start:start + _COPY_ROWS], dtype=np.float32)
+            scores = (queries @ block.T) * scale
+            scores[:, ~self.alive[start:start + len(block)]] = -np.inf
+            idx = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+
+            cand_scores = np.concatenate([best_scores, scores], axis=1)
+            cand_idx = np.concatenate([best_idx, idx], axis=1)
+            if cand_scores.shape[1] > top_k:
+                part = np.argpartition(-cand_scores, top_k - 1, axis=1)[:, :top_k]
+                cand_scores = np.take_along_axis(cand_scores, part, axis=1)
+                cand_idx = np.take_along_axis(cand_idx, part, axis=1)
+            best_scores, best_idx = cand_scores, cand_idx
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+        keep = np.isfinite(best_scores)
+        return [i[k] for i, k in zip(best_idx, keep)], [s[k] for s, k in zip(best_scores, keep)]
+
+    def score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Cosine scores of one L2-normalized query vector against the given rows."""
+        if not len(rows):
+            return np.zeros(0, dtype=np.float32)
+        scale = 1.0 / _INT8_SCALE if self.dtype == "int8" else 1.0
+        # Read the memory map in ascending row order, then restore the caller's order
+        order = np.argsort(rows)
+        block = np.asarray(self.embeddings[np.asarray(rows)[order]], dtype=np.float32)
+        scores = np.empty(len(rows), dtype=np.float32)
+        scores[order] = (block @ np.asarray(query, dtype=np.float32)) * scale
+        return scores
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows (zero rows stay zero)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+if __name__ == "__main__":
+    import argparse
+    from sentence_transformers import SentenceTransformer
+
+    parser = argparse.ArgumentParser(description="Build or update the KB embedding index.")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default=None,
+                        help="storage type (default: keep the existing one, float32 for a new index)")
+    args = parser.parse_args()
+
+    index = KBIndex()
+    result = index.update(load_kb_docs(), SentenceTransformer(MODEL_NAME), dtype=args.dtype)
+    print(f"KB index: {result['added']} added, {result['removed']} removed, {result['reused']} reused")
@@ -0,0 +1,146 @@
+# src/llm_stub.py
+"""
+Minimal OpenAI-compatible chat completions server for local testing and
+benchmarks. Point the app at it with LLM_BASE_URL=http://127.0.0.1:8000/v1.
+Requests with "stream": true are answered as server-sent events, one chunk
+per word, `token_latency` seconds apart.
+
+    python -m src.llm_stub --port 8000 --latency 0.2 --token-latency 0.02 --fail-rate 0.1
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _reply_text(prompt: str) -> str:
+    subject = ""
+    for line in prompt.splitlines():
+        if line.startswith("Email Subject:"):
+            subject = line.split(":", 1)[1].strip()
+    return (f"Thank you for reaching out about \"{subject}\". "
+            "Our team is looking into it and will follow up shortly.\n\nBest regards,\nSupport Team")
+
+def _usage(request: dict, text: str) -> dict:
+    """Token counts of a reply (words stand in for tokens)."""
+    prompt = sum(len(m.get("content", "").split()) for m in request.get("messages", []))
+    completion = len(text.split())
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self._complete(request)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _complete(self, request: dict):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_rate and random.random() < server.fail_rate:
+            self._send_json(503, {"error": {"message": "stub overloaded", "type": "server_error"}})
+            return
+
+        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+        text = _reply_text(prompt)
+        if request.get("stream"):
+            self._stream(request, text)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(request, text),
+        })
+
+    def _stream(self, request: dict, text: str):
+        """Send `text` as chat.completion.chunk events; stops quietly if the client hangs up."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "stub")}
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": t} for t in re.findall(r"\s*\S+", text)]
+        try:
+            for i, delta in enumerate(deltas):
+                if i > 1 and self.server.token_latency:
+                    time.sleep(self.server.token_latency)
+                chunk = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            done = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(done)}\n\n".encode("utf-8"))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                usage = {**base, "choices": [], "usage": _usage(request, text)}
+                self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def start_stub_server(port: int = 0, latency: float = 0.0, fail_rate: float = 0.0, token_latency: float = 0.0):
+    """Start the stub in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_latency = token_latency
+    server.fail_rate = fail_rate
+    server.request_count = 0
+    server.in_flight = server.max_in_flight = 0     # requests being answered, and the most at once
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub LLM server.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each reply")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.fail_rate, args.token_latency)
+    print(f"Stub LLM listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,207 @@
+# src/mail_source.py
+"""
+Streaming readers for mbox archives and Maildir directories.
+
+Messages are parsed one at a time with the stdlib `email` parser and
+flattened into the CSV layout (sender, subject, body, sent_date) that
+normalize_columns understands. Readers report a resume position with
+every message: the byte offset after it for mbox, its key for Maildir.
+"""
+import hashlib
+import html
+import mailbox
+import os
+import re
+from datetime import timezone
+from email.errors import HeaderParseError
+from email.header import Header, decode_header, make_header
+from email.parser import BytesParser
+from email.utils import parseaddr, parsedate_to_datetime
+import pandas as pd
+
+MBOX_SUFFIXES = (".mbox", ".mbx", ".mbs")
+# Bytes hashed from the start of an mbox to notice a rewritten archive
+FINGERPRINT_BYTES = 65536
+
+# compat32: headers stay plain strings, far cheaper than policy.default's header objects
+_PARSER = BytesParser()
+_ESCAPED_FROM = re.compile(rb"^>(>*From )")
+_TAGS = re.compile(r"<(script|style)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*")
+_FOLDING = re.compile(r"\r?\n(?=[ \t])")
+
+# ---------------------------
+# Message parsing
+# ---------------------------
+def _header(msg, name: str) -> str:
+    """Header value with folding undone and RFC 2047 encoded words / raw 8-bit bytes decoded."""
+    value = msg.get(name)
+    if value is None:
+        return ""
+    if isinstance(value, Header):
+        # Raw 8-bit bytes: compat32 wraps them as an unknown-8bit Header
+        value = next(v for k, v in msg.raw_items() if k.lower() == name.lower())
+        value = value.encode("ascii", "surrogateescape").decode("utf-8", "replace")
+    value = _FOLDING.sub(" ", value)
+    if "=?" in value:
+        try:
+            return str(make_header(decode_header(value)))
+        except (LookupError, UnicodeError, ValueError, HeaderParseError):
+            pass
+    return value
+
+def _html_text(text: str) -> str:
+    text = _SPACES.sub(" ", html.unescape(_TAGS.sub(" ", text)))
+    return _BLANK_LINES.sub("\n\n", text)
+
+def _part_text(part) -> str:
+    payload = part.get_payload(decode=True) or b""
+    try:
+        return payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    except LookupError:
+        # Unknown charset
+        return payload.decode("utf-8", errors="replace")
+
+def message_text(msg) -> str:
+    """Decoded plain-text body: the first text/plain part, else the first HTML part stripped of tags."""
+    plain = markup = None
+    for part in msg.walk():
+        if part.is_multipart() or str(part.get("Content-Disposition", "")).lower().startswith("attachment"):
+            continue
+        content_type = part.get_content_type()
+        if content_type == "text/plain":
+            plain = part
+            break
+        if content_type == "text/html" and markup is None:
+            markup = part
+    if plain is not None:
+        return _part_text(plain).strip()
+    return _html_text(_part_text(markup)).strip() if markup is not None else ""
+
+def _sent_date(value: str) -> str:
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return ""
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date.strftime("%Y-%m-%d %H:%M:%S")
+
+def parse_message(data: bytes) -> dict:
+    """One raw RFC 5322 message as a row of the CSV layout; dates are in UTC."""
+    msg = _PARSER.parsebytes(data)
+    return {
+        "sender": parseaddr(_header(msg, "From"))[1],
+        "subject": _header(msg, "Subject"),
+        "body": message_text(msg),
+        "sent_date": _sent_date(_header(msg, "Date")),
+    }
+
+def _parse(data: bytes):
+    try:
+        return parse_message(data)
+    except Exception:
+        # One broken message must not stop (or, on resume, block) a whole archive
+        return None
+
+# ---------------------------
+# mbox
+# ---------------------------
+def fingerprint(path: str, position: int) -> str:
+    """Hash of the archive bytes before `position` (at most FINGERPRINT_BYTES)."""
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(min(position, FINGERPRINT_BYTES)), digest_size=16).hexdigest()
+
+def _message_bytes(lines: list) -> bytes:
+    # Drop the From_ line, undo >From quoting (mboxrd) and the blank separator line
+    body = [_ESCAPED_FROM.sub(rb"\1", line) if line.startswith(b">") else line for line in lines[1:]]
+    if body and body[-1].strip() == b"":
+        body.pop()
+    return b"".join(body)
+
+def iter_mbox(path: str, offset: int = 0):
+    """
+    Yield (row, end offset) for every message of an mbox archive from
+    byte `offset` on. The file is read line by line, so memory holds one
+    message at a time whatever the archive size; `end offset` is where the
+    next message starts, the position to resume from. `row` is None for a
+    message that could not be parsed.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        pos, lines = offset, []
+        for line in f:
+            if line.startswith(b"From ") and lines:
+                yield _parse(_message_bytes(lines)), pos
+                lines = []
+            # (anything before the first From_ line is skipped)
+            if lines or line.startswith(b"From "):
+                lines.append(line)
+            pos += len(line)
+        if lines:
+            yield _parse(_message_bytes(lines)), pos
+
+# ---------------------------
+# Maildir
+# ---------------------------
+def maildir_keys(path: str, seen: set = frozenset()) -> list:
+    """
+    Keys of the messages in a Maildir (new/ and cur/) that are not in
+    `seen`. Keys survive the move from new/ to cur/ and flag changes, so
+    they identify a message across runs.
+    """
+    return [key for key in mailbox.Maildir(path, factory=None, create=False).iterkeys() if key not in seen]
+
+def iter_maildir(path: str, keys: list = None):
+    """Yield (row, key) for the messages `keys` of a Maildir (all of them by default); `row` as in iter_mbox."""
+    box = mailbox.Maildir(path, factory=None, create=False)
+    for key in box.iterkeys() if keys is None else keys:
+        try:
+            data = box.get_bytes(key)
+        except KeyError:
+            continue    # removed since the directory was listed
+        yield _parse(data), key
+
+# ---------------------------
+# Sources
+# ---------------------------
+def source_format(path: str):
+    """"maildir", "mbox" or None (anything else is read as a CSV export)."""
+    if os.path.isdir(path):
+        return "maildir" if os.path.isdir(os.path.join(path, "cur")) or \
+            os.path.isdir(os.path.join(path, "new")) else None
+    if path.lower().endswith(MBOX_SUFFIXES):
+        return "mbox"
+    try:
+        with open(path, "rb") as f:
+            return "mbox" if f.read(5) == b"From " else None
+    except OSError:
+        return None
+
+def source_mtime(path: str) -> float:
+    """Last modification of a mail source; for a Maildir, of its new/ and cur/ folders."""
+    if os.path.isdir(path):
+        return max(os.path.getmtime(os.path.join(path, d)) for d in ("new", "cur", ".")
+                   if os.path.isdir(os.path.join(path, d)))
+    return os.path.getmtime(path)
+
+def iter_rows(path: str):
+    """Every message of an mbox or Maildir as a row dict."""
+    messages = iter_maildir(path) if source_format(path) == "maildir" else iter_mbox(path)
+    return (row for row, _ in messages if row is not None)
+
+def iter_frames(path: str, chunksize: int):
+    """The messages of an mbox or Maildir as DataFrames of up to `chunksize` rows."""
+    rows = []
+    for row in iter_rows(path):
+        rows.append(row)
+        if len(rows) >= chunksize:
+            yield pd.DataFrame(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+def read_frame(path: str) -> pd.DataFrame:
+    """A whole mbox or Maildir as one DataFrame in the CSV layout."""
+    return pd.DataFrame(list(iter_rows(path)), columns=["sender", "subject", "body", "sent_date"])
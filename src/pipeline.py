@@ -0,0 +1,91 @@
+# src/pipeline.py
+import time
+import pandas as pd
+from src.profiler import PROFILER
+
+class Stage:
+    """One enrichment step: `func(df, columns)` returns {column: values} for the requested `columns`."""
+
+    def __init__(self, name: str, func, reads: tuple, writes: tuple):
+        self.name = name
+        self.func = func
+        self.reads = tuple(reads)
+        self.writes = tuple(writes)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, reads={self.reads}, writes={self.writes})"
+
+class Pipeline:
+    """
+    Declarative frame enrichment. Stages are registered with the columns
+    they read and write; `run` orders them so every column is written before
+    it is read, runs each stage at most once and skips it when all of its
+    output columns are already present and fully populated. A stage that
+    does run only has to fill its missing columns. Outputs are assigned onto
+    one shallow copy of the input frame (no per-stage copies), and the last
+    run's per-stage timings are kept in `timings` (and go to the profiler as
+    "<pipeline>.<stage>").
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages = []
+        self.timings = {}
+        self._order = None
+
+    def stage(self, name: str, reads=(), writes=()):
+        """Decorator registering `func(df, columns)` as a stage."""
+        def register(func):
+            self.add(Stage(name, func, reads, writes))
+            return func
+        return register
+
+    def add(self, stage: Stage):
+        written = {c for s in self.stages for c in s.writes}
+        clash = written.intersection(stage.writes)
+        if clash:
+            raise ValueError(f"{self.name}: columns {sorted(clash)} already written by another stage")
+        self.stages.append(stage)
+        self._order = None
+
+    def order(self) -> list:
+        """Stages in dependency order (registration order breaks ties)."""
+        if self._order is None:
+            producer = {c: s for s in self.stages for c in s.writes}
+            ordered, state = [], {}
+
+            def visit(stage):
+                if state.get(stage.name) == "done":
+                    return
+                if state.get(stage.name) == "visiting":
+                    raise ValueError(f"{self.name}: dependency cycle at stage {stage.name!r}")
+                state[stage.name] = "visiting"
+                for col in stage.reads:
+                    if col in producer and producer[col] is not stage:
+                        visit(producer[col])
+                state[stage.name] = "done"
+                ordered.append(stage)
+
+            for stage in self.stages:
+                visit(stage)
+            self._order = ordered
+        return self._order
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy(deep=False)
+        timings = {}
+        for stage in self.order():
+            missing = [c for c in stage.writes if c not in df.columns or df[c].isna().any()]
+            if not missing:
+                timings[stage.name] = None
+                continue
+            absent = [c for c in stage.reads if c not in df.columns]
+            if absent:
+                raise KeyError(f"{self.name}: stage {stage.name!r} needs columns {absent}")
+            with PROFILER.span(f"{self.name}.{stage.name}", rows=len(df)):
+                start = time.perf_counter()
+                for col, values in stage.func(df, missing).items():
+                    df[col] = values
+                timings[stage.name] = time.perf_counter() - start
+        self.timings = timings
+        return df
@@ -1,136 +1,194 @@
 # src/preprocess.py
 
 import re
+import numpy as np
 import pandas as pd
-
-def preprocess_emails(df: pd.DataFrame) -> pd.DataFrame:
+from src.classifier import KeywordClassifier, classify_columns
+from src.pipeline import Pipeline
+
+# ---------------------------
+# Keyword rules (compiled once, first matching rule wins)
+# ---------------------------
+REQUIREMENT_CLASSIFIER = KeywordClassifier([
+    ("Account Access", ["password", "login"]),
+    ("Billing", ["payment", "invoice", "billing"]),
+    ("Technical Issue", ["error", "bug", "not working"]),
+    ("Support Request", ["support", "help", "query", "request"]),
+], default="General")
+
+URGENT_KEYWORDS = ["immediately", "urgent", "critical", "cannot access", "asap", "as soon as possible", "now"]
+NEGATIVE_WORDS = ["angry", "frustrated", "disappointed", "not happy", "hate", "bad", "terrible", "worst"]
+POSITIVE_WORDS = ["thank you", "great", "happy", "love", "excellent", "thanks"]
+
+# Negative words take precedence over positive ones
+INBOX_PRIORITY_CLASSIFIER = KeywordClassifier([("Urgent", URGENT_KEYWORDS)], default="Normal")
+INBOX_SENTIMENT_CLASSIFIER = KeywordClassifier(
+    [("Negative", NEGATIVE_WORDS), ("Positive", POSITIVE_WORDS)], default="Neutral"
+)
+
+PHONE_PATTERN = re.compile(r"\+?\d[\d\-\s]{7,}\d")
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+# ---------------------------
+# Enrichment stages
+# ---------------------------
+ENRICH_PIPELINE = Pipeline("enrich")
+
+def _contact_text(df: pd.DataFrame) -> pd.Series:
+    """Body plus the optional Content column, where contact details are searched."""
+    text = df["Body"].fillna("").astype(str) + " "
+    if "Content" in df.columns:
+        text = text + df["Content"].fillna("").astype(str)
+    return text
+
+def _first_match(text: pd.Series, pattern: re.Pattern) -> list:
+    search = pattern.search
+    return [m.group(0) if m else "" for m in map(search, text)]
+
+@ENRICH_PIPELINE.stage("contacts", reads=("Body",), writes=("Phone", "AltEmail"))
+def _contacts_stage(df, columns):
+    text = _contact_text(df)
+    patterns = {"Phone": PHONE_PATTERN, "AltEmail": EMAIL_PATTERN}
+    return {c: _first_match(text, patterns[c]) for c in columns}
+
+@ENRICH_PIPELINE.stage("sender_name", reads=("From",), writes=("SenderName",))
+def _sender_name_stage(df, columns):
+    names = [
+        str(s).split("@")[0].replace(".", " ").title() if pd.notna(s) and "@" in str(s) else "Unknown"
+        for s in df["From"]
+    ]
+    return {"SenderName": names}
+
+_LABEL_CLASSIFIERS = {
+    "Requirement": REQUIREMENT_CLASSIFIER,
+    "Priority": INBOX_PRIORITY_CLASSIFIER,
+    "Sentiment": INBOX_SENTIMENT_CLASSIFIER,
+}
+
+@ENRICH_PIPELINE.stage("labels", reads=("Body",), writes=tuple(_LABEL_CLASSIFIERS))
+def _labels_stage(df, columns):
+    # One pass over the unique bodies for every missing label column
+    return classify_columns(df["Body"], {c: _LABEL_CLASSIFIERS[c] for c in columns})
+
+def enrich_emails(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Preprocess emails and extract useful fields:
-    - Normalize headers (handles variations like 'sender'/'from')
-    - Priority (heuristic)
-    - Sentiment (heuristic)
-    - Phone numbers
-    - Sender name
-    - Requirement keywords
-    - Preview text (first 50 chars of body)
+    Derive Phone, AltEmail, SenderName, Requirement, Priority and Sentiment
+    into a compact frame (see compact_frame). Headers are normalized first;
+    columns already present and complete are kept as they are. Per-stage
+    timings of the last call are in ENRICH_PIPELINE.timings.
     """
-
-    # ------------------------------
-    # Step 1: Normalize headers
-    # ------------------------------
-    cols_map = {c: c.strip() for c in df.columns}
-    df = df.rename(columns=cols_map)
-
-    lower_map = {c.lower().strip(): c for c in df.columns}
+    df = normalize_columns(df)
+    return compact_frame(ENRICH_PIPELINE.run(df)).reset_index(drop=True)
+
+# ---------------------------
+# Compact in-memory layout
+# ---------------------------
+LABEL_COLUMNS = ["Priority", "Sentiment", "Requirement"]
+TEXT_COLUMNS = ["From", "SenderName", "Subject", "Body", "Phone", "AltEmail"]
+PREVIEW_LENGTH = 50
+
+def _arrow_string_dtype():
+    """Arrow-backed string dtype with NaN for missing values (None without pyarrow)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)  # pandas >= 2.3
+    except TypeError:
+        return pd.StringDtype("pyarrow_numpy")
+
+ARROW_STRING = _arrow_string_dtype()
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store label columns as categoricals and free text as Arrow-backed
+    strings (one contiguous buffer per column instead of a Python object
+    per cell). Columns already in that layout are left alone; without
+    pyarrow the text columns stay as they are.
+    """
+    converted = {}
+    for col in LABEL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            converted[col] = df[col].astype("category")
+    if ARROW_STRING is not None:
+        for col in TEXT_COLUMNS:
+            if col in df.columns and df[col].dtype != ARROW_STRING:
+                converted[col] = df[col].astype(ARROW_STRING)
+    return df.assign(**converted) if converted else df
+
+def preview_text(body: pd.Series, length: int = PREVIEW_LENGTH) -> pd.Series:
+    """First `length` characters of each body (plus "..." when cut), computed on demand for display."""
+    body = body.fillna("").astype(str)
+    cut = body.str.slice(0, length)
+    return cut.where(body.str.len() <= length, cut + "...")
+
+# Former name of enrich_emails
+preprocess_emails = enrich_emails
+
+# ---------------------------
+# Inbox helpers (shared by app.py and the ingestion pipeline)
+# ---------------------------
+FILTER_KEYWORDS = ["support", "query", "request", "help"]
+
+# Accepted spellings of each standard header, most specific first
+HEADER_ALIASES = {
+    "From": ["from", "sender"],
+    "Subject": ["subject"],
+    "Body": ["body", "content"],
+    "Sent Date": ["sent date", "sent_date", "sentdate", "date"],
+}
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize and standardize email dataset headers (the one place this is
+    done): strip names, map the first matching alias of each header, add
+    missing From/Subject/Body and parse Sent Date.
+    """
+    df = df.rename(columns={c: c.strip() for c in df.columns})
+    lower_map = {}
+    for c in df.columns:
+        lower_map.setdefault(c.lower(), c)
 
     rename_dict = {}
-    if "sender" in lower_map:
-        rename_dict[lower_map["sender"]] = "From"
-    if "from" in lower_map:
-        rename_dict[lower_map["from"]] = "From"
-    if "subject" in lower_map:
-        rename_dict[lower_map["subject"]] = "Subject"
-    if "body" in lower_map:
-        rename_dict[lower_map["body"]] = "Body"
-    if "content" in lower_map:
-        rename_dict[lower_map["content"]] = "Body"
-    if "sent_date" in lower_map:
-        rename_dict[lower_map["sent_date"]] = "Sent Date"
-
+    for target, aliases in HEADER_ALIASES.items():
+        if target in df.columns:
+            continue
+        for alias in aliases:
+            col = lower_map.get(alias)
+            if col is not None and col not in rename_dict:
+                rename_dict[col] = target
+                break
     if rename_dict:
         df = df.rename(columns=rename_dict)
 
-    # Ensure base columns exist
     for col in ["From", "Subject", "Body"]:
         if col not in df.columns:
             df[col] = ""
 
-    # ------------------------------
-    # Step 2: Priority detection
-    # ------------------------------
-    def heuristic_priority(text):
-        if not isinstance(text, str):
-            return "Normal"
-        text_l = text.lower()
-        if any(word in text_l for word in ["urgent", "asap", "immediately", "critical", "cannot access"]):
-            return "Urgent"
-        elif any(word in text_l for word in ["reminder", "follow up", "pending"]):
-            return "High"
-        return "Normal"
-
-    # ------------------------------
-    # Step 3: Sentiment detection
-    # ------------------------------
-    def heuristic_sentiment(text):
-        if not isinstance(text, str):
-            return "Neutral"
-        text_l = text.lower()
-        if any(w in text_l for w in ["thank", "thanks", "great", "appreciate", "good job"]):
-            return "Positive"
-        if any(w in text_l for w in ["bad", "complaint", "delay", "problem", "issue", "not working"]):
-            return "Negative"
-        return "Neutral"
-
-    # ------------------------------
-    # Step 4: Phone number extraction
-    # ------------------------------
-    phone_pattern = r"(\+?\d[\d\s\-]{7,}\d)"
-    df["Phone"] = df.apply(
-        lambda row: re.findall(phone_pattern, str(row.get("Body", "")) + " " + str(row.get("Content", ""))),
-        axis=1
-    )
-
-    # ------------------------------
-    # Step 5: Sender name extraction (fix)
-    # ------------------------------
-    if "From" in df.columns and df["From"].notna().any():
-        df["SenderName"] = df["From"].apply(
-            lambda s: str(s).split("@")[0].replace(".", " ").title()
-            if pd.notna(s) and "@" in str(s)
-            else "Unknown"
-        )
-    elif "Sender" in df.columns and df["Sender"].notna().any():
-        df["SenderName"] = df["Sender"].apply(
-            lambda s: str(s).split("@")[0].replace(".", " ").title()
-            if pd.notna(s) and "@" in str(s)
-            else "Unknown"
-        )
-    else:
-        df["SenderName"] = "Unknown"
-
-    # ------------------------------
-    # Step 6: Requirement extraction
-    # ------------------------------
-    def extract_requirement(text):
-        if not isinstance(text, str):
-            return "General"
-        text_l = text.lower()
-        if "password" in text_l or "login" in text_l:
-            return "Account Access"
-        if "payment" in text_l or "invoice" in text_l or "billing" in text_l:
-            return "Billing"
-        if "error" in text_l or "bug" in text_l or "not working" in text_l:
-            return "Technical Issue"
-        if "support" in text_l or "help" in text_l or "query" in text_l or "request" in text_l:
-            return "Support Request"
-        return "General"
-
-    df["Requirement"] = df["Body"].apply(extract_requirement)
-
-    # ------------------------------
-    # Step 7: Preview snippet
-    # ------------------------------
-    df["Preview"] = df["Body"].apply(
-        lambda x: str(x)[:50] + "..." if isinstance(x, str) and len(x) > 50 else str(x)
-    )
-
-    # ------------------------------
-    # Final Columns
-    # ------------------------------
-    if "Priority" not in df.columns:
-        df["Priority"] = df["Body"].apply(heuristic_priority)
+    if "Sent Date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Sent Date"]):
+        df["Sent Date"] = pd.to_datetime(df["Sent Date"], errors="coerce")
 
-    if "Sentiment" not in df.columns:
-        df["Sentiment"] = df["Body"].apply(heuristic_sentiment)
+    return df
 
-    return df.reset_index(drop=True)
+def ensure_metadata_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensure Priority and Sentiment exist."""
+    if "Priority" not in df.columns:
+        df["Priority"] = "Normal"
+    if "Sentiment" not in df.columns:
+        df["Sentiment"] = "Neutral"
+    return df
+
+def filter_support_emails(df: pd.DataFrame) -> pd.DataFrame:
+    """Filter emails with support-related subjects."""
+    if "Subject" not in df.columns:
+        return df
+    mask = df["Subject"].fillna("").str.lower().str.contains("|".join(FILTER_KEYWORDS))
+    return df[mask].reset_index(drop=True)
+
+def extract_info(row) -> dict:
+    """Phone and alternate email of a single row (the frame path is ENRICH_PIPELINE)."""
+    t = f"{row.get('Body', '') or ''} {row.get('Content', '') or ''}"
+    phone = PHONE_PATTERN.search(t)
+    email = EMAIL_PATTERN.search(t)
+    return {"Phone": phone.group(0) if phone else "", "AltEmail": email.group(0) if email else ""}
@@ -0,0 +1,165 @@
+# src/profiler.py
+import collections
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Records kept in memory (oldest dropped first)
+MAX_RECORDS = 10_000
+
+class _Span:
+    """Times one stage; `set(...)` attaches values known only at the end (e.g. tokens)."""
+
+    __slots__ = ("profiler", "stage", "extra", "start", "mem_start")
+
+    def __init__(self, profiler, stage: str, extra: dict):
+        self.profiler = profiler
+        self.stage = stage
+        self.extra = extra
+
+    def set(self, **extra):
+        self.extra.update(extra)
+
+    def __enter__(self):
+        # Memory mode as of entry: the flag is process-wide and may flip while the span is open
+        self.mem_start = None
+        if self.profiler.memory:
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        if self.mem_start is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self.extra["mem_delta"] = current - self.mem_start
+            self.extra["mem_peak"] = peak - self.mem_start
+        if exc_type is not None:
+            self.extra["error"] = exc_type.__name__
+        self.profiler.record(self.stage, seconds, **self.extra)
+        return False
+
+class _NullSpan:
+    """What `span` returns while profiling is disabled: does nothing."""
+
+    __slots__ = ()
+
+    def set(self, **extra):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Profiler:
+    """
+    Lightweight stage timings. `with profiler.span("stage"):` records the
+    wall time of the block (plus allocated / peak bytes when memory tracking
+    is on) into a rolling in-memory store and, if `log_path` is set, appends
+    it to a JSON-lines file. Spans share tracemalloc's single peak counter,
+    so the peak of a nested or concurrent span covers the others too.
+    While disabled, `span` returns a shared no-op object.
+    """
+
+    def __init__(self, enabled: bool = True, memory: bool = False, log_path: str = None,
+                 max_records: int = MAX_RECORDS):
+        self.enabled = enabled
+        self.memory = False
+        self.log_path = log_path
+        self.records = collections.deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._log = None
+        self.set_memory(memory)
+
+    def set_memory(self, enabled: bool):
+        """Turn tracemalloc snapshots on or off (tracing slows allocations down noticeably)."""
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = enabled
+
+    def span(self, stage: str, **extra):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, extra)
+
+    def timed(self, stage: str = None):
+        """Decorator: run every call of the function inside a span."""
+        def wrap(func):
+            name = stage or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return wrap
+
+    def record(self, stage: str, seconds: float, **extra):
+        if not self.enabled:
+            return
+        rec = {"stage": stage, "seconds": seconds, "ts": time.time(), **extra}
+        with self._lock:
+            self.records.append(rec)
+            if self.log_path:
+                if self._log is None:
+                    os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                    self._log = open(self.log_path, "a", encoding="utf-8", buffering=1)
+                self._log.write(json.dumps(rec) + "\n")
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def summary(self) -> pd.DataFrame:
+        """Per-stage count, p50/p95/max latency (ms), total time and, where recorded, peak memory and tokens/s."""
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return pd.DataFrame(columns=["stage", "count", "p50_ms", "p95_ms", "max_ms", "total_s"])
+        df = pd.DataFrame.from_records(records)
+        rows = []
+        for stage, group in df.groupby("stage", sort=False):
+            ms = group["seconds"].to_numpy() * 1000
+            row = {
+                "stage": stage,
+                "count": len(group),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "max_ms": float(ms.max()),
+                "total_s": float(ms.sum() / 1000),
+            }
+            if "mem_peak" in group and group["mem_peak"].notna().any():
+                row["peak_mb"] = float(group["mem_peak"].max() / 2**20)
+            if "tokens" in group and group["tokens"].notna().any():
+                timed = group[group["tokens"].notna()]
+                row["tokens_per_s"] = float(timed["tokens"].sum() / timed["seconds"].sum())
+            rows.append(row)
+        return pd.DataFrame(rows).sort_values("total_s", ascending=False, ignore_index=True)
+
+    def tokens_per_second(self, stages: tuple = ("llm_call", "llm_stream")) -> float:
+        """Completion tokens per second of LLM latency over the stored records of `stages`."""
+        with self._lock:
+            timed = [(r["tokens"], r["seconds"]) for r in self.records if r["stage"] in stages and r.get("tokens")]
+        seconds = sum(s for _, s in timed)
+        return sum(t for t, _ in timed) / seconds if seconds else 0.0
+
+# Process-wide profiler; configured from the environment:
+# APP_PROFILE=0 disables it, APP_PROFILE_MEMORY=1 adds tracemalloc snapshots,
+# APP_PROFILE_LOG=path also appends every record to a JSON-lines file
+PROFILER = Profiler(
+    enabled=os.environ.get("APP_PROFILE", "1") != "0",
+    memory=os.environ.get("APP_PROFILE_MEMORY") == "1",
+    log_path=os.environ.get("APP_PROFILE_LOG") or None,
+)
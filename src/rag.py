@@ -1,115 +1,502 @@
 # src/rag.py
+import asyncio
+import hashlib
 import os
+import random
+import threading
+import time
 import streamlit as st
-import openai
 import numpy as np
+from src.bm25 import BM25Index
+from src.kb_index import INDEX_DIR, KB_PATH, MODEL_NAME, KBIndex, doc_hash, load_kb_docs, normalize
+from src.profiler import PROFILER
+from src.reply_cache import ReplyCache
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+LLM_MODEL = "llama-3.1-8b-instant"
+
+# KB retrieval: "auto" uses embeddings when sentence-transformers is installed
+# and BM25 otherwise; "hybrid" fuses both scores (weight HYBRID_ALPHA on cosine)
+RETRIEVAL_MODES = ("auto", "embedding", "bm25", "hybrid")
+HYBRID_ALPHA = 0.5
+# Candidates taken from each retriever before hybrid re-scoring
+_HYBRID_CANDIDATES = 20
+
+# ---------------------------
+# Prompt template (its fingerprint namespaces the reply cache)
+# ---------------------------
+PROMPT_TEMPLATE = """
+You are a professional AI support assistant.
+
+Guidelines:
+- Maintain professional, empathetic, and concise tone.
+- {empathy}{urgency_note}
+- Use knowledge base context if helpful.
+- Reference any products mentioned.
+- Keep reply 5–8 sentences, end with polite sign-off.
+
+Context:
+{context_text}{history_note}
+
+Email Subject: {subject}
+Email Body: {body}
+Sentiment: {sentiment}
+Priority: {priority}
+
+Provide only the reply body (no analysis).
+"""
+EMPATHY_NOTE = "The customer appears frustrated — acknowledge their frustration politely.\n"
+URGENCY_NOTE = "This is URGENT — provide immediate steps.\n"
+NO_CONTEXT_NOTE = "No KB context available."
+HISTORY_NOTE = "\nSender history: {history}"
+PROMPT_VERSION = hashlib.sha1(
+    "\x1f".join([PROMPT_TEMPLATE, EMPATHY_NOTE, URGENCY_NOTE, NO_CONTEXT_NOTE, HISTORY_NOTE]).encode("utf-8")
+).hexdigest()
+
+def _histogram_text(counts: dict) -> str:
+    return ", ".join(f"{label} {n}" for label, n in sorted(counts.items(), key=lambda kv: -kv[1]))
+
+def sender_history(profile: dict) -> str:
+    """
+    One line summarising a sender profile (db_helper.sender_profile) for
+    the prompt; empty for an unknown sender or one writing for the first time.
+    """
+    if not profile or profile.get("count", 0) <= 1:
+        return ""
+    parts = [f"{profile['count']} emails since {(profile.get('first_seen') or '?')[:10]}"]
+    for key, title in (("sentiment", "sentiment"), ("priority", "priority"), ("requirement", "past requests")):
+        if profile.get(key):
+            parts.append(f"{title}: {_histogram_text(profile[key])}")
+    return "; ".join(parts)
+
+def draft_share_key(cluster, priority: str, sentiment: str, history: str = ""):
+    """
+    Near-duplicate emails share one draft only when they also share the
+    labels and sender line the prompt is built from: their cluster, priority,
+    sentiment and sender_history line (an "URGENT:" copy of a routine email
+    gets its own draft). None (no sharing) for an email without a cluster.
+    """
+    return None if cluster is None else (cluster, priority, sentiment, history or "")
+
+def _retryable_errors() -> tuple:
+    """Errors worth retrying with backoff (rate limits, timeouts, 5xx)."""
+    import openai
+    return (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+def _completion_tokens(response):
+    """Completion tokens reported by the API (None when it sends no usage)."""
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "completion_tokens", None)
+
+class ReplyGenerationError(Exception):
+    """A streamed reply failed; the chunks already yielded are a partial reply."""
+
+# ---------------------------
+# Rate limiting
+# ---------------------------
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
 
 # ---------------------------
 # Setup Groq API
 # ---------------------------
 class RAG:
-    def __init__(self):
-        # Load API key from secrets.toml
+    def __init__(self, kb_dtype: str = None, base_url: str = None, model: str = None, use_cache: bool = True,
+                 retrieval: str = None, api_key: str = None, kb_path: str = KB_PATH, index_dir: str = INDEX_DIR):
+        # Load API key from secrets.toml (GROQ_API_KEY env var outside Streamlit)
+        self.api_key = api_key or self._read_api_key()
+
+        # LLM_BASE_URL / LLM_MODEL point the assistant at any OpenAI-compatible
+        # endpoint (e.g. the local stub in src/llm_stub.py)
+        self.base_url = base_url or os.environ.get("LLM_BASE_URL", GROQ_BASE_URL)
+        self.model = model or os.environ.get("LLM_MODEL", LLM_MODEL)
+        self.kb_dtype = kb_dtype
+        self.kb_path = kb_path
+        self.index_dir = index_dir
+        self.use_cache = use_cache
+        self.retrieval = retrieval or os.environ.get("RAG_RETRIEVAL", "auto")
+        if self.retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {self.retrieval}")
+
+        # Heavy resources (OpenAI client, embedding model, KB index, reply
+        # cache) are created on first use by `client` / `_ensure_kb`
+        self._client = None
+        self._kb_loaded = False
+        self._warm_up_started = False
+        self._init_lock = threading.RLock()
+        self.kb_docs = []
+        self.embed_model = None
+        self.kb_index = None
+        self.kb_embs = None
+        self.kb_rows = []
+        self.bm25 = None
+        self.cache = None
+
+    @staticmethod
+    def _read_api_key() -> str:
+        try:
+            return st.secrets["GROQ_API_KEY"]["api_key"]
+        except Exception:
+            pass
         try:
-            self.api_key = st.secrets["GROQ_API_KEY"]["api_key"]
+            return st.secrets.get("GROQ_API_KEY", "")
         except Exception:
-            self.api_key = st.secrets.get("GROQ_API_KEY", "")
+            return os.environ.get("GROQ_API_KEY", "")
 
-        self.client = openai.OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
+    @property
+    def client(self):
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    import openai
+                    self._client = openai.OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url
+                    )
+        return self._client
 
-        # Load KB
-        self.kb_docs = self._load_kb("data/faq.txt")
-        self.embed_model = self._try_get_embeddings_model()
-        self.kb_embs = None
-        if self.embed_model and self.kb_docs:
-            self.kb_embs = self.embed_model.encode(self.kb_docs, convert_to_numpy=True)
+    def _ensure_kb(self):
+        """Load the KB, embedding model, index and reply cache once."""
+        if self._kb_loaded:
+            return
+        with self._init_lock:
+            if self._kb_loaded:
+                return
+            # Load KB; embeddings come from the on-disk index (memory-mapped),
+            # only new or changed documents are encoded. kb_dtype="float16"/"int8"
+            # stores them quantized.
+            self.kb_docs = self._load_kb(self.kb_path)
+            self.embed_model = self._try_get_embeddings_model()
+            if self.embed_model and self.kb_docs:
+                self.kb_index = KBIndex(self.index_dir)
+                self.kb_index.update(self.kb_docs, self.embed_model, MODEL_NAME, dtype=self.kb_dtype)
+                self.kb_embs = self.kb_index.embeddings
+                self.kb_rows = self.kb_index.docs
+            else:
+                self.kb_rows = list(self.kb_docs)
+            # Lexical index over the same rows (tombstones are empty documents)
+            if self.retrieval != "embedding" or self.kb_embs is None:
+                self.bm25 = BM25Index(self.kb_rows)
+
+            # Reply cache, cleared automatically when the KB or prompt template changes
+            kb_version = hashlib.sha1("\n".join(doc_hash(d) for d in self.kb_docs).encode("utf-8")).hexdigest()
+            self.cache = ReplyCache(namespace=f"{kb_version}:{PROMPT_VERSION}") if self.use_cache else None
+            self._kb_loaded = True
+
+    def warm_up(self):
+        """Create every heavy resource now instead of on the first request."""
+        self._ensure_kb()
+        self.client
+
+    def start_warm_up(self):
+        """Run warm_up once in a background thread."""
+        with self._init_lock:
+            if self._warm_up_started:
+                return
+            self._warm_up_started = True
+
+        def run():
+            try:
+                self.warm_up()
+            except Exception:
+                # Errors surface again on the first real request
+                pass
+
+        threading.Thread(target=run, daemon=True).start()
 
     # ---------------------------
     # Knowledge Base
     # ---------------------------
     def _load_kb(self, kb_path: str):
-        if not os.path.exists(kb_path):
-            return []
-        with open(kb_path, "r", encoding="utf-8") as f:
-            return [line.strip() for line in f.readlines() if line.strip()]
+        return load_kb_docs(kb_path)
 
     def _try_get_embeddings_model(self):
         try:
             from sentence_transformers import SentenceTransformer
-            return SentenceTransformer("all-MiniLM-L6-v2")
+            return SentenceTransformer(MODEL_NAME)
         except Exception:
             return None
 
     def retrieve_context(self, query: str, top_k: int = 2):
         """Return top-k relevant docs from KB"""
-        if not self.kb_docs:
+        return self.retrieve_context_batch([query], top_k=top_k)[0]
+
+    def retrieve_context_batch(self, queries: list, top_k: int = 2) -> list:
+        """
+        Return top-k relevant docs for each query.
+
+        Embedding mode encodes all queries in one model call and scores them
+        against the (normalized) KB with one matrix multiply per block. BM25
+        mode (and the fallback without sentence-transformers) uses the
+        inverted index; hybrid mode re-scores the union of both candidate
+        lists with a weighted sum of cosine and max-scaled BM25 scores.
+        """
+        with PROFILER.span("retrieve_context", queries=len(queries)):
+            return self._retrieve(queries, top_k)
+
+    def _retrieve(self, queries: list, top_k: int) -> list:
+        if not len(queries):
+            # encode([]) gives a 1-D array, which normalize rejects
             return []
+        self._ensure_kb()
+        if not self.kb_docs:
+            return [[] for _ in queries]
+
+        if self.retrieval != "bm25" and self.embed_model and self.kb_embs is not None:
+            with PROFILER.span("embed_queries", queries=len(queries)):
+                q_embs = normalize(np.asarray(
+                    self.embed_model.encode(list(queries), convert_to_numpy=True), dtype=np.float32
+                ))
+            if self.retrieval == "hybrid":
+                return [[self.kb_rows[i] for i in self._hybrid_search(q, e, top_k)]
+                        for q, e in zip(queries, q_embs)]
+            indices, _ = self.kb_index.search(q_embs, top_k)
+            return [[self.kb_rows[i] for i in idx] for idx in indices]
+
+        indices, _ = self.bm25.search_batch(list(queries), top_k)
+        return [[self.kb_rows[i] for i in idx] for idx in indices]
 
-        if self.embed_model and self.kb_embs is not None:
-            q_emb = self.embed_model.encode([query])[0]
-            sims = np.dot(self.kb_embs, q_emb)
-            idx = np.argsort(sims)[-top_k:][::-1]
-            return [self.kb_docs[i] for i in idx]
-        else:
-            # Fallback: keyword overlap
-            scores = []
-            q = query.lower()
-            for d in self.kb_docs:
-                score = sum(1 for token in q.split() if token in d.lower())
-                scores.append(score)
-            idx = np.argsort(scores)[-top_k:][::-1]
-            return [self.kb_docs[i] for i in idx if scores[i] > 0]
+    def _hybrid_search(self, query: str, q_emb: np.ndarray, top_k: int) -> np.ndarray:
+        n = max(top_k, _HYBRID_CANDIDATES)
+        emb_idx, _ = self.kb_index.search(q_emb[None, :], n)
+        lex_idx, lex_scores = self.bm25.search(query, n)
+        candidates = np.union1d(emb_idx[0], lex_idx)
+        if not len(candidates):
+            return candidates
+        lexical = np.zeros(len(candidates), dtype=np.float32)
+        if len(lex_idx):
+            lexical[np.searchsorted(candidates, lex_idx)] = lex_scores / lex_scores.max()
+        fused = HYBRID_ALPHA * self.kb_index.score_rows(q_emb, candidates) + (1 - HYBRID_ALPHA) * lexical
+        return candidates[np.argsort(-fused, kind="stable")[:top_k]]
 
     # ---------------------------
     # Prompt builder
     # ---------------------------
-    def _build_prompt(self, subject: str, body: str, sentiment: str, priority: str, context_chunks: list) -> str:
-        context_text = "\n".join(context_chunks) if context_chunks else "No KB context available."
+    @PROFILER.timed("build_prompt")
+    def _build_prompt(self, subject: str, body: str, sentiment: str, priority: str, context_chunks: list,
+                      history: str = "") -> str:
+        context_text = "\n".join(context_chunks) if context_chunks else NO_CONTEXT_NOTE
+        history_note = HISTORY_NOTE.format(history=history) if history else ""
         empathy = ""
         if sentiment.lower() == "negative":
-            empathy = "The customer appears frustrated — acknowledge their frustration politely.\n"
+            empathy = EMPATHY_NOTE
         urgency_note = ""
         if priority.lower() == "urgent":
-            urgency_note = "This is URGENT — provide immediate steps.\n"
-
-        prompt = f"""
-You are a professional AI support assistant.
-
-Guidelines:
-- Maintain professional, empathetic, and concise tone.
-- {empathy}{urgency_note}
-- Use knowledge base context if helpful.
-- Reference any products mentioned.
-- Keep reply 5–8 sentences, end with polite sign-off.
-
-Context:
-{context_text}
-
-Email Subject: {subject}
-Email Body: {body}
-Sentiment: {sentiment}
-Priority: {priority}
+            urgency_note = URGENCY_NOTE
 
-Provide only the reply body (no analysis).
-"""
-        return prompt
+        return PROMPT_TEMPLATE.format(
+            empathy=empathy, urgency_note=urgency_note, context_text=context_text, history_note=history_note,
+            subject=subject, body=body, sentiment=sentiment, priority=priority,
+        )
 
     # ---------------------------
     # LLM Call
     # ---------------------------
-    def generate_reply(self, subject: str, body: str, sentiment: str, priority: str) -> str:
-        """Retrieve KB + build prompt + call Groq"""
+    def generate_reply(self, subject: str, body: str, sentiment: str, priority: str, stream: bool = False,
+                       history: str = ""):
+        """
+        Retrieve KB + build prompt + call Groq (stream=True returns
+        stream_reply's chunk iterator). `history` is the sender_history line
+        of the sender, added to the prompt context.
+        """
+        if stream:
+            return self.stream_reply(subject, body, sentiment, priority, history=history)
+        try:
+            context = self.retrieve_context(body, top_k=2)
+            key = ReplyCache.make_key(subject, body, sentiment, priority, context, self.model, history)
+            if self.cache:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+            prompt = self._build_prompt(subject, body, sentiment, priority, context, history)
+
+            with PROFILER.span("llm_call") as span:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                span.set(tokens=_completion_tokens(response))
+            reply = response.choices[0].message.content.strip()
+            if self.cache:
+                self.cache.put(key, reply)
+            return reply
+        except Exception as e:
+            return f"(Reply generation failed: {e})"
+
+    def stream_reply(self, subject: str, body: str, sentiment: str, priority: str, cancel: threading.Event = None,
+                     history: str = ""):
+        """
+        Yield the reply in text chunks as the LLM produces them. Closing the
+        generator or setting `cancel` stops the generation and closes the
+        HTTP stream. Time to first token ("llm_first_token") and the whole
+        stream ("llm_stream", with the completion tokens the API reports in
+        its final usage chunk, the chunk count and whether it was cancelled)
+        go to the profiler. Only complete replies are cached; a failure,
+        before or after the first chunk, raises ReplyGenerationError.
+        """
         try:
             context = self.retrieve_context(body, top_k=2)
-            prompt = self._build_prompt(subject, body, sentiment, priority, context)
+            key = ReplyCache.make_key(subject, body, sentiment, priority, context, self.model, history)
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                yield cached
+                return
+            prompt = self._build_prompt(subject, body, sentiment, priority, context, history)
+        except Exception as e:
+            raise ReplyGenerationError(str(e)) from e
 
+        start = time.perf_counter()
+        parts, response, completed, tokens = [], None, False, None
+        try:
             response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": prompt}]
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                stream_options={"include_usage": True},
             )
-            return response.choices[0].message.content.strip()
+            for chunk in response:
+                if cancel is not None and cancel.is_set():
+                    break
+                # Chunks carry text; the last one (no choices) the usage
+                tokens = _completion_tokens(chunk) or tokens
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if not text:
+                    continue
+                if not parts:
+                    PROFILER.record("llm_first_token", time.perf_counter() - start)
+                parts.append(text)
+                yield text
+            else:
+                completed = True
         except Exception as e:
-            return f"(Reply generation failed: {e})"
+            raise ReplyGenerationError(str(e)) from e
+        finally:
+            if response is not None:
+                response.close()
+            # Chunks are not tokens: a stream without usage stays out of tokens/s
+            PROFILER.record("llm_stream", time.perf_counter() - start, tokens=tokens, chunks=len(parts),
+                            cancelled=not completed)
+        if completed and self.cache:
+            self.cache.put(key, "".join(parts).strip())
+
+    # ---------------------------
+    # Bulk LLM calls
+    # ---------------------------
+    def generate_replies(self, emails: list, max_concurrency: int = 4, requests_per_second: float = None,
+                         max_retries: int = 3) -> list:
+        """
+        Draft replies for many emails at once.
+
+        `emails` is a list of dicts with subject/body/sentiment/priority, an
+        optional sender `history` line and an optional near-duplicate
+        `cluster` key: emails with the same draft_share_key share the reply
+        drafted for the first of them (one retrieval, one call).
+        KB context for all bodies is retrieved in one batch, then completions
+        run on a shared async client with at most `max_concurrency` in flight,
+        optional token-bucket rate limiting and exponential-backoff retries.
+        Cached drafts are returned without a call, and identical emails in
+        the batch share one completion.
+        Returns one reply per email, in order; a failed item gets a
+        "(Reply generation failed: ...)" string instead of failing the batch.
+        """
+        if not emails:
+            return []
+        if any(e.get("cluster") is not None for e in emails):
+            first, source = {}, []
+            for i, e in enumerate(emails):
+                share = draft_share_key(e.get("cluster"), e.get("priority", "Normal"), e.get("sentiment", "Neutral"),
+                                        e.get("history", ""))
+                source.append(i if share is None else first.setdefault(share, i))
+            unique = sorted(set(source))
+            drafted = self.generate_replies(
+                [{k: v for k, v in emails[i].items() if k != "cluster"} for i in unique],
+                max_concurrency, requests_per_second, max_retries,
+            )
+            by_source = dict(zip(unique, drafted))
+            return [by_source[i] for i in source]
+        try:
+            contexts = self.retrieve_context_batch([e.get("body", "") or "" for e in emails], top_k=2)
+        except Exception:
+            contexts = [[] for _ in emails]
+
+        replies = [None] * len(emails)
+        pending = {}  # cache key -> (prompt, positions)
+        for i, (e, ctx) in enumerate(zip(emails, contexts)):
+            fields = (e.get("subject", ""), e.get("body", ""), e.get("sentiment", "Neutral"),
+                      e.get("priority", "Normal"))
+            history = e.get("history", "") or ""
+            key = ReplyCache.make_key(*fields, ctx, self.model, history)
+            if key in pending:
+                pending[key][1].append(i)
+                continue
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                replies[i] = cached
+            else:
+                pending[key] = (self._build_prompt(*fields, ctx, history), [i])
+
+        keys = list(pending)
+        results = asyncio.run(self._complete_all(
+            [pending[k][0] for k in keys], max_concurrency, requests_per_second, max_retries
+        )) if keys else []
+        for key, (ok, text) in zip(keys, results):
+            if ok and self.cache:
+                self.cache.put(key, text)
+            for i in pending[key][1]:
+                replies[i] = text
+        return replies
+
+    async def _complete_all(self, prompts: list, max_concurrency: int, requests_per_second: float,
+                            max_retries: int) -> list:
+        """Run completions concurrently; returns (ok, reply or error text) per prompt."""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        import openai
+
+        # One client per batch: its connection pool is reused by every request
+        async with openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0) as client:
+            async def run(prompt):
+                async with semaphore:
+                    try:
+                        return True, await self._complete_with_retry(client, prompt, bucket, max_retries)
+                    except Exception as e:
+                        return False, f"(Reply generation failed: {e})"
+
+            return await asyncio.gather(*(run(p) for p in prompts))
+
+    async def _complete_with_retry(self, client, prompt: str, bucket, max_retries: int) -> str:
+        retryable = _retryable_errors()
+        for attempt in range(max_retries + 1):
+            if bucket:
+                await bucket.acquire()
+            try:
+                with PROFILER.span("llm_call") as span:
+                    response = await client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}]
+                    )
+                    span.set(tokens=_completion_tokens(response))
+                return response.choices[0].message.content.strip()
+            except retryable:
+                if attempt == max_retries:
+                    raise
+                # Exponential backoff with full jitter: 0.5s, 1s, 2s, ... (capped at 8s)
+                await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * 2 ** attempt)))
@@ -0,0 +1,110 @@
+# src/reply_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "data/reply_cache.db"
+
+class ReplyCache:
+    """
+    SQLite-backed cache of generated reply drafts.
+
+    Keys hash every prompt input (subject, body, sentiment, priority, KB
+    context chunks, model, sender history). Entries expire after
+    `ttl_seconds` and the least recently used ones are evicted beyond
+    `max_entries`. The cache is cleared whenever `namespace` (KB index +
+    prompt template fingerprint) changes.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = 5000, ttl_seconds: float = 7 * 24 * 3600,
+                 namespace: str = ""):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS replies (
+                    key TEXT PRIMARY KEY,
+                    reply TEXT,
+                    created_at REAL,
+                    last_used REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_replies_last_used ON replies(last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            row = conn.execute("SELECT value FROM meta WHERE name = 'namespace'").fetchone()
+            if row is None or row[0] != namespace:
+                conn.execute("DELETE FROM replies")
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('namespace', ?)", (namespace,))
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def make_key(subject: str, body: str, sentiment: str, priority: str, context_chunks: list, model: str,
+                 history: str = "") -> str:
+        payload = json.dumps([subject, body, sentiment, priority, list(context_chunks or []), model, history],
+                             ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached reply or None; counts a hit or a miss."""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            row = conn.execute("SELECT reply, created_at FROM replies WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM replies WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE replies SET last_used = ? WHERE key = ?", (now, key))
+        conn.close()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else row[0]
+
+    def put(self, key: str, reply: str):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO replies (key, reply, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, reply, now, now),
+            )
+            conn.execute("DELETE FROM replies WHERE created_at < ?", (now - self.ttl_seconds,))
+            excess = conn.execute("SELECT COUNT(*) FROM replies").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM replies WHERE key IN (SELECT key FROM replies ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+        conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM replies")
+        conn.close()
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM replies").fetchone()[0]
+        conn.close()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,16 +1,54 @@
 # src/reply_generator.py
 
-from src.rag import RAG
+import streamlit as st
+from src.rag import RAG, ReplyGenerationError
 
-# Initialize RAG once
-rag = RAG()
+@st.cache_resource(show_spinner=False)
+def get_rag() -> RAG:
+    """
+    Process-wide RAG instance, shared by every session and script rerun.
+    Its model, KB index and client load lazily on first use.
+    """
+    return RAG()
 
-def generate_reply(subject: str, body: str, sentiment: str, priority: str) -> str:
+def warm_up():
+    """Start loading the embedding model and KB index in the background."""
+    get_rag().start_warm_up()
+
+def generate_reply(subject: str, body: str, sentiment: str, priority: str, history: str = "") -> str:
     """
     Generate a context-aware reply using RAG + Groq LLM.
     """
     try:
-        reply = rag.generate_reply(subject, body, sentiment, priority)
+        reply = get_rag().generate_reply(subject, body, sentiment, priority, history=history)
         return reply
     except Exception as e:
         return f"(Reply generation failed: {e})"
+
+def stream_reply(subject: str, body: str, sentiment: str, priority: str, cancel=None, history: str = ""):
+    """
+    Yield a context-aware reply chunk by chunk as it is generated; close the
+    generator (or set the `cancel` event) to stop it. Raises
+    ReplyGenerationError if generation fails, after any partial chunks.
+    """
+    try:
+        yield from get_rag().stream_reply(subject, body, sentiment, priority, cancel=cancel, history=history)
+    except ReplyGenerationError:
+        raise
+    except Exception as e:
+        raise ReplyGenerationError(str(e)) from e
+
+def generate_replies(emails: list, max_concurrency: int = 4, requests_per_second: float = None) -> list:
+    """
+    Generate replies for many emails concurrently (one reply per email, in order).
+    """
+    try:
+        return get_rag().generate_replies(emails, max_concurrency=max_concurrency,
+                                          requests_per_second=requests_per_second)
+    except Exception as e:
+        return [f"(Reply generation failed: {e})" for _ in emails]
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the reply cache (empty until it is first used)."""
+    rag = get_rag()
+    return rag.cache.stats() if rag.cache else {}
@@ -0,0 +1,199 @@
+# src/worker.py
+"""
+Headless triage worker. Runs without the Streamlit page: it enriches
+stored emails that were saved without labels, queues a drafting job for
+every new support email and drafts replies Urgent first (then High, then
+Normal, oldest first), writing them back so they are waiting when an agent
+opens the Inbox. Several workers can share one database: jobs are leased,
+and a lease that runs out (crashed worker) puts the job back in the queue.
+
+    python -m src.worker                                  # poll until interrupted
+    python -m src.worker --once --stub --stub-fail-rate 0.2   # drain against the local stub LLM
+
+--once waits out retry backoffs and other workers' leases, and exits once
+no job is queued or leased.
+"""
+import os
+import socket
+import time
+import uuid
+import pandas as pd
+from src import db_helper, snapshot
+from src.preprocess import enrich_emails
+from src.profiler import PROFILER
+
+ENRICH_BATCH = 5_000      # unlabelled rows enriched per pass
+DRAFT_BATCH = 32          # jobs leased (and drafted concurrently) per pass
+LEASE_SECONDS = 300.0
+POLL_SECONDS = 5.0
+REPORT_SECONDS = 10.0
+FAILED_PREFIX = "(Reply generation failed"
+
+def _value(value, default, cast=str):
+    return default if pd.isna(value) else cast(value)
+
+class Worker:
+    def __init__(self, rag=None, batch: int = DRAFT_BATCH, max_concurrency: int = 4,
+                 requests_per_second: float = None, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = db_helper.DRAFT_MAX_ATTEMPTS, enrich_batch: int = ENRICH_BATCH,
+                 worker_id: str = None):
+        self._rag = rag
+        self.batch = batch
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.enrich_batch = enrich_batch
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.counts = {"enriched": 0, "queued": 0, "drafted": 0, "retried": 0, "failed": 0}
+        self.started = time.perf_counter()
+
+    @property
+    def rag(self):
+        if self._rag is None:
+            from src.rag import RAG
+            self._rag = RAG()
+        return self._rag
+
+    def enrich(self) -> int:
+        """Label stored rows that lack Priority / Sentiment / ..., `enrich_batch` at a time."""
+        total = 0
+        while True:
+            with PROFILER.span("worker.enrich"):
+                done = db_helper.enrich_pending(enrich_emails, limit=self.enrich_batch)
+            total += done
+            if done < self.enrich_batch:
+                break
+        self.counts["enriched"] += total
+        return total
+
+    def draft(self) -> int:
+        """Lease one batch of jobs, draft their replies and write them back; returns the jobs taken."""
+        ids = db_helper.lease_drafts(self.id, self.batch, self.lease_seconds)
+        if not ids:
+            return 0
+        from src.rag import sender_history
+
+        emails = db_helper.get_emails(ids)
+        ids = [i for i in ids if i in emails.index]     # deleted since they were queued
+        profiles = db_helper.sender_profiles(emails["From"].tolist())
+        batch = [
+            {
+                "subject": _value(row.Subject, ""),
+                "body": _value(row.Body, ""),
+                "sentiment": _value(row.Sentiment, "Neutral"),
+                "priority": _value(row.Priority, "Normal"),
+                "history": sender_history(profiles.get(row.From)),
+                # Near-duplicates share one draft
+                "cluster": _value(row.ClusterId, None, int),
+            }
+            for row in emails.loc[ids].itertuples()
+        ]
+        with PROFILER.span("worker.draft_batch", emails=len(batch)):
+            replies = self.rag.generate_replies(batch, max_concurrency=self.max_concurrency,
+                                                requests_per_second=self.requests_per_second)
+        ok = {i: r for i, r in zip(ids, replies) if not r.startswith(FAILED_PREFIX)}
+        errors = {i: r for i, r in zip(ids, replies) if r.startswith(FAILED_PREFIX)}
+        self.counts["drafted"] += db_helper.complete_drafts(self.id, ok, self.rag.model)
+        failed = db_helper.fail_drafts(self.id, errors, self.max_attempts)
+        self.counts["failed"] += failed
+        self.counts["retried"] += len(errors) - failed
+        return len(ids)
+
+    def step(self) -> int:
+        """One pass: enrich, queue new emails, draft one batch. Returns the amount of work done."""
+        enriched = self.enrich()
+        queued = db_helper.enqueue_drafts()
+        self.counts["queued"] += queued
+        return enriched + queued + self.draft()
+
+    def report(self) -> dict:
+        """Counters since start, drafts per second and the current queue depth."""
+        elapsed = time.perf_counter() - self.started
+        return {**self.counts, "elapsed": elapsed,
+                "drafts_per_sec": self.counts["drafted"] / elapsed if elapsed else 0.0,
+                "queue": db_helper.draft_queue_stats()}
+
+    def run(self, once: bool = False, poll: float = POLL_SECONDS, report_every: float = REPORT_SECONDS,
+            on_report=None, snapshot_every: float = None) -> dict:
+        """
+        Work until interrupted, sleeping `poll` seconds whenever there is
+        nothing to do. With `once`, return when the queue is drained: no job
+        queued (including those in retry backoff) or leased by any worker;
+        until then, sleep until the next job is due. `on_report` receives a
+        report every `report_every` seconds and at the end. With
+        `snapshot_every`, new emails are appended to the Parquet snapshot
+        (src/snapshot.py) that often. Jobs still leased on exit go back to
+        the queue.
+        """
+        last_report = last_snapshot = time.perf_counter()
+        try:
+            while True:
+                worked = self.step()
+                if on_report and time.perf_counter() - last_report >= report_every:
+                    on_report(self.report())
+                    last_report = time.perf_counter()
+                if snapshot_every and time.perf_counter() - last_snapshot >= snapshot_every:
+                    with PROFILER.span("worker.snapshot"):
+                        snapshot.write_snapshot()
+                    last_snapshot = time.perf_counter()
+                if not worked:
+                    if not once:
+                        time.sleep(poll)
+                        continue
+                    due = db_helper.next_draft_due()
+                    if due is None:
+                        break
+                    time.sleep(min(poll, max(due - time.time(), 0.0)))
+        finally:
+            db_helper.release_drafts(self.id)
+        result = self.report()
+        if on_report:
+            on_report(result)
+        return result
+
+def format_report(r: dict) -> str:
+    q = r["queue"]
+    by_priority = ", ".join(f"{k} {v:,}" for k, v in q["queued_by_priority"].items()) or "empty"
+    return (f"{r['elapsed']:7.0f}s  drafted {r['drafted']:,} ({r['drafts_per_sec']:.1f}/s)  "
+            f"retried {r['retried']:,}  failed {r['failed']:,}  enriched {r['enriched']:,}  |  "
+            f"queue: {q['queued']:,} queued ({by_priority}; {q['deferred']:,} in backoff), {q['leased']:,} leased, "
+            f"{q['done']:,} done, {q['failed']:,} failed")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Enrich stored emails and draft replies in the background.")
+    parser.add_argument("--once", action="store_true", help="exit when no job is queued or leased")
+    parser.add_argument("--batch", type=int, default=DRAFT_BATCH, help="jobs drafted per pass")
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM requests in flight")
+    parser.add_argument("--rps", type=float, help="LLM requests per second limit")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="seconds a leased job is reserved")
+    parser.add_argument("--max-attempts", type=int, default=db_helper.DRAFT_MAX_ATTEMPTS)
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between polls when idle")
+    parser.add_argument("--report", type=float, default=REPORT_SECONDS, help="seconds between reports")
+    parser.add_argument("--snapshot", type=float, metavar="SECONDS",
+                        help="also append new emails to the Parquet snapshot this often")
+    parser.add_argument("--retry-failed", action="store_true", help="queue jobs that failed for good again first")
+    parser.add_argument("--stub", action="store_true", help="draft against the local stub LLM (src/llm_stub.py)")
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    parser.add_argument("--stub-fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    db_helper.init_db()
+    if args.retry_failed:
+        print(f"Re-queued {db_helper.retry_failed_drafts():,} failed jobs")
+    rag = None
+    if args.stub:
+        from src.llm_stub import start_stub_server
+        from src.rag import RAG
+
+        server, base_url = start_stub_server(latency=args.stub_latency, fail_rate=args.stub_fail_rate)
+        rag = RAG(api_key="stub", base_url=base_url)
+    worker = Worker(rag, batch=args.batch, max_concurrency=args.concurrency, requests_per_second=args.rps,
+                    lease_seconds=args.lease, max_attempts=args.max_attempts)
+    try:
+        worker.run(once=args.once, poll=args.poll, report_every=args.report, snapshot_every=args.snapshot,
+                   on_report=lambda r: print(format_report(r), flush=True))
+    except KeyboardInterrupt:
+        print("Stopped; leased jobs were returned to the queue.")
@@ -0,0 +1,39 @@
+# tests/conftest.py
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db_helper, rag as rag_module  # noqa: E402
+from src.llm_stub import start_stub_server  # noqa: E402
+from src.rag import RAG  # noqa: E402
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """db_helper pointed at a fresh database in a temporary directory."""
+    monkeypatch.setattr(db_helper, "DB_PATH", str(tmp_path / "emails.db"))
+    db_helper.init_db()
+    yield db_helper
+    db_helper.close_connection()
+
+@pytest.fixture
+def stub():
+    """The local stub LLM (src/llm_stub.py); tests set its fail_rate / latency."""
+    server, base_url = start_stub_server()
+    server.base_url = base_url
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def rag(stub, tmp_path):
+    """A RAG client of the stub LLM, with BM25 retrieval and no reply cache."""
+    return RAG(api_key="stub", base_url=stub.base_url, use_cache=False, retrieval="bm25",
+               index_dir=str(tmp_path / "kb_index"))
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Retry backoff sleeps in RAG take no time; returns the (low, high) jitter ranges drawn."""
+    draws = []
+    monkeypatch.setattr(rag_module.random, "uniform", lambda low, high: draws.append((low, high)) or 0.0)
+    return draws
@@ -0,0 +1,115 @@
+# tests/test_mail_source.py
+import os
+import shutil
+from src import ingest
+from src.mail_source import iter_maildir, iter_mbox, read_frame, source_format
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MBOX = os.path.join(FIXTURES, "sample.mbox")
+MAILDIR = os.path.join(FIXTURES, "Maildir")
+
+NEW_MESSAGE = (b"From frank@example.com Thu Jan 11 09:00:00 2024\n"
+               b"From: frank@example.com\nSubject: Support needed for export\n"
+               b"Date: Thu, 11 Jan 2024 09:00:00 +0000\n\nThe CSV export is empty.\n\n")
+
+def _ingest(path, **kwargs):
+    return ingest.ingest_mail(path, chunksize=1, filter_support=False, enrich=None, **kwargs)
+
+# ---------------------------
+# Parsing
+# ---------------------------
+def test_source_format():
+    assert source_format(MBOX) == "mbox"
+    assert source_format(MAILDIR) == "maildir"
+    assert source_format(FIXTURES) is None
+
+def test_mbox_mime_and_charsets():
+    rows = [row for row, _ in iter_mbox(MBOX)]
+    assert [r["sender"] for r in rows] == ["alice@example.com", "bob@example.com", "carol@example.com"]
+    # RFC 2047 subject, quoted-printable latin-1 body, dates converted to UTC
+    assert rows[1]["subject"] == "Support request: café menu"
+    assert rows[1]["body"] == "The café order page shows an error."
+    assert rows[1]["sent_date"] == "2024-01-09 17:30:00"
+    assert rows[0]["sent_date"] == "2024-01-08 09:00:00"
+    # HTML-only message: tags stripped, entities decoded
+    assert rows[2]["body"] == "Invoice #42 is wrong & overdue."
+
+def test_mboxrd_unescaping():
+    body = next(iter_mbox(MBOX))[0]["body"]
+    assert body.splitlines() == ["I cannot log in to my account.",
+                                 "From the logs it looks like a lockout.",
+                                 ">From here on nothing works."]
+
+def test_mbox_offsets_resume_mid_archive():
+    positions = [pos for _, pos in iter_mbox(MBOX)]
+    assert positions[-1] == os.path.getsize(MBOX)
+    rest = [row["sender"] for row, _ in iter_mbox(MBOX, positions[0])]
+    assert rest == ["bob@example.com", "carol@example.com"]
+
+def test_maildir_rows():
+    rows = {key: row for row, key in iter_maildir(MAILDIR)}
+    assert set(rows) == {"1704700800.M1P100.fixture", "1704787200.M2P100.fixture"}
+    # base64 utf-8 body from new/, flagged message from cur/
+    assert rows["1704700800.M1P100.fixture"]["body"].endswith("Danke schön.")
+    assert rows["1704787200.M2P100.fixture"]["subject"] == "Help with setup"
+    assert list(read_frame(MAILDIR).columns) == ["sender", "subject", "body", "sent_date"]
+
+# ---------------------------
+# Checkpointed ingest
+# ---------------------------
+def test_mbox_resumes_after_checkpoint(db, tmp_path):
+    path = str(tmp_path / "inbox.mbox")
+    shutil.copy(MBOX, path)
+    first = _ingest(path)
+    assert (first["rows_read"], first["rows_inserted"]) == (3, 3)
+    assert db.get_checkpoint(os.path.abspath(path))[0] == os.path.getsize(path)
+
+    with open(path, "ab") as f:
+        f.write(NEW_MESSAGE)
+    second = _ingest(path)
+    assert (second["rows_read"], second["rows_inserted"]) == (1, 1)
+    assert _ingest(path)["rows_read"] == 0
+    assert db.query_value("SELECT COUNT(*) FROM emails") == 4
+
+def test_rewritten_mbox_is_read_from_start(db, tmp_path):
+    path = str(tmp_path / "inbox.mbox")
+    shutil.copy(MBOX, path)
+    _ingest(path)
+    # New first message: the fingerprint of the checkpointed prefix no longer matches
+    with open(MBOX, "rb") as f:
+        original = f.read()
+    with open(path, "wb") as f:
+        f.write(NEW_MESSAGE + original)
+    again = _ingest(path)
+    assert (again["rows_read"], again["rows_inserted"]) == (4, 1)
+
+def test_truncated_mbox_is_read_from_start(db, tmp_path):
+    path = str(tmp_path / "inbox.mbox")
+    shutil.copy(MBOX, path)
+    _ingest(path)
+    with open(path, "wb") as f:
+        f.write(NEW_MESSAGE)
+    assert _ingest(path)["rows_inserted"] == 1
+
+def test_restart_ignores_checkpoint(db, tmp_path):
+    path = str(tmp_path / "inbox.mbox")
+    shutil.copy(MBOX, path)
+    _ingest(path)
+    again = _ingest(path, restart=True)
+    assert (again["rows_read"], again["rows_inserted"]) == (3, 0)
+
+def test_maildir_key_checkpoints(db, tmp_path):
+    path = str(tmp_path / "Maildir")
+    shutil.copytree(MAILDIR, path)
+    assert _ingest(path)["rows_inserted"] == 2
+
+    # Reading a message moves it from new/ to cur/ with flags; its key is unchanged
+    os.rename(os.path.join(path, "new", "1704700800.M1P100.fixture"),
+              os.path.join(path, "cur", "1704700800.M1P100.fixture:2,S"))
+    assert _ingest(path)["rows_read"] == 0
+
+    with open(os.path.join(path, "new", "1704873600.M3P100.fixture"), "wb") as f:
+        f.write(NEW_MESSAGE.split(b"\n", 1)[1])
+    again = _ingest(path)
+    assert (again["rows_read"], again["rows_inserted"]) == (1, 1)
+    assert db.query_value("SELECT COUNT(*) FROM emails") == 3
@@ -0,0 +1,91 @@
+# tests/test_rag.py
+import random
+import numpy as np
+from src import llm_stub
+
+FAILED = "(Reply generation failed"
+
+def _emails(n: int) -> list:
+    return [{"subject": f"Support request {i}", "body": f"Problem number {i} with my account",
+             "sentiment": "Neutral", "priority": "Normal"} for i in range(n)]
+
+def _seeded(monkeypatch, seed: int = 7) -> random.Random:
+    """Make the stub's failures a fixed sequence; returns a copy of it."""
+    monkeypatch.setattr(llm_stub, "random", random.Random(seed))
+    return random.Random(seed)
+
+# ---------------------------
+# Bulk drafting against the stub LLM
+# ---------------------------
+def test_generate_replies_keeps_order(rag, stub):
+    replies = rag.generate_replies(_emails(8), max_concurrency=4)
+    assert [f'"Support request {i}"' in r for i, r in enumerate(replies)] == [True] * 8
+    assert stub.request_count == 8
+
+def test_concurrency_limit(rag, stub):
+    stub.latency = 0.1
+    rag.generate_replies(_emails(8), max_concurrency=2)
+    assert stub.max_in_flight == 2
+    stub.max_in_flight = 0
+    rag.generate_replies(_emails(8), max_concurrency=8)
+    assert stub.max_in_flight > 2
+
+def test_failures_stay_with_their_email(rag, stub, monkeypatch):
+    expected = _seeded(monkeypatch)
+    stub.fail_rate = 0.5
+    replies = rag.generate_replies(_emails(10), max_retries=0)
+    failed = [r.startswith(FAILED) for r in replies]
+    # Which emails fail depends on request order; how many does not
+    assert sum(failed) == sum(expected.random() < 0.5 for _ in range(10))
+    assert 0 < sum(failed) < 10
+    for i, reply in enumerate(replies):
+        assert reply.startswith(FAILED) or f'"Support request {i}"' in reply
+
+def test_retries_with_exponential_backoff(rag, stub, no_backoff, monkeypatch):
+    _seeded(monkeypatch)
+    stub.fail_rate = 0.5
+    replies = rag.generate_replies(_emails(10), max_retries=10)
+    assert not any(r.startswith(FAILED) for r in replies)
+    assert stub.request_count > 10
+    # One backoff per retried request, full jitter over 0.5s, 1s, 2s, ... capped at 8s
+    assert len(no_backoff) == stub.request_count - 10
+    assert {low for low, _ in no_backoff} == {0}
+    assert {high for _, high in no_backoff} <= {0.5, 1.0, 2.0, 4.0, 8.0}
+
+def test_retries_give_up_per_email(rag, stub, no_backoff):
+    stub.fail_rate = 1.0
+    replies = rag.generate_replies(_emails(3), max_retries=2)
+    assert all(r.startswith(FAILED) and "503" in r for r in replies)
+    assert stub.request_count == 3 * 3
+    assert sorted(high for _, high in no_backoff) == [0.5] * 3 + [1.0] * 3
+
+# ---------------------------
+# Streaming
+# ---------------------------
+def test_stream_records_completion_tokens(rag, stub, monkeypatch):
+    from src.profiler import PROFILER
+
+    monkeypatch.setattr(llm_stub, "_usage", lambda request, text: {"completion_tokens": 99})
+    PROFILER.clear()
+    reply = "".join(rag.stream_reply("Support request 1", "Problem with my account", "Neutral", "Normal"))
+    stream = [r for r in PROFILER.records if r["stage"] == "llm_stream"][-1]
+    # Tokens as reported in the stream's usage chunk, not the number of chunks received
+    assert (stream["tokens"], stream["chunks"]) == (99, len(reply.split()))
+    assert stream["cancelled"] is False
+
+# ---------------------------
+# Retrieval
+# ---------------------------
+class _Encoder:
+    """Embedding model stand-in (sentence-transformers encodes [] to a 1-D array, which normalize rejects)."""
+
+    def encode(self, texts, convert_to_numpy=True):
+        assert texts, "empty batches must not reach the model"
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+def test_retrieve_empty_batch(rag):
+    assert rag.retrieve_context_batch([]) == []
+    # Embedding mode too (sentence-transformers need not be installed)
+    rag.retrieval, rag.embed_model = "embedding", _Encoder()
+    rag.kb_embs = np.ones((len(rag.kb_rows), 4), dtype=np.float32)
+    assert rag.retrieve_context_batch([]) == []
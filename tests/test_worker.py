@@ -0,0 +1,132 @@
+# tests/test_worker.py
+import time
+import pandas as pd
+import pytest
+from src import worker
+
+def _store(db, emails):
+    """Store enriched support emails given as (subject, priority, sent date); returns their ids in that order."""
+    db.ingest_emails(pd.DataFrame({
+        "From": [f"user{i}@example.com" for i in range(len(emails))],
+        "Subject": [subject for subject, _, _ in emails],
+        "Body": [f"Email number {i}: " + "details " * i for i in range(len(emails))],
+        "Sent Date": [date for _, _, date in emails],
+        "Priority": [priority for _, priority, _ in emails],
+        "Sentiment": "Neutral",
+        "Requirement": "General",
+    }))
+    ids = dict(db.query("SELECT subject, id FROM emails"))
+    return [ids[subject] for subject, _, _ in emails]
+
+def _job(db, email_id):
+    return db.query_one("SELECT status, attempts, lease_owner FROM draft_jobs WHERE email_id = ?", (email_id,))
+
+@pytest.fixture
+def jobs(db):
+    """Three queued jobs; returns their email ids (Normal, Urgent, High)."""
+    ids = _store(db, [("Help with login", "Normal", "2024-01-01 09:00:00"),
+                      ("Support needed now", "Urgent", "2024-01-03 09:00:00"),
+                      ("Request for invoice", "High", "2024-01-02 09:00:00")])
+    assert db.enqueue_drafts() == 3
+    return ids
+
+def _worker(rag, **kwargs):
+    return worker.Worker(rag, worker_id="w1", **kwargs)
+
+# ---------------------------
+# Queue state machine
+# ---------------------------
+def test_enqueue_skips_non_support_and_unenriched(db):
+    _store(db, [("Lunch on Friday", "Normal", "2024-01-01 09:00:00"),
+                ("Help with login", "Normal", "2024-01-01 10:00:00")])
+    db.ingest_emails(pd.DataFrame({"From": ["x@example.com"], "Subject": ["Support please"],
+                                   "Body": ["Not enriched yet, no labels stored"],
+                                   "Sent Date": ["2024-01-02 09:00:00"]}))
+    assert db.enqueue_drafts() == 1
+    assert db.enqueue_drafts() == 0
+
+def test_lease_order_urgent_high_normal_oldest_first(db):
+    ids = _store(db, [("Help a", "Normal", "2024-01-02 09:00:00"),
+                      ("Help b", "Normal", "2024-01-01 09:00:00"),
+                      ("Help c", "High", "2024-01-03 09:00:00"),
+                      ("Help d", "Urgent", "2024-01-05 09:00:00"),
+                      ("Help e", "Urgent", "2024-01-04 09:00:00")])
+    db.enqueue_drafts()
+    assert db.draft_queue_stats()["queued_by_priority"] == {"Urgent": 2, "High": 1, "Normal": 2}
+    assert db.lease_drafts("w1", 2, 60) == [ids[4], ids[3]]
+    assert db.lease_drafts("w2", 10, 60) == [ids[2], ids[1], ids[0]]
+
+def test_expired_lease_is_leased_again(db, jobs):
+    normal, urgent, high = jobs
+    assert db.lease_drafts("w1", 1, -1) == [urgent]      # lease already ran out (crashed worker)
+    assert db.lease_drafts("w2", 1, 60) == [urgent]
+    assert _job(db, urgent) == ("leased", 2, "w2")
+    # The first worker lost the job: its late result is ignored
+    assert db.complete_drafts("w1", {urgent: "late draft"}) == 0
+    assert db.complete_drafts("w2", {urgent: "draft"}) == 1
+    assert _job(db, urgent) == ("done", 2, None)
+    assert db.query_value("SELECT reply FROM drafts WHERE email_id = ?", (urgent,)) == "draft"
+
+def test_release_returns_jobs_without_counting_the_attempt(db, jobs):
+    leased = db.lease_drafts("w1", 2, 60)
+    db.release_drafts("w1")
+    assert [_job(db, i) for i in leased] == [("queued", 0, None)] * 2
+    assert db.draft_queue_stats()["queued"] == 3
+
+def test_retry_backoff_then_final_failure(db, jobs, monkeypatch):
+    monkeypatch.setattr(db, "_DRAFT_RETRY_DELAY", 60.0)
+    _, urgent, _ = jobs
+    db.lease_drafts("w1", 1, 60)
+    assert db.fail_drafts("w1", {urgent: "stub overloaded"}, max_attempts=2) == 0
+    assert _job(db, urgent)[0] == "queued"
+    assert db.draft_queue_stats()["deferred"] == 1
+    # Backing off: only the other jobs can be leased, and the retry is due in about a minute
+    assert sorted(db.lease_drafts("w1", 10, 600)) == sorted(i for i in jobs if i != urgent)
+    assert db.next_draft_due() > time.time() + 50
+    db.release_drafts("w1")
+
+    db.execute("UPDATE draft_jobs SET available_at = 0 WHERE email_id = ?", (urgent,))   # backoff over
+    assert db.lease_drafts("w1", 1, 60) == [urgent]
+    assert db.fail_drafts("w1", {urgent: "stub overloaded"}, max_attempts=2) == 1
+    status, attempts, _ = _job(db, urgent)
+    assert (status, attempts) == ("failed", 2)
+    assert db.query_value("SELECT last_error FROM draft_jobs WHERE email_id = ?", (urgent,)) == "stub overloaded"
+    assert db.retry_failed_drafts() == 1
+    assert _job(db, urgent) == ("queued", 0, None)
+
+def test_next_draft_due(db, jobs):
+    assert db.next_draft_due() == 0            # queued and available now
+    for email_id in jobs:
+        db.execute("UPDATE draft_jobs SET status = 'done' WHERE email_id = ?", (email_id,))
+    assert db.next_draft_due() is None
+
+# ---------------------------
+# Worker against the stub LLM
+# ---------------------------
+def test_worker_once_drafts_everything(db, jobs, rag):
+    report = _worker(rag).run(once=True, poll=0.05)
+    assert report["drafted"] == 3
+    assert {k: report["queue"][k] for k in ("queued", "leased", "done", "failed")} == \
+        {"queued": 0, "leased": 0, "done": 3, "failed": 0}
+    drafts = dict(db.query("SELECT email_id, reply FROM drafts"))
+    assert "Support needed now" in drafts[jobs[1]]
+
+def test_worker_once_waits_out_backoff(db, jobs, rag, stub, no_backoff, monkeypatch):
+    # Every call fails: each job is retried after its backoff, then fails for good
+    monkeypatch.setattr(db, "_DRAFT_RETRY_DELAY", 0.2)
+    stub.fail_rate = 1.0
+    report = _worker(rag, max_attempts=2).run(once=True, poll=0.05)
+    assert (report["retried"], report["failed"]) == (3, 3)
+    assert report["queue"]["failed"] == 3 and report["queue"]["queued"] == 0
+    # 2 attempts per job, each with the batch's own 3 retries
+    assert stub.request_count == 3 * 2 * 4
+
+def test_worker_once_drains_after_transient_failures(db, jobs, rag, stub, no_backoff, monkeypatch):
+    monkeypatch.setattr(db, "_DRAFT_RETRY_DELAY", 0.1)
+    stub.fail_rate = 1.0
+    w = _worker(rag, max_attempts=3)
+    w.step()                                    # every job fails once and backs off
+    assert db.draft_queue_stats()["deferred"] == 3
+    stub.fail_rate = 0.0
+    report = w.run(once=True, poll=0.05)
+    assert report["queue"]["done"] == 3 and report["queue"]["queued"] == 0